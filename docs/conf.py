@@ -14,8 +14,6 @@ mock_modules = [
     'Bio.Align',
     'Bio.Seq',
     'biopython',
-    'fccpy',
-    'fccpy.contacts',
     'jsonpickle',
     'mpi4py',
     'numpy',
@@ -28,6 +26,7 @@ mock_modules = [
     'scipy',
     'scipy.cluster',
     'scipy.cluster.hierarchy',
+    'scipy.spatial',
     'toml',
     ]
 
@@ -79,6 +79,7 @@ setup(
             'haddock3-dmn = haddock.clis.cli_dmn:maincli',
             'haddock3-pp = haddock.clis.cli_pp:maincli',
             'haddock3-score = haddock.clis.cli_score:maincli',
+            'haddock3-rescore = haddock.clis.cli_rescore:maincli',
             'haddock3-unpack = haddock.clis.cli_unpack:maincli',
             ]
         },
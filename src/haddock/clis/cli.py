@@ -175,8 +175,14 @@ def main(
             )
 
         # Main loop of execution
-        workflow.run()
-        workflow.clean()
+        try:
+            workflow.run()
+            workflow.clean()
+        except BaseException:
+            # do not wait for the tasks left in the pool after an error
+            workflow.terminate()
+            raise
+        workflow.shutdown()
 
     # Finish
     end = time()
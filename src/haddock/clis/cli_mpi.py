@@ -4,6 +4,11 @@ MPI-wrapper for executing pickled CNSJobs created by libmpi.
 This was developed for use of lbimpi but it might be useful in some specific
  scenario as a cli.
 
+Rank 0 dispatches the tasks: the other ranks request a new task each time
+they are idle and report the result of the previous one. The progress is
+printed as the tasks complete, and the results are pickled next to the
+input file, see :py:func:`haddock.libs.libmpi.get_results_path`.
+
 For more information please refer to the README.md in the examples folder.
 
 Usage::
@@ -16,22 +21,82 @@ import argparse
 import pickle
 import sys
 
+from haddock.libs.libmpi import get_results_path
+from haddock.libs.libparallel import run_indexed_task
+
 
 try:
     from mpi4py import MPI
 except ImportError as e:
-    _msg = (
+    MPI = None
+    _MPI_ERROR = (
         f"{e} - To run this cli you must have mpi4py and "
         "OpenMPI installed in the system")
-    sys.exit(_msg)
 
 
-COMM = MPI.COMM_WORLD
+COMM = MPI.COMM_WORLD if MPI is not None else None
+
+# message tags of the master/worker protocol
+TAG_READY = 1
+TAG_TASK = 2
+TAG_EXIT = 3
 
 
-def split_tasks(task_l, n):
-    """Split tasks into equal lenght chunks."""
-    return [task_l[_i::n] for _i in range(n)]
+def report(result, num_done, num_tasks, tasks):
+    """Print the progress after a task completes."""
+    idx, success, _ = result
+    task_ident = getattr(tasks[idx], "input_file", idx)
+    status = "completed" if success else "failed"
+    per = (num_done / float(num_tasks)) * 100
+    print(f">> {task_ident} {status} {per:.0f}%", flush=True)
+
+
+def master(tasks):
+    """
+    Dispatch the tasks to the idle ranks.
+
+    Parameters
+    ----------
+    tasks : list
+        The tasks to execute.
+
+    Returns
+    -------
+    list
+        The `(index, success, result)` of each task, see
+        :py:func:`haddock.libs.libparallel.run_indexed_task`.
+    """
+    results = []
+    status = MPI.Status()
+    next_idx = 0
+    num_workers = COMM.size - 1
+    while num_workers:
+        # each idle worker sends the result of its previous task, if any
+        result = COMM.recv(source=MPI.ANY_SOURCE, tag=TAG_READY, status=status)
+        worker = status.Get_source()
+        if result is not None:
+            results.append(result)
+            report(result, len(results), len(tasks), tasks)
+
+        if next_idx < len(tasks):
+            COMM.send((next_idx, tasks[next_idx]), dest=worker, tag=TAG_TASK)
+            next_idx += 1
+        else:
+            COMM.send(None, dest=worker, tag=TAG_EXIT)
+            num_workers -= 1
+    return results
+
+
+def worker():
+    """Run the tasks sent by the master until it says to exit."""
+    status = MPI.Status()
+    result = None
+    while True:
+        COMM.send(result, dest=0, tag=TAG_READY)
+        indexed_task = COMM.recv(source=0, tag=MPI.ANY_TAG, status=status)
+        if status.Get_tag() == TAG_EXIT:
+            break
+        result = run_indexed_task(indexed_task)
 
 
 # ========================================================================#
@@ -65,6 +130,8 @@ def cli(ap, main):
 
 def maincli():
     """Execute main client."""
+    if MPI is None:
+        sys.exit(_MPI_ERROR)
     cli(ap, main)
 
 
@@ -73,22 +140,24 @@ def maincli():
 
 def main(pickled_tasks):
     """Execute the tasks."""
-    if COMM.rank == 0:
-        with open(pickled_tasks, "rb") as pkl:
-            tasks = pickle.load(pkl)
-        jobs = split_tasks(tasks, COMM.size)
+    if COMM.rank != 0:
+        worker()
+        return
+
+    with open(pickled_tasks, "rb") as pkl:
+        tasks = pickle.load(pkl)
+
+    if COMM.size == 1:
+        # no workers, run the tasks here
+        results = []
+        for indexed_task in enumerate(tasks):
+            results.append(run_indexed_task(indexed_task))
+            report(results[-1], len(results), len(tasks), tasks)
     else:
-        jobs = None
-
-    jobs = COMM.scatter(jobs, root=0)
-
-    results = []
-    for job in jobs:
-        job.run()
-        results.append(job.input_file)
+        results = master(tasks)
 
-    # COMM.Barrier()
-    # results = MPI.COMM_WORLD.gather(results, root=0)
+    with open(get_results_path(pickled_tasks), "wb") as output_handler:
+        pickle.dump(results, output_handler)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Score again the models of a CNS step with other weights.
+
+The CNS modules save the energy terms of their models to the
+``energies.tsv`` table of the step folder. This client calculates the
+HADDOCK score of those models with new weights and ranks them, without
+running CNS again. The weights not given keep the value used in the step.
+
+The ranking is saved to ``rescored.tsv`` in the step folder, or to the
+file given with ``-o``.
+
+Usage::
+
+    haddock3-rescore -h
+    haddock3-rescore run1/1_rigidbody --w_elec 0.2
+    haddock3-rescore run1/4_emref --w_desolv 0 --w_air 0.5
+    haddock3-rescore run1/4_emref --w_air 0 -o emref_no_air.tsv
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from haddock.libs.libcli import add_version_arg, arg_folder_exist
+
+
+WEIGHTS = ("w_vdw", "w_elec", "w_desolv", "w_air", "w_bsa")
+
+
+# Command line interface parser
+ap = argparse.ArgumentParser(
+    prog="haddock3-rescore",
+    description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+
+ap.add_argument(
+    "step_dir",
+    help="The folder of the CNS step.",
+    type=arg_folder_exist,
+    )
+
+for _weight in WEIGHTS:
+    ap.add_argument(
+        f"--{_weight}",
+        dest=_weight,
+        help=f"The new weight of the {_weight[2:]} term.",
+        type=float,
+        default=None,
+        )
+
+ap.add_argument(
+    "-o",
+    "--output",
+    help="The file where to save the ranking.",
+    type=Path,
+    default=None,
+    )
+
+add_version_arg(ap)
+
+
+def _ap():
+    return ap
+
+
+def load_args(ap):
+    """Load argument parser args."""
+    return ap.parse_args()
+
+
+def cli(ap, main):
+    """Command-line interface entry point."""
+    cmd = load_args(ap)
+    main(**vars(cmd))
+
+
+def maincli():
+    """Execute main client."""
+    cli(ap, main)
+
+
+def main(step_dir, output=None, **weights):
+    """
+    Score again the models of a step with new weights.
+
+    Parameters
+    ----------
+    step_dir : str or pathlib.Path
+        The folder of a CNS step, containing the energies table.
+
+    output : str or pathlib.Path
+        The file where to save the ranking. Defaults to ``rescored.tsv``
+        in the step folder.
+
+    weights : float or None
+        The new weights of the HADDOCK score, named ``w_<term>``. The
+        weights that are ``None`` or not given keep the value used in
+        the step.
+
+    Returns
+    -------
+    list of tuple
+        The models and their new scores, ranked.
+    """
+    # anti-pattern to speed up CLI initiation
+    import numpy as np
+
+    from haddock import log
+    from haddock.gear.haddockmodel import (
+        ENERGIES_TABLE,
+        calc_haddock_scores,
+        read_energies_table,
+        )
+
+    table_path = Path(step_dir, ENERGIES_TABLE)
+    if not table_path.exists():
+        sys.exit(
+            f"* ERROR * {str(table_path)!r} not found. "
+            "Only the steps of the CNS modules can be rescored."
+            )
+
+    model_names, energies_table, step_weights = \
+        read_energies_table(table_path)
+
+    new_weights = {k: v for k, v in weights.items() if v is not None}
+    step_weights.update(new_weights)
+
+    scores = calc_haddock_scores(energies_table, **step_weights)
+    order = np.argsort(scores, kind="stable")
+    ranking = [(model_names[i], float(scores[i])) for i in order]
+
+    output = Path(output or Path(step_dir, "rescored.tsv"))
+    weights_str = " ".join(f"{k}={v}" for k, v in step_weights.items())
+    lines = [f"# {weights_str}", "rank\tmodel\tscore"]
+    lines.extend(
+        f"{rank}\t{name}\t{score:.3f}"
+        for rank, (name, score) in enumerate(ranking, start=1)
+        )
+    output.write_text("\n".join(lines) + "\n")
+    log.info(f"Rescored {len(ranking)} models, ranking saved to {output}")
+
+    return ranking
+
+
+if __name__ == "__main__":
+    sys.exit(maincli())
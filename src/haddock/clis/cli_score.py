@@ -8,17 +8,27 @@ followed by the desired value. Write booleans with capital letter.
 Use the ``haddock3-cfg`` command-line to obtain the list of parameters for
 the ``emscoring`` module.
 
+Many complexes can be scored at once by giving several PDB files, folders
+containing PDB files, or multi-model PDB files (ensembles). All the
+complexes are scored in a single run, using the number of cores given
+with ``--ncores``, and their scores are saved to one table
+(``haddock-score.tsv`` by default).
+
 Usage::
 
     haddock3-score complex.pdb
     haddock3-score complex.pdb -p nemsteps 50
     haddock3-score complex.pdb -p nemsteps 50 w_air 1
     haddock3-score complex.pdb -p nemsteps 50 w_air 1 electflag True
+    haddock3-score decoys/ --ncores 8
+    haddock3-score complex_1.pdb complex_2.pdb ensemble.pdb -o scores.tsv
 
 """
 import argparse
 import ast
+import os
 import sys
+from pathlib import Path
 
 
 class _ParamsToDict(argparse.Action):
@@ -62,7 +72,33 @@ ap = argparse.ArgumentParser(
     description=__doc__,
     )
 
-ap.add_argument("pdb_file", help="Input PDB file")
+ap.add_argument(
+    "pdb_file",
+    help=(
+        "Input PDB file. Give several files, folders with PDB files or "
+        "multi-model PDB files to score many complexes at once."
+        ),
+    nargs="+",
+    )
+
+ap.add_argument(
+    "-n",
+    "--ncores",
+    help="Number of cores to score many complexes. Defaults to 1.",
+    type=int,
+    default=1,
+    )
+
+ap.add_argument(
+    "-o",
+    "--output",
+    help=(
+        "Table where to save the scores when scoring many complexes. "
+        "Defaults to `haddock-score.tsv`."
+        ),
+    type=Path,
+    default=Path("haddock-score.tsv"),
+    )
 
 ap.add_argument(
     "--full",
@@ -132,6 +168,8 @@ def main(
         outputpdb=False,
         outputpsf=False,
         keep_all=False,
+        ncores=1,
+        output="haddock-score.tsv",
         **kwargs,
         ):
     """
@@ -139,8 +177,10 @@ def main(
 
     Parameters
     ----------
-    pdb_file : str or pathlib.Path
-        The path to the PDB containing the complex.
+    pdb_file : str, pathlib.Path, or list of those
+        The path to the PDB containing the complex. Several PDB files,
+        folders with PDB files, or multi-model PDB files are scored in a
+        single run, see ``ncores`` and ``output``.
 
     full : bool
         Print all energy components.
@@ -158,6 +198,13 @@ def main(
         ``keep_all`` is True, this folder is **not** deleted after when
         the calculation finishes.
 
+    ncores : int
+        The number of cores used to score the complexes.
+
+    output : str or pathlib.Path
+        The table where the scores are saved when scoring more than one
+        complex.
+
     kwargs : any
         Any additional arguments that will be passed to the ``emscoring``
         module.
@@ -165,21 +212,26 @@ def main(
     import logging
     import shutil
     from contextlib import suppress
-    from pathlib import Path
 
     from haddock import log
-    from haddock.gear.haddockmodel import HaddockModel
+    from haddock.core.defaults import MODULE_IO_FILE
+    from haddock.gear.haddockmodel import (
+        ENERGIES_TABLE,
+        calc_haddock_scores,
+        read_energies_table,
+        )
     from haddock.gear.yaml2cfg import read_from_yaml_config
     from haddock.gear.zerofill import zero_fill
     from haddock.libs.libio import working_directory
+    from haddock.libs.libontology import ModuleIO
     from haddock.libs.libworkflow import WorkflowManager
     from haddock.modules.scoring.emscoring import DEFAULT_CONFIG
 
     log.setLevel(logging.ERROR)
 
-    input_pdb = Path(pdb_file).resolve()
-    if not input_pdb.exists():
-        sys.exit(f'* ERROR * Input PDB file {str(input_pdb)!r} does not exist')
+    if isinstance(pdb_file, (str, Path)):
+        pdb_file = [pdb_file]
+    pdb_files = get_pdb_files(pdb_file)
 
     # config all parameters are correctly spelled.
     default_emscoring = read_from_yaml_config(DEFAULT_CONFIG)
@@ -192,16 +244,9 @@ def main(
             print(f"* ATTENTION * Value ({kwargs[param]}) of parameter {param} different from default ({default_emscoring[param]})")  # noqa:E501
             ems_dict[param] = kwargs[param]
             n_warnings += 1
-    
+
     if n_warnings != 0:
         print("* ATTENTION * Non-default parameter values were used. They should be properly reported if the output data are used for publication.")  # noqa:E501
-    
-    params = {
-        "topoaa": {"molecules": [input_pdb]},
-        "emscoring": ems_dict,
-        }
-
-    print("> starting calculations...")
 
     run_dir = Path("haddock-score-client")
     with suppress(FileNotFoundError):
@@ -209,6 +254,18 @@ def main(
     run_dir.mkdir()
     zero_fill.set_zerofill_number(2)
 
+    # all the complexes are the models of a single ensemble, so that
+    #  they are scored by one topoaa and one emscoring step
+    ensemble_f = Path(run_dir, "haddock-score-ensemble.pdb").resolve()
+    names = make_ensemble(pdb_files, ensemble_f)
+
+    params = {
+        "topoaa": {"molecules": [ensemble_f], "ncores": ncores},
+        "emscoring": {**ems_dict, "ncores": ncores},
+        }
+
+    print(f"> starting calculations for {len(names)} structure(s)...")
+
     with working_directory(run_dir):
         workflow = WorkflowManager(
             workflow_params=params,
@@ -216,46 +273,76 @@ def main(
             run_dir=run_dir,
             )
 
-        workflow.run()
-
-    minimized_mol = Path(run_dir, "1_emscoring", "emscoring_1.pdb")
-    haddock_score_component_dic = HaddockModel(minimized_mol).energies
-
-    vdw = haddock_score_component_dic["vdw"]
-    elec = haddock_score_component_dic["elec"]
-    desolv = haddock_score_component_dic["desolv"]
-    air = haddock_score_component_dic["air"]
-    bsa = haddock_score_component_dic["bsa"]
-
-    # emscoring is equivalent to itw
-    haddock_score_itw = \
-        ems_dict["w_vdw"] * vdw \
-        + ems_dict["w_elec"] * elec \
-        + ems_dict["w_desolv"] * desolv \
-        + ems_dict["w_air"] * air \
-        + ems_dict["w_bsa"] * bsa
-
-    print(f"""> HADDOCK-score = ({ems_dict['w_vdw']} * vdw) + ({ems_dict['w_elec']} * elec) + ({ems_dict['w_desolv']} * desolv) + ({ems_dict['w_air']} * air) + ({ems_dict['w_bsa']} * bsa)""")  # noqa: E501
-    print(f"> HADDOCK-score (emscoring) = {haddock_score_itw:.4f}")
-
-    if full:
-        print(f"> vdw={vdw},elec={elec},desolv={desolv},air={air},bsa={bsa}")
-
-    if outputpdb:
-        outputpdb_name = Path(f"{input_pdb.name}_hs.pdb")
-        print(f"> writing {outputpdb_name}")
-        shutil.copy(
-            Path(run_dir, "1_emscoring", "emscoring_1.pdb"),
-            outputpdb_name,
-            )
+        try:
+            workflow.run()
+        except BaseException:
+            # do not wait for the tasks left in the pool after an error
+            workflow.terminate()
+            raise
+        workflow.shutdown()
+
+    topoaa_io = ModuleIO()
+    topoaa_io.load(Path(run_dir, "0_topoaa", MODULE_IO_FILE))
+    topologies = [
+        pdb.topology
+        for pdb in topoaa_io.retrieve_models(individualize=True)
+        ]
+
+    # the emscoring models are numbered in the order of the ensemble
+    model_fnames, energies_table, _ = read_energies_table(
+        Path(run_dir, "1_emscoring", ENERGIES_TABLE)
+        )
+    model_idxs = [int(Path(f).stem.split("_")[-1]) - 1 for f in model_fnames]
+
+    weights = {
+        k: ems_dict[k]
+        for k in ("w_vdw", "w_elec", "w_desolv", "w_air", "w_bsa")
+        }
+    scores = calc_haddock_scores(energies_table, **weights)
+    terms = [k.split("_")[1] for k in weights]
 
-    if outputpsf:
-        outputpsf_name = Path(f"{input_pdb.name}_hs.psf")
-        print(f"> writing {outputpsf_name}")
-        shutil.copy(
-            Path(run_dir, "0_topoaa", f'{input_pdb.name}_haddock.psf'),
-            outputpsf_name,
-            )
+    if len(names) == 1:
+        if not model_idxs:
+            sys.exit('* ERROR * The structure could not be scored')
+
+        vdw, elec, desolv, air, bsa = (energies_table[t][0] for t in terms)
+
+        print(f"""> HADDOCK-score = ({ems_dict['w_vdw']} * vdw) + ({ems_dict['w_elec']} * elec) + ({ems_dict['w_desolv']} * desolv) + ({ems_dict['w_air']} * air) + ({ems_dict['w_bsa']} * bsa)""")  # noqa: E501
+        print(f"> HADDOCK-score (emscoring) = {scores[0]:.4f}")
+
+        if full:
+            print(f"> vdw={vdw},elec={elec},desolv={desolv},air={air},bsa={bsa}")  # noqa: E501
+
+    else:
+        lines = ["\t".join(["structure", "score", *terms])]
+        for row, idx in enumerate(model_idxs):
+            values = (str(energies_table[t][row]) for t in terms)
+            lines.append("\t".join([names[idx], f"{scores[row]:.4f}", *values]))  # noqa: E501
+        Path(output).write_text(os.linesep.join(lines) + os.linesep)
+        print(f"> {len(model_idxs)} structure(s) scored, see {str(output)!r}")
+
+        if len(model_idxs) < len(names):
+            print(
+                f"* ATTENTION * {len(names) - len(model_idxs)} structure(s) "
+                "could not be scored"
+                )
+
+    for model_fname, idx in zip(model_fnames, model_idxs):
+        if outputpdb:
+            outputpdb_name = Path(f"{names[idx]}_hs.pdb")
+            print(f"> writing {outputpdb_name}")
+            shutil.copy(
+                Path(run_dir, "1_emscoring", model_fname),
+                outputpdb_name,
+                )
+
+        if outputpsf:
+            outputpsf_name = Path(f"{names[idx]}_hs.psf")
+            print(f"> writing {outputpsf_name}")
+            shutil.copy(
+                Path(run_dir, "0_topoaa", topologies[idx].file_name),
+                outputpsf_name,
+                )
 
     if not keep_all:
         shutil.rmtree(run_dir)
@@ -266,5 +353,88 @@ def main(
             )
 
 
+def get_pdb_files(inputs):
+    """
+    List the PDB files to score.
+
+    Parameters
+    ----------
+    inputs : list of str or pathlib.Path
+        PDB files, or folders whose PDB files are all scored.
+
+    Returns
+    -------
+    list of pathlib.Path
+        The PDB files, resolved.
+    """
+    pdb_files = []
+    for input_ in inputs:
+        path = Path(input_).resolve()
+        if path.is_dir():
+            pdb_files.extend(sorted(path.glob("*.pdb")))
+        elif path.exists():
+            pdb_files.append(path)
+        else:
+            sys.exit(f'* ERROR * Input PDB file {str(path)!r} does not exist')
+
+    if not pdb_files:
+        sys.exit('* ERROR * No PDB files found in the input')
+
+    return pdb_files
+
+
+def make_ensemble(pdb_files, ensemble_f):
+    """
+    Write the structures of the PDB files as the models of one ensemble.
+
+    Each model of the multi-model PDB files becomes a model of the
+    ensemble. Only the coordinate records are kept.
+
+    Parameters
+    ----------
+    pdb_files : list of pathlib.Path
+        The PDB files.
+
+    ensemble_f : str or pathlib.Path
+        The ensemble PDB file to write.
+
+    Returns
+    -------
+    list of str
+        The names of the structures, in the order of the models in the
+        ensemble. The models of multi-model files are named after the
+        file and their number.
+    """
+    names = []
+    with open(ensemble_f, "w") as fout:
+        for pdb_file in map(Path, pdb_files):
+            models = [[]]
+            with open(pdb_file) as fin:
+                for line in fin:
+                    if line.startswith("MODEL") and models[-1]:
+                        models.append([])
+                    elif line.startswith(("ATOM  ", "HETATM", "TER")):
+                        models[-1].append(line.rstrip("\r\n") + "\n")
+
+            models = [model for model in models if model]
+            if len(models) == 1:
+                model_names = [pdb_file.name]
+            else:
+                model_names = [
+                    f"{pdb_file.stem}_{i}{pdb_file.suffix}"
+                    for i in range(1, len(models) + 1)
+                    ]
+
+            for name, model in zip(model_names, models):
+                names.append(name)
+                fout.write(f"MODEL     {len(names):>4}\n")
+                fout.writelines(model)
+                fout.write("ENDMDL\n")
+
+        fout.write("END\n")
+
+    return names
+
+
 if __name__ == "__main__":
     sys.exit(maincli())
@@ -27,12 +27,13 @@ from haddock.libs.libio import (
     glob_folder,
     remove_files_with_ext,
     )
+from haddock.libs.libparallel import use_pool
 
 
 UNPACK_FOLDERS = []
 
 
-def clean_output(path, ncores=1):
+def clean_output(path, ncores=1, pool=None):
     """
     Clean the output of step folders.
 
@@ -51,6 +52,10 @@ def clean_output(path, ncores=1):
 
     ncores : int
         The number of cores.
+
+    pool : :py:class:`haddock.libs.libparallel.WorkerPool` or None
+        The pool of processes shared by the workflow. If not given, new
+        processes are created for the cleaning.
     """
     log.info(f"Cleaning output for {str(path)!r} using {ncores} cores.")
     # add any formats generated to
@@ -60,14 +65,14 @@ def clean_output(path, ncores=1):
 
     archive_ready = partial(_archive_and_remove_files, path=path)
     _ncores = min(ncores, len(files_to_archive))
-    with Pool(_ncores) as pool:
-        imap = pool.imap_unordered(archive_ready, files_to_archive)
+    with use_pool(_ncores, pool=pool) as pool_:
+        imap = pool_.imap_unordered(archive_ready, files_to_archive)
         for _ in imap:
             pass
 
     files_to_compress = ['pdb', 'psf']
     for ftc in files_to_compress:
-        found = compress_files_ext(path, ftc, ncores=ncores)
+        found = compress_files_ext(path, ftc, ncores=ncores, pool=pool)
         if found:
             remove_files_with_ext(path, ftc)
 
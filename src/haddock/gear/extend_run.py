@@ -9,7 +9,11 @@ from haddock.gear.clean_steps import UNPACK_FOLDERS, clean_output
 from haddock.gear.zerofill import zero_fill
 from haddock.libs.libontology import ModuleIO
 from haddock.libs.libtimer import log_time
-from haddock.libs.libworkflow import Workflow, WorkflowManager
+from haddock.libs.libworkflow import (
+    Workflow,
+    WorkflowManager,
+    create_worker_pool,
+    )
 from haddock.modules import get_module_steps_folders
 
 
@@ -26,12 +30,13 @@ class WorkflowManagerExtend(WorkflowManager):
         # `exit` module. If the `exit` module is removed in the future,
         # you can also remove and clean the `terminate` part here.
         self._terminated = 0
+        self.worker_pool = create_worker_pool(self.recipe.steps)
 
     def run(self):
         """High level workflow composer."""
         for i, step in enumerate(self.recipe.steps, start=0):
             try:
-                step.execute()
+                step.execute(worker_pool=self.worker_pool)
             except HaddockTermination:
                 self._terminated = i
                 break
@@ -57,7 +62,7 @@ class WorkflowManagerExtend(WorkflowManager):
                 )
 
             with log_time("cleaning output files took"):
-                clean_output(folder_, ncores)
+                clean_output(folder_, ncores, pool=self.worker_pool)
 
         # apply compression to the new modules
         super().clean(terminated=self._terminated)
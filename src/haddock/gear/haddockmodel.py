@@ -1,58 +1,225 @@
 """Represent an Haddock model."""
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+
+# energy terms written by CNS, in order, if the PDB does not name them
+ENERGY_TERMS = (
+    "total",
+    "bonds",
+    "angles",
+    "improper",
+    "dihe",
+    "vdw",
+    "elec",
+    "air",
+    "cdih",
+    "coup",
+    "rdcs",
+    "vean",
+    "dani",
+    "xpcs",
+    "rg",
+    )
+
+# the energies are in the header, before any of these records
+COORDINATE_RECORDS = ("ATOM  ", "HETATM", "MODEL ")
+
+# REMARK lines naming the energy terms, or giving their values
+ENERGY_REMARK_REGEX = re.compile(
+    r"^REMARK\s+(?:"
+    r"(?P<names>total(?:,\w+)+)"
+    r"|(?P<key>energies|buried surface area|Desolvation energy)"
+    r"\s*:(?P<value>.*?)"
+    r")\s*$"
+    )
+
+# table of the energies of the models of a step, in the step folder
+ENERGIES_TABLE = "energies.tsv"
+
+# keys of the single value REMARKs
+REMARK_KEYS = {
+    "buried surface area": "bsa",
+    "Desolvation energy": "desolv",
+    }
 
 
 class HaddockModel:
     """Represent HADDOCK model."""
 
     def __init__(self, pdb_f):
-        self.energies = self._load_energies(pdb_f)
-
-    @staticmethod
-    def _load_energies(pdb_f):
-        energy_dic = {}
-        with open(pdb_f) as fh:
-            for line in fh.readlines():
-                if line.startswith('REMARK'):
-                    # TODO: use regex to do this
-                    if 'energies' in line:
-                        energy_values = list(map(
-                            float,
-                            line.rstrip().split(':')[-1].split(',')
-                            ))
-                        total, bonds, angles, improper, dihe, vdw, elec, air, cdih, coup, rdcs, vean, dani, xpcs, rg = energy_values  # noqa: E501
-                        energy_dic['total'] = total
-                        energy_dic['bonds'] = bonds
-                        energy_dic['angles'] = angles
-                        energy_dic['improper'] = improper
-                        energy_dic['dihe'] = dihe
-                        energy_dic['vdw'] = vdw
-                        energy_dic['elec'] = elec
-                        energy_dic['air'] = air
-                        energy_dic['cdih'] = cdih
-                        energy_dic['coup'] = coup
-                        energy_dic['rdcs'] = rdcs
-                        energy_dic['vean'] = vean
-                        energy_dic['dani'] = dani
-                        energy_dic['xpcs'] = xpcs
-                        energy_dic['rg'] = rg
-                    if 'buried surface area' in line:
-                        bsa = float(line.rstrip().split(':')[-1])
-                        energy_dic['bsa'] = bsa
-                    if 'Desolvation energy' in line:
-                        desolv = float(line.rstrip().split(':')[-1])
-                        energy_dic['desolv'] = desolv
-
-        return energy_dic
+        self.energies = read_energies(pdb_f)
 
     def calc_haddock_score(self, **weights):
         """Calculate the haddock score based on the weights and energies."""
-        weighted_terms = []
-        for key in weights:
-            component_id = key.split('_')[1]
-            weight = weights[key]
-            value = self.energies[component_id]
-            weighted_terms.append(value * weight)
-
-        # the haddock score is simply the sum of the weighted terms
-        haddock_score = sum(weighted_terms)
-        return haddock_score
+        return calc_haddock_score(self.energies, **weights)
+
+
+def read_energies(pdb_f):
+    """
+    Read the energy terms written by CNS in the header of a PDB file.
+
+    The file is read only until its first coordinate record. The energy
+    terms are named after the REMARK line listing them; if that line is
+    missing, the default CNS terms (`ENERGY_TERMS`) are used.
+
+    Parameters
+    ----------
+    pdb_f : str or pathlib.Path
+        The PDB file.
+
+    Returns
+    -------
+    dict
+        The energy terms, the buried surface area and the desolvation
+        energy.
+    """
+    energy_dic = {}
+    names = ENERGY_TERMS
+    values = None
+    with open(pdb_f) as fh:
+        for line in fh:
+            if line.startswith(COORDINATE_RECORDS):
+                break
+            match = ENERGY_REMARK_REGEX.match(line)
+            if match is None:
+                continue
+
+            if match["names"]:
+                names = match["names"].split(",")
+            elif match["key"] == "energies":
+                values = match["value"]
+            else:
+                energy_dic[REMARK_KEYS[match["key"]]] = float(match["value"])
+
+    if values is not None:
+        values = list(map(float, values.split(",")))
+        if len(values) != len(names):
+            raise ValueError(
+                f"{pdb_f} has {len(values)} energy values "
+                f"for {len(names)} terms."
+                )
+        energy_dic.update(zip(names, values))
+
+    return energy_dic
+
+
+def calc_haddock_score(energies, **weights):
+    """
+    Calculate the haddock score based on the weights and energies.
+
+    Parameters
+    ----------
+    energies : dict
+        The energy terms, as given by :py:func:`read_energies`.
+
+    weights : dict
+        The weights of the terms, named `w_<term>`.
+    """
+    weighted_terms = []
+    for key in weights:
+        component_id = key.split('_')[1]
+        weight = weights[key]
+        value = energies[component_id]
+        weighted_terms.append(value * weight)
+
+    # the haddock score is simply the sum of the weighted terms
+    haddock_score = sum(weighted_terms)
+    return haddock_score
+
+
+def calc_haddock_scores(energies_table, **weights):
+    """
+    Calculate the haddock scores of many models at once.
+
+    Parameters
+    ----------
+    energies_table : dict
+        The values of each energy term for all the models, as
+        `{term: sequence of values}`.
+
+    weights : dict
+        The weights of the terms, named `w_<term>`.
+
+    Returns
+    -------
+    np.ndarray
+        The haddock score of each model.
+    """
+    terms = [key.split('_')[1] for key in weights]
+    values = np.array(
+        [energies_table[term] for term in terms],
+        dtype=float,
+        ).reshape(len(terms), -1)
+    return np.fromiter(weights.values(), dtype=float) @ values
+
+
+def write_energies_table(fname, model_names, energies, weights):
+    """
+    Write the energies of the models of a step as a table.
+
+    The table has one row per model and one column per energy term, so
+    that the models can be scored again with other weights without
+    reading their PDBs, see :py:func:`read_energies_table`.
+
+    Parameters
+    ----------
+    fname : str or pathlib.Path
+        The table file.
+
+    model_names : list of str
+        The names of the models.
+
+    energies : list of dict
+        The energies of each model, as given by :py:func:`read_energies`.
+        Terms missing in a model are written as `nan`.
+
+    weights : dict
+        The weights used to score the models, saved in the header of
+        the table.
+    """
+    terms = list(dict.fromkeys(t for e in energies for t in e))
+
+    weights_str = "\t".join(f"{k}={v}" for k, v in weights.items())
+    lines = [f"# weights\t{weights_str}", "\t".join(["model"] + terms)]
+    for name, model_energies in zip(model_names, energies):
+        values = (str(model_energies.get(t, np.nan)) for t in terms)
+        lines.append("\t".join([str(name), *values]))
+
+    Path(fname).write_text(os.linesep.join(lines) + os.linesep)
+
+
+def read_energies_table(fname):
+    """
+    Read the table written by :py:func:`write_energies_table`.
+
+    Returns
+    -------
+    list of str
+        The names of the models.
+
+    dict
+        The values of each energy term, as `{term: np.ndarray}`, to be
+        given to :py:func:`calc_haddock_scores`.
+
+    dict
+        The weights used to score the models in the step.
+    """
+    with open(fname) as fh:
+        weights_line = fh.readline().rstrip(os.linesep).split("\t")[1:]
+        terms = fh.readline().rstrip(os.linesep).split("\t")[1:]
+        rows = [line.rstrip(os.linesep).split("\t") for line in fh]
+
+    weights = {}
+    for item in weights_line:
+        key, value = item.split("=")
+        weights[key] = float(value)
+
+    model_names = [row[0] for row in rows]
+    values = np.array([row[1:] for row in rows], dtype=float)
+    values = values.reshape(len(rows), len(terms))
+    energies_table = {term: values[:, i] for i, term in enumerate(terms)}
+    return model_names, energies_table, weights
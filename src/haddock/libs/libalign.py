@@ -8,15 +8,25 @@ Main functions
 * :py:func:`calc_rmsd`
 * :py:func:`centroid`
 * :py:func:`kabsch`
+* :py:func:`kabsch_rmsd`
+* :py:func:`kabsch_rmsd_one_vs_many`
+* :py:func:`kabsch_rmsd_pairs`
+* :py:class:`PDBStructure`
+* :py:func:`load_structure`
 * :py:func:`load_coords`
+* :py:func:`filter_coord_dic`
 * :py:func:`pdb2fastadic`
 * :py:func:`get_atoms`
 * :py:func:`get_align`
+* :py:func:`get_cached_alignment`
+* :py:func:`cache_alignment`
 * :py:func:`align_struct`
 * :py:func:`align_seq`
 * :py:func:`make_range`
 * :py:func:`dump_as_izone`
 """
+import hashlib
+import json
 import os
 import shlex
 import subprocess
@@ -27,6 +37,7 @@ import numpy as np
 from Bio import Align
 from Bio.Align import substitution_matrices
 from Bio.Seq import Seq
+from scipy.spatial import cKDTree
 
 from haddock import log
 from haddock.libs.libontology import PDBFile
@@ -35,6 +46,17 @@ from haddock.libs.libpdb import split_by_chain
 
 RES_TO_BE_IGNORED = ["SHA", "WAT"]
 
+_BLOSUM62 = substitution_matrices.load("BLOSUM62")
+
+# residue numbers are packed in the contacts as unsigned 14-bit integers,
+#  see `PDBStructure.residue_contacts`
+RESNUM_OFFSET = 1000
+RESNUM_BITS = 14
+RESIDUE_BITS = RESNUM_BITS + 8
+
+# Alignments already calculated in this process, see `get_cached_alignment`
+_ALIGNMENT_CACHE = {}
+
 PROT_RES = [
     "ALA",
     "ARG",
@@ -90,22 +112,152 @@ class ALIGNError(Exception):
         super().__init__(self.msg)
 
 
+class PDBStructure:
+    """
+    Atoms of a PDB file, parsed only once.
+
+    The ATOM and HETATM records are stored column-wise, with all the
+    coordinates in a single array, so that the same parsed structure can be
+    used to identify its atoms (:py:func:`get_atoms`), its sequence
+    (:py:func:`pdb2fastadic`), its coordinates (:py:func:`load_coords`)
+    and its intermolecular contacts.
+
+    Parameters
+    ----------
+    pdb_f : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+        The PDB file to be parsed.
+    """
+
+    def __init__(self, pdb_f):
+        if isinstance(pdb_f, PDBFile):
+            pdb_f = pdb_f.rel_path
+        self.pdb_f = pdb_f
+        self.is_atom = []
+        self.name = []
+        self.resname = []
+        self.chain = []
+        self.resnum = []
+        self.element = []
+        coords = []
+        with open(pdb_f) as fh:
+            for line in fh:
+                if line.startswith(("ATOM", "HETATM")):
+                    self.is_atom.append(line.startswith("ATOM"))
+                    self.name.append(line[12:16].strip())
+                    self.resname.append(line[17:20].strip())
+                    self.chain.append(line[21])
+                    self.resnum.append(int(line[22:26]))
+                    self.element.append(line[76:78].strip())
+                    coords.append(
+                        (
+                            float(line[30:38]),
+                            float(line[38:46]),
+                            float(line[46:54]),
+                            )
+                        )
+        self.coords = np.array(coords, dtype=np.float64).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.name)
+
+    def __str__(self):
+        return str(self.pdb_f)
+
+    def intermolecular_contacts(self, cutoff=5.0):
+        """
+        Find the pairs of heavy atoms of different chains in contact.
+
+        Parameters
+        ----------
+        cutoff : float
+            The cutoff distance for the contacts.
+
+        Returns
+        -------
+        pairs : np.ndarray dtype=int, shape=(n_contacts, 2)
+            The indices (i, j), with i < j, of the atoms in contact, sorted
+            by i and then by j.
+        """
+        heavy = np.flatnonzero(np.array(self.element) != "H")
+        pairs = cKDTree(self.coords[heavy]).query_pairs(
+            cutoff,
+            output_type="ndarray",
+            )
+        pairs = heavy[pairs].reshape(-1, 2)
+        chains = np.array(self.chain)
+        pairs = pairs[chains[pairs[:, 0]] != chains[pairs[:, 1]]]
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    def residue_contacts(self, cutoff=5.0):
+        """
+        Find the pairs of residues of different chains in contact.
+
+        Two residues are in contact if any of their heavy atoms are in
+        contact, see :py:meth:`intermolecular_contacts`.
+
+        Each pair is packed in a single integer, combining the chain and
+        the number of both residues, so that the contacts of different
+        structures can be compared as integers.
+
+        Parameters
+        ----------
+        cutoff : float
+            The cutoff distance for the contacts.
+
+        Returns
+        -------
+        contacts : np.ndarray dtype=int64, shape=(n_contacts,)
+            The unique residue contacts, sorted.
+        """
+        pairs = self.intermolecular_contacts(cutoff)
+        chains = np.fromiter(map(ord, self.chain), dtype=np.int64)
+        resnums = np.array(self.resnum, dtype=np.int64) + RESNUM_OFFSET
+        residues = (chains << RESNUM_BITS) | resnums
+        contacts = (
+            (residues[pairs[:, 0]] << RESIDUE_BITS)
+            | residues[pairs[:, 1]]
+            )
+        return np.unique(contacts)
+
+
+def load_structure(pdb_f):
+    """
+    Get the parsed structure of a PDB file.
+
+    Parameters
+    ----------
+    pdb_f : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+        :py:class:`PDBStructure`
+
+    Returns
+    -------
+    :py:class:`PDBStructure`
+        `pdb_f` itself if it was already parsed.
+    """
+    if isinstance(pdb_f, PDBStructure):
+        return pdb_f
+    return PDBStructure(pdb_f)
+
+
 def calc_rmsd(V, W):
     """
     Calculate the RMSD from two vectors.
 
+    Stacks of coordinates are also accepted, in which case one RMSD is
+    calculated for each element of the stack.
+
     Parameters
     ----------
-    V : np.array dtype=float, shape=(n_atoms,3)
-    W : np.array dtype=float, shape=(n_atoms,3)
+    V : np.array dtype=float, shape=(n_atoms,3) or (K,n_atoms,3)
+    W : np.array dtype=float, shape=(n_atoms,3) or (K,n_atoms,3)
 
     Returns
     -------
-    rmsd : float
+    rmsd : float or np.array dtype=float, shape=(K,)
     """
-    diff = np.array(V) - np.array(W)
-    N = len(V)
-    rmsd = np.sqrt((diff * diff).sum() / N)
+    diff = np.asarray(V) - np.asarray(W)
+    N = diff.shape[-2]
+    rmsd = np.sqrt((diff * diff).sum(axis=(-2, -1)) / N)
     return rmsd
 
 
@@ -113,27 +265,27 @@ def kabsch(P, Q):
     """
     Find the rotation matrix using Kabsch algorithm.
 
+    Stacks of coordinates are also accepted, in which case the covariance
+    matrices are built with a single `einsum` and all the SVDs are done
+    in one stacked call.
+
     Parameters
     ----------
-    P : np.array dtype=float, shape=(n_atoms,3)
-    Q : np.array dtype=float, shape=(n_atoms,3)
+    P : np.array dtype=float, shape=(n_atoms,3) or (K,n_atoms,3)
+    Q : np.array dtype=float, shape=(n_atoms,3) or (K,n_atoms,3)
 
     Returns
     -------
-    U : np.array dtype=float, shape=(3,3)
+    U : np.array dtype=float, shape=(3,3) or (K,3,3)
     """
     # Covariance matrix
-    P = np.array(P)
-    Q = np.array(Q)
-    C = np.dot(np.transpose(P), Q)
+    C = np.einsum("...ni,...nj->...ij", P, Q)
     # use SVD
     V, S, W = np.linalg.svd(C)
     d = (np.linalg.det(V) * np.linalg.det(W)) < 0.0
-    if d:
-        S[-1] = -S[-1]
-        V[:, -1] = -V[:, -1]
+    V[..., :, -1] = np.where(d[..., np.newaxis], -V[..., :, -1], V[..., :, -1])
     # Create Rotation matrix U
-    U = np.dot(V, W)
+    U = np.matmul(V, W)
     return U
 
 
@@ -143,24 +295,98 @@ def centroid(X):
 
     Parameters
     ----------
-    X : np.array dtype=float, shape=(n_atoms,3)
+    X : np.array dtype=float, shape=(n_atoms,3) or (K,n_atoms,3)
 
     Returns
     -------
-    C : np.array dtype=float, shape=(3,)
+    C : np.array dtype=float, shape=(3,) or (K,1,3)
     """
-    X = np.array(X)
+    X = np.asarray(X)
+    if X.ndim > 2:
+        return X.mean(axis=-2, keepdims=True)
     C = X.mean(axis=0)
     return C
 
 
+def kabsch_rmsd(P, Q):
+    """
+    Calculate the RMSD after the optimal superposition of P onto Q.
+
+    Parameters
+    ----------
+    P : np.array dtype=float, shape=(n_atoms,3) or (K,n_atoms,3)
+        Mobile coordinates.
+    Q : np.array dtype=float, shape=(n_atoms,3) or (K,n_atoms,3)
+        Reference coordinates.
+
+    Returns
+    -------
+    rmsd : float or np.array dtype=float, shape=(K,)
+    """
+    P = np.asarray(P, dtype=np.float64)
+    Q = np.asarray(Q, dtype=np.float64)
+    P = P - centroid(P)
+    Q = Q - centroid(Q)
+    U = kabsch(P, Q)
+    P = np.matmul(P, U)
+    return calc_rmsd(P, Q)
+
+
+def kabsch_rmsd_one_vs_many(reference, models):
+    """
+    Calculate the RMSD of a stack of models against a single reference.
+
+    Parameters
+    ----------
+    reference : np.array dtype=float, shape=(n_atoms,3)
+    models : np.array dtype=float, shape=(K,n_atoms,3)
+
+    Returns
+    -------
+    rmsd : np.array dtype=float, shape=(K,)
+    """
+    models = np.asarray(models)
+    reference = np.broadcast_to(reference, models.shape)
+    return kabsch_rmsd(models, reference)
+
+
+def kabsch_rmsd_pairs(coords, ref_idx, mod_idx, block_size=512):
+    """
+    Calculate the RMSD of a block of pairs from a stack of coordinates.
+
+    Parameters
+    ----------
+    coords : np.array dtype=float, shape=(n_models,n_atoms,3)
+        The coordinates of all the models, which can be memory-mapped.
+    ref_idx : np.array dtype=int, shape=(K,)
+        Index of the reference model of each pair.
+    mod_idx : np.array dtype=int, shape=(K,)
+        Index of the mobile model of each pair.
+    block_size : int
+        Maximum number of pairs superimposed at once, this bounds the
+        memory used by the stacked arrays.
+
+    Returns
+    -------
+    rmsd : np.array dtype=float, shape=(K,)
+    """
+    npairs = len(ref_idx)
+    rmsd = np.empty(npairs)
+    for start in range(0, npairs, block_size):
+        end = start + block_size
+        Q = coords[ref_idx[start:end]]
+        P = coords[mod_idx[start:end]]
+        rmsd[start:end] = kabsch_rmsd(P, Q)
+    return rmsd
+
+
 def load_coords(pdb_f, atoms, filter_resdic=None, numbering_dic=None):
     """
     Load coordinates from PDB.
 
     Parameters
     ----------
-    pdb_f : PDBFile
+    pdb_f : PDBFile or :py:class:`PDBStructure`
 
     atoms : dict
         dictionary of atoms
@@ -182,50 +408,48 @@ def load_coords(pdb_f, atoms, filter_resdic=None, numbering_dic=None):
     coord_dic = {}
     chain_dic = {}
     idx = 0
-    if isinstance(pdb_f, PDBFile):
-        pdb_f = pdb_f.rel_path
-    with open(pdb_f, "r") as fh:
-        for line in fh.readlines():
-            if line.startswith("ATOM"):
-                atom_name = line[12:16].strip()
-                resname = line[17:20].strip()
-                chain = line[21]
-                resnum = int(line[22:26])
-                x = float(line[30:38])
-                y = float(line[38:46])
-                z = float(line[46:54])
-                coords = np.asarray([x, y, z])
-                if numbering_dic:
-                    try:
-                        resnum = numbering_dic[chain][resnum]
-                    except KeyError:
-                        # this residue is not matched, and so it should
-                        #  not be considered
-                        # self.log(
-                        #     f"WARNING: {chain}.{resnum}.{atom_name}"
-                        #     " was not matched!"
-                        #     )
-                        continue
-                # identifier = f"{chain}.{resnum}.{atom_name}"
-                identifier = (chain, resnum, atom_name)
-                if atom_name not in atoms[resname]:
-                    continue
-                if chain not in chain_dic:
-                    chain_dic[chain] = []
-                if filter_resdic:
-                    # Only retrieve coordinates from the filter_resdic
-                    if (
-                            chain in filter_resdic
-                            and resnum in filter_resdic[chain]
-                            ):
-                        coord_dic[identifier] = coords
-                        chain_dic[chain].append(idx)
-                        idx += 1
-                else:
-                    # retrieve everything
-                    coord_dic[identifier] = coords
-                    chain_dic[chain].append(idx)
-                    idx += 1
+    structure = load_structure(pdb_f)
+    for n, (is_atom, atom_name, resname, chain, resnum) in enumerate(zip(
+            structure.is_atom,
+            structure.name,
+            structure.resname,
+            structure.chain,
+            structure.resnum,
+            )):
+        if not is_atom:
+            continue
+        coords = structure.coords[n]
+        if numbering_dic:
+            try:
+                resnum = numbering_dic[chain][resnum]
+            except KeyError:
+                # this residue is not matched, and so it should
+                #  not be considered
+                # self.log(
+                #     f"WARNING: {chain}.{resnum}.{atom_name}"
+                #     " was not matched!"
+                #     )
+                continue
+        # identifier = f"{chain}.{resnum}.{atom_name}"
+        identifier = (chain, resnum, atom_name)
+        if atom_name not in atoms[resname]:
+            continue
+        if chain not in chain_dic:
+            chain_dic[chain] = []
+        if filter_resdic:
+            # Only retrieve coordinates from the filter_resdic
+            if (
+                    chain in filter_resdic
+                    and resnum in filter_resdic[chain]
+                    ):
+                coord_dic[identifier] = coords
+                chain_dic[chain].append(idx)
+                idx += 1
+        else:
+            # retrieve everything
+            coord_dic[identifier] = coords
+            chain_dic[chain].append(idx)
+            idx += 1
     chain_ranges = {}
     for chain in chain_dic:
         if not chain_dic[chain]:
@@ -239,13 +463,46 @@ def load_coords(pdb_f, atoms, filter_resdic=None, numbering_dic=None):
     return coord_dic, chain_ranges
 
 
+def filter_coord_dic(coord_dic, filter_resdic=None):
+    """
+    Select the coordinates of some residues.
+
+    Equivalent to the `filter_resdic` argument of :py:func:`load_coords`,
+    for coordinates that were already loaded.
+
+    Parameters
+    ----------
+    coord_dic : dict
+        dictionary of coordinates, as returned by :py:func:`load_coords`
+
+    filter_resdic : dict
+        dictionary of residues to be kept (one list per chain). If empty,
+        all the coordinates are kept.
+
+    Returns
+    -------
+    coord_dic : dict
+        dictionary of the selected coordinates
+    """
+    if not filter_resdic:
+        return coord_dic
+    filter_resdic = {
+        chain: set(resnums) for chain, resnums in filter_resdic.items()
+        }
+    return {
+        k: xyz for k, xyz in coord_dic.items()
+        if k[0] in filter_resdic and k[1] in filter_resdic[k[0]]
+        }
+
+
 def get_atoms(pdb):
     """
     Identify what is the molecule type of each PDB.
 
     Parameters
     ----------
-    pdb : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+    pdb : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+        :py:class:`PDBStructure`
         PDB file to have its atoms identified
 
     Returns
@@ -257,33 +514,30 @@ def get_atoms(pdb):
     atom_dic.update(dict((r, PROT_ATOMS) for r in PROT_RES))
     atom_dic.update(dict((r, DNA_ATOMS) for r in DNA_RES))
 
-    if isinstance(pdb, PDBFile):
-        pdb = pdb.rel_path
-
-    with open(pdb) as fh:
-        for line in fh.readlines():
-            if line.startswith(("ATOM", "HETATM")):
-                resname = line[17:20].strip()
-                atom_name = line[12:16].strip()
-                element = line[76:78].strip()
-                if (
-                        resname not in PROT_RES
-                        and resname not in DNA_RES
-                        and resname not in RES_TO_BE_IGNORED
-                        ):
-                    # its neither DNA nor protein, use the heavy atoms
-                    # WARNING: Atoms that belong to unknown residues must
-                    #  be bound to a residue name;
-                    #   For example: residue NEP, also contains
-                    #  CB and CG atoms, if we do not bind it to the
-                    #  residue name, the next functions will include
-                    #  CG and CG atoms in the calculations for all
-                    #  other residue names
-                    if element != "H":
-                        if resname not in atom_dic:
-                            atom_dic[resname] = []
-                        if atom_name not in atom_dic[resname]:
-                            atom_dic[resname].append(atom_name)
+    structure = load_structure(pdb)
+    for resname, atom_name, element in zip(
+            structure.resname,
+            structure.name,
+            structure.element,
+            ):
+        if (
+                resname not in PROT_RES
+                and resname not in DNA_RES
+                and resname not in RES_TO_BE_IGNORED
+                ):
+            # its neither DNA nor protein, use the heavy atoms
+            # WARNING: Atoms that belong to unknown residues must
+            #  be bound to a residue name;
+            #   For example: residue NEP, also contains
+            #  CB and CG atoms, if we do not bind it to the
+            #  residue name, the next functions will include
+            #  CG and CG atoms in the calculations for all
+            #  other residue names
+            if element != "H":
+                if resname not in atom_dic:
+                    atom_dic[resname] = []
+                if atom_name not in atom_dic[resname]:
+                    atom_dic[resname].append(atom_name)
     return atom_dic
 
 
@@ -293,7 +547,8 @@ def pdb2fastadic(pdb_f):
 
     Parameters
     ----------
-    pdb_f : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+    pdb_f : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+        :py:class:`PDBStructure`
 
     Returns
     -------
@@ -330,28 +585,91 @@ def pdb2fastadic(pdb_f):
         )
     seq_dic = {}
 
-    if isinstance(pdb_f, PDBFile):
-        pdb_f = pdb_f.rel_path
-
-    with open(pdb_f) as fh:
-        for line in fh.readlines():
-            if line.startswith("ATOM"):
-                res_num = int(line[22:26])
-                res_name = line[17:20].strip()
-                chain = line[21]
-                if res_name in RES_TO_BE_IGNORED:
-                    continue
-                try:
-                    one_letter = res_codes[res_name]
-                except KeyError:
-                    one_letter = "X"
-                if chain not in seq_dic:
-                    seq_dic[chain] = {}
-                seq_dic[chain][res_num] = one_letter
+    structure = load_structure(pdb_f)
+    for is_atom, res_num, res_name, chain in zip(
+            structure.is_atom,
+            structure.resnum,
+            structure.resname,
+            structure.chain,
+            ):
+        if not is_atom or res_name in RES_TO_BE_IGNORED:
+            continue
+        try:
+            one_letter = res_codes[res_name]
+        except KeyError:
+            one_letter = "X"
+        if chain not in seq_dic:
+            seq_dic[chain] = {}
+        seq_dic[chain][res_num] = one_letter
     return seq_dic
 
 
-def get_align(method, lovoalign_exec):
+def _alignment_cache_key(*args):
+    """Get the hash used to identify an alignment in the cache."""
+    return hashlib.sha1(json.dumps(args).encode("utf-8")).hexdigest()
+
+
+def get_cached_alignment(key, cache_dir=None):
+    """
+    Get an alignment from the cache.
+
+    Alignments are first looked up in memory and then, if `cache_dir` is
+    given, on disk.
+
+    Parameters
+    ----------
+    key : str
+        The hash of the alignment, see :py:func:`cache_alignment`.
+
+    cache_dir : str, Path or None
+        The folder of the on-disk cache.
+
+    Returns
+    -------
+    The cached alignment, or `None` if it is not in the cache.
+    """
+    try:
+        return _ALIGNMENT_CACHE[key]
+    except KeyError:
+        pass
+    if cache_dir is not None:
+        cache_f = Path(cache_dir, f"{key}.json")
+        if cache_f.exists():
+            with open(cache_f) as fh:
+                _ALIGNMENT_CACHE[key] = json.load(fh)
+            return _ALIGNMENT_CACHE[key]
+    return None
+
+
+def cache_alignment(key, alignment, cache_dir=None):
+    """
+    Store an alignment in the cache.
+
+    Parameters
+    ----------
+    key : str
+        The hash of the alignment.
+
+    alignment : dict or list
+        The alignment, it must be serializable as JSON.
+
+    cache_dir : str, Path or None
+        The folder of the on-disk cache. If given, the alignment is also
+        stored on disk, to be reused by other processes or steps.
+    """
+    _ALIGNMENT_CACHE[key] = alignment
+    if cache_dir is not None:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        cache_f = Path(cache_dir, f"{key}.json")
+        # write and rename, so that concurrent readers never see
+        #  an incomplete file
+        tmp_f = Path(cache_dir, f"{key}.{os.getpid()}.tmp")
+        with open(tmp_f, "w") as fh:
+            json.dump(alignment, fh)
+        os.replace(tmp_f, cache_f)
+
+
+def get_align(method, lovoalign_exec, cache_dir=None):
     """
     Get the alignment function.
 
@@ -363,6 +681,10 @@ def get_align(method, lovoalign_exec):
     lovoalign_exec : str
         Path to the lovoalign executable.
 
+    cache_dir : str, Path or None
+        The folder of the on-disk alignment cache, shared among processes
+        and workflow steps. Alignments are always cached in memory.
+
     Returns
     -------
     align_func : functools.partial
@@ -372,10 +694,11 @@ def get_align(method, lovoalign_exec):
     if method == "structure":
         align_func = partial(
             align_strct,
-            lovoalign_exec=lovoalign_exec
+            lovoalign_exec=lovoalign_exec,
+            cache_dir=cache_dir,
             )
     elif method == "sequence":
-        align_func = partial(align_seq)
+        align_func = partial(align_seq, cache_dir=cache_dir)
     else:
         available_alns = ("sequence", "structure")
         raise ValueError(
@@ -385,21 +708,36 @@ def get_align(method, lovoalign_exec):
     return align_func
 
 
-def align_strct(reference, model, output_path, lovoalign_exec=None):
+def align_strct(
+        reference,
+        model,
+        output_path,
+        lovoalign_exec=None,
+        cache_dir=None,
+        ):
     """
     Structuraly align and get numbering relationship.
 
+    The numbering relationship of each chain is cached, keyed on the
+    numbered sequences of the reference and model chains, so LovoAlign
+    runs only once per distinct pair of chains.
+
     Parameters
     ----------
-    reference : :py:class:`haddock.libs.libontology.PDBFile`
+    reference : :py:class:`haddock.libs.libontology.PDBFile` or
+        :py:class:`PDBStructure`
 
-    model : :py:class:`haddock.libs.libontology.PDBFile`
+    model : :py:class:`haddock.libs.libontology.PDBFile` or
+        :py:class:`PDBStructure`
 
     output_path : Path
 
     lovoalign_exec : Path
         lovoalign executable
 
+    cache_dir : str, Path or None
+        The folder of the on-disk alignment cache.
+
     Returns
     -------
     numbering_dic : dict
@@ -418,134 +756,227 @@ def align_strct(reference, model, output_path, lovoalign_exec=None):
     if not os.access(lovoalign_exec, os.X_OK):
         raise ALIGNError(f"{lovoalign_exec!r} for LovoAlign is not executable")
 
+    reference = load_structure(reference)
+    model = load_structure(model)
+
     numbering_dic = {}
-    protein_a_dic = dict(
-        (str(e.stem).split("_")[-1], e) for e in split_by_chain(reference)
-        )
-    protein_b_dic = dict(
-        (str(e.stem).split("_")[-1], e) for e in split_by_chain(model)
-        )
+    ref_chains = list(dict.fromkeys(reference.chain))
 
     # check if chain ids match
-    if protein_a_dic.keys() != protein_b_dic.keys():
+    if set(ref_chains) != set(model.chain):
         # TODO: Make this a clearer raise
         return numbering_dic
 
-    for chain in protein_a_dic.keys():
-        pa_seqdic = pdb2fastadic(protein_a_dic[chain])
-        pb_seqdic = pdb2fastadic(protein_b_dic[chain])
-        # logging.debug(f"Structurally aligning chain {chain}")
-        numbering_dic[chain] = {}
-        cmd = (
-            f"{lovoalign_exec} -p1 {protein_a_dic[chain]} "
-            f"-p2 {protein_b_dic[chain]} "
-            f"-c1 {chain} -c2 {chain}"
+    ref_seqdic = pdb2fastadic(reference)
+    model_seqdic = pdb2fastadic(model)
+
+    # LovoAlign works on the files, split them only if needed
+    protein_a_dic, protein_b_dic = {}, {}
+    for chain in ref_chains:
+        pa_seqdic = ref_seqdic.get(chain, {})
+        pb_seqdic = model_seqdic.get(chain, {})
+        key = _alignment_cache_key(
+            "structure",
+            list(pa_seqdic.items()),
+            list(pb_seqdic.items()),
             )
-
-        # logging.debug(f"Command is: {cmd}")
-        p = subprocess.run(shlex.split(cmd), capture_output=True, text=True)
-        lovoalign_out = p.stdout.split(os.linesep)
-
-        # we don"t need the splitted proteins anymore
-        protein_a_dic[chain].unlink()
-        protein_b_dic[chain].unlink()
-
-        # find out where the alignment starts and ends
-        alignment_pass = True
-        for i, line in enumerate(lovoalign_out):
-            if "SEQUENCE ALIGNMENT" in line:
-                # there are 2 extra white lines after this header
-                alignment_start_index = i + 2
-            elif "FINAL" in line:
-                # there are 2 extra white lines after this header
-                alignment_end_index = i - 2
-            elif "ERROR" in line:
-                failed_pdb = line.split()[-1]
-                _msg = (
-                    f"LovoAlign could not read {failed_pdb} " "is it a ligand?"
+        chain_numbering = get_cached_alignment(key, cache_dir)
+        if chain_numbering is None:
+            if not protein_a_dic:
+                protein_a_dic = dict(
+                    (str(e.stem).split("_")[-1], e)
+                    for e in split_by_chain(reference.pdb_f)
                     )
-                log.warning(_msg)
-                alignment_pass = False
+                protein_b_dic = dict(
+                    (str(e.stem).split("_")[-1], e)
+                    for e in split_by_chain(model.pdb_f)
+                    )
+            chain_numbering = _lovoalign_chain(
+                protein_a_dic[chain],
+                protein_b_dic[chain],
+                chain,
+                pa_seqdic,
+                pb_seqdic,
+                output_path,
+                lovoalign_exec,
+                )
+            cache_alignment(key, chain_numbering, cache_dir)
+        numbering_dic[chain] = dict(chain_numbering)
 
-                for elem in [k for k in pa_seqdic[chain]]:
-                    numbering_dic[chain][elem] = elem
+    # we don"t need the splitted proteins anymore
+    for pdb_f in list(protein_a_dic.values()) + list(protein_b_dic.values()):
+        pdb_f.unlink()
 
-        if not alignment_pass:
-            # This alignment failed, move on to the next
-            log.warning(
-                f"Skipping alignment of chain {chain}, "
-                "used sequential matching"
+    izone_fname = Path(output_path, "lovoalign.izone")
+    log.debug(f"Saving .izone to {izone_fname.name}")
+    dump_as_izone(izone_fname, numbering_dic)
+
+    return numbering_dic
+
+
+def _lovoalign_chain(
+        pdb_a,
+        pdb_b,
+        chain,
+        pa_seqdic,
+        pb_seqdic,
+        output_path,
+        lovoalign_exec,
+        ):
+    """
+    Structuraly align one chain with LovoAlign.
+
+    Returns
+    -------
+    chain_numbering : list
+        (model residue, reference residue) pairs.
+    """
+    chain_numbering = {}
+    # logging.debug(f"Structurally aligning chain {chain}")
+    cmd = (
+        f"{lovoalign_exec} -p1 {pdb_a} "
+        f"-p2 {pdb_b} "
+        f"-c1 {chain} -c2 {chain}"
+        )
+
+    # logging.debug(f"Command is: {cmd}")
+    p = subprocess.run(shlex.split(cmd), capture_output=True, text=True)
+    lovoalign_out = p.stdout.split(os.linesep)
+
+    # find out where the alignment starts and ends
+    alignment_pass = True
+    for i, line in enumerate(lovoalign_out):
+        if "SEQUENCE ALIGNMENT" in line:
+            # there are 2 extra white lines after this header
+            alignment_start_index = i + 2
+        elif "FINAL" in line:
+            # there are 2 extra white lines after this header
+            alignment_end_index = i - 2
+        elif "ERROR" in line:
+            failed_pdb = line.split()[-1]
+            _msg = (
+                f"LovoAlign could not read {failed_pdb} " "is it a ligand?"
                 )
-            continue
+            log.warning(_msg)
+            alignment_pass = False
 
-        aln_l = lovoalign_out[alignment_start_index:alignment_end_index]
+            for elem in [k for k in pa_seqdic]:
+                chain_numbering[elem] = elem
 
-        # dump this alignment to a file
-        aln_fname = Path(output_path, f"lovoalign_{chain}.aln")
-        log.debug(f"Writing alignment to {aln_fname.name}")
-        with open(aln_fname, "w") as fh:
-            fh.write(os.linesep.join(aln_l))
-
-        # remove the line between the alignment segments
-        alignment = [aln_l[i: i + 3][:2] for i in range(0, len(aln_l), 3)]
-        # 100% (5 identical nucleotides / min(length(A),length(B))).
-        len_seq_a = len(pa_seqdic[chain])
-        len_seq_b = len(pb_seqdic[chain])
-        identity = (
-            (len_seq_a - sum([e[0].count("-") for e in alignment]))
-            / min(len_seq_a, len_seq_b)
-            * 100
+    if not alignment_pass:
+        # This alignment failed, move on to the next
+        log.warning(
+            f"Skipping alignment of chain {chain}, "
+            "used sequential matching"
             )
+        return list(chain_numbering.items())
+
+    aln_l = lovoalign_out[alignment_start_index:alignment_end_index]
+
+    # dump this alignment to a file
+    aln_fname = Path(output_path, f"lovoalign_{chain}.aln")
+    log.debug(f"Writing alignment to {aln_fname.name}")
+    with open(aln_fname, "w") as fh:
+        fh.write(os.linesep.join(aln_l))
+
+    # remove the line between the alignment segments
+    alignment = [aln_l[i: i + 3][:2] for i in range(0, len(aln_l), 3)]
+    # 100% (5 identical nucleotides / min(length(A),length(B))).
+    len_seq_a = len(pa_seqdic)
+    len_seq_b = len(pb_seqdic)
+    identity = (
+        (len_seq_a - sum([e[0].count("-") for e in alignment]))
+        / min(len_seq_a, len_seq_b)
+        * 100
+        )
 
-        if identity <= 40.0:
-            log.warning(
-                f"\"Structural\" identity of chain {chain} is {identity:.2f}%,"
-                " please check the results carefully"
-                )
-        else:
-            log.info(
-                f"\"Structural\" identity of chain {chain} is {identity:.2f}%"
-                )
+    if identity <= 40.0:
+        log.warning(
+            f"\"Structural\" identity of chain {chain} is {identity:.2f}%,"
+            " please check the results carefully"
+            )
+    else:
+        log.info(
+            f"\"Structural\" identity of chain {chain} is {identity:.2f}%"
+            )
 
-        # logging.debug("Reading alignment and matching numbering")
-        for element in alignment:
-            line_a, line_b = element
+    # logging.debug("Reading alignment and matching numbering")
+    for element in alignment:
+        line_a, line_b = element
 
-            resnum_a, seq_a, _ = line_a.split()
-            resnum_b, seq_b, _ = line_b.split()
+        resnum_a, seq_a, _ = line_a.split()
+        resnum_b, seq_b, _ = line_b.split()
 
-            resnum_a = int(resnum_a) - 1
-            resnum_b = int(resnum_b) - 1
+        resnum_a = int(resnum_a) - 1
+        resnum_b = int(resnum_b) - 1
 
-            for resname_a, resname_b in zip(seq_a, seq_b):
-                if resname_a != "-":
-                    resnum_a += 1
+        for resname_a, resname_b in zip(seq_a, seq_b):
+            if resname_a != "-":
+                resnum_a += 1
 
-                if resname_b != "-":
-                    resnum_b += 1
+            if resname_b != "-":
+                resnum_b += 1
 
-                if resname_a != "-" and resname_b != "-":
-                    numbering_dic[chain][resnum_b] = resnum_a
+            if resname_a != "-" and resname_b != "-":
+                chain_numbering[resnum_b] = resnum_a
 
-    izone_fname = Path(output_path, "lovoalign.izone")
-    log.debug(f"Saving .izone to {izone_fname.name}")
-    dump_as_izone(izone_fname, numbering_dic)
+    return list(chain_numbering.items())
 
-    return numbering_dic
 
+def _pairwise_align(seq_ref, seq_model):
+    """
+    Align two sequences with BLOSUM62.
 
-def align_seq(reference, model, output_path):
+    Returns
+    -------
+    alignment : dict
+        The text of the top alignment, its aligned segments in each
+        sequence and the identity.
+    """
+    aligner = Align.PairwiseAligner()
+    aligner.substitution_matrix = _BLOSUM62
+    alns = aligner.align(seq_ref, seq_model)
+    top_aln = alns[0]
+    aligned_ref_segment, aligned_model_segment = top_aln.aligned
+
+    # this should always be true
+    assert len(aligned_ref_segment) == len(aligned_model_segment)
+
+    identity = (
+        str(top_aln).count("|") / float(min(len(seq_ref), len(seq_model)))
+        ) * 100
+
+    return {
+        "alignment": str(top_aln),
+        "ref_segments": [[int(s), int(e)] for s, e in aligned_ref_segment],
+        "model_segments": [
+            [int(s), int(e)] for s, e in aligned_model_segment
+            ],
+        "identity": identity,
+        }
+
+
+def align_seq(reference, model, output_path, cache_dir=None):
     """
     Sequence align and get the numbering relationship.
 
+    The alignment of each chain is cached, keyed on the sequences of the
+    reference and model chains, so that it is calculated only once per
+    distinct pair of sequences.
+
     Parameters
     ----------
-    reference : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+    reference : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+        :py:class:`PDBStructure`
 
-    model : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+    model : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+        :py:class:`PDBStructure`
 
     output_path : Path
 
+    cache_dir : str, Path or None
+        The folder of the on-disk alignment cache.
+
     Returns
     -------
     align_dic : dict
@@ -571,25 +1002,22 @@ def align_seq(reference, model, output_path):
         seq_ref = Seq("".join(seqdic_ref[ref_chain].values()))
         seq_model = Seq("".join(seqdic_model[model_chain].values()))
 
-        aligner = Align.PairwiseAligner()
-        aligner.substitution_matrix = substitution_matrices.load("BLOSUM62")
-        alns = aligner.align(seq_ref, seq_model)
-        top_aln = alns[0]
+        key = _alignment_cache_key("sequence", str(seq_ref), str(seq_model))
+        top_aln = get_cached_alignment(key, cache_dir)
+        if top_aln is None:
+            top_aln = _pairwise_align(seq_ref, seq_model)
+            cache_alignment(key, top_aln, cache_dir)
 
         aln_fname = Path(output_path, f"blosum62_{ref_chain}.aln")
         log.debug(f"Writing alignment to {aln_fname.name}")
         with open(aln_fname, "w") as fh:
-            fh.write(str(top_aln))
-        aligned_ref_segment, aligned_model_segment = top_aln.aligned
-
-        # this should always be true
-        assert len(aligned_ref_segment) == len(aligned_model_segment)
+            fh.write(top_aln["alignment"])
+        aligned_ref_segment = top_aln["ref_segments"]
+        aligned_model_segment = top_aln["model_segments"]
 
-        identity = (
-            str(top_aln).count("|") / float(min(len(seq_ref), len(seq_model)))
-            ) * 100
+        identity = top_aln["identity"]
 
-        if not any(e for e in top_aln.aligned):
+        if not aligned_ref_segment:
             # No alignment!
             log.warning(
                 f"No alignment for chain {ref_chain} is it protein/dna? "
@@ -601,7 +1029,7 @@ def align_seq(reference, model, output_path):
                 # this sequence contains only ligands, do it manually
                 if len(seq_ref) != len(seq_model):
                     # we cannot handle this
-                    raise f"Cannot align chain {model_chain}"
+                    raise AlignError(f"Cannot align chain {model_chain}")
                 for ref_res, model_res in zip(
                         seqdic_ref[ref_chain],
                         seqdic_model[model_chain]):
@@ -620,16 +1048,18 @@ def align_seq(reference, model, output_path):
                     f"Sequence identity between chain {ref_chain} "
                     f" of {reference} and {model} is "
                     f"{identity:.2f}%")
+            reslist_ref_all = list(seqdic_ref[ref_chain].keys())
+            reslist_model_all = list(seqdic_model[model_chain].keys())
             for ref_segment, model_segment in zip(
                     aligned_ref_segment, aligned_model_segment):
 
                 start_ref_segment, end_ref_segment = ref_segment
                 start_model_segment, end_model_segment = model_segment
 
-                reslist_ref = list(seqdic_ref[ref_chain].keys())[
+                reslist_ref = reslist_ref_all[
                     start_ref_segment:end_ref_segment]
 
-                reslist_model = list(seqdic_model[model_chain].keys())[
+                reslist_model = reslist_model_all[
                     start_model_segment:end_model_segment]
 
                 for _ref_res, _model_res in zip(reslist_ref, reslist_model):
@@ -5,14 +5,42 @@ Library of functions related to the clustering modules.
 Main functions
 --------------
 
-* :py:func:`write_unclustered_list`
+* :py:func:`write_structure_list`
+* :py:func:`init_condensed_matrix`
+* :py:func:`open_condensed_matrix`
+* :py:func:`read_matrix_header`
+* :py:func:`export_condensed_matrix`
+
+Condensed matrix format
+-----------------------
+
+Pairwise distance matrices (for example, the RMSD matrix) are stored as a
+binary file containing the upper triangle of the matrix, row by row, in the
+same order used by :py:func:`scipy.spatial.distance.squareform`. The file
+starts with the 8-byte magic string ``HD3MATRX``, followed by the format
+version and the length of a JSON header (two little-endian uint32). The JSON
+header holds the number of models, the number of pairs, the data type and the
+names of the models in matrix order. The distances start at the first
+64-byte boundary after the header, as little-endian float32 values, so that
+the file can be memory-mapped directly with :py:class:`numpy.memmap`.
 """
+import json
 import os
+import struct
 from pathlib import Path
 
+import numpy as np
+
 from haddock import log
 
 
+MATRIX_MAGIC = b"HD3MATRX"
+MATRIX_VERSION = 1
+MATRIX_DTYPE = np.dtype("<f4")
+_MATRIX_PREAMBLE = struct.Struct("<II")
+_MATRIX_ALIGNMENT = 64
+
+
 def write_structure_list(input_models, clustered_models):
     """
     Get the list of unclustered structures.
@@ -45,3 +73,192 @@ def write_structure_list(input_models, clustered_models):
     log.info('Saving structure list to clustfcc.tsv')
     with open(output_fname, 'w') as out_fh:
         out_fh.write(output_str)
+
+
+def _matrix_offset(header_len):
+    """Get the offset of the data block given the JSON header length."""
+    size = len(MATRIX_MAGIC) + _MATRIX_PREAMBLE.size + header_len
+    return -(-size // _MATRIX_ALIGNMENT) * _MATRIX_ALIGNMENT
+
+
+def init_condensed_matrix(fname, model_names, fill_value=np.nan):
+    """
+    Create a binary condensed matrix file.
+
+    The data block is allocated for all the pairs of models and filled with
+    `fill_value`, so that the workers can later write their slices
+    independently with :py:func:`open_condensed_matrix`.
+
+    Parameters
+    ----------
+    fname : str or pathlib.Path
+        Path of the matrix file to be created.
+
+    model_names : list
+        Names of the models, in matrix order.
+
+    fill_value : float
+        Initial value of the matrix elements.
+
+    Returns
+    -------
+    header : dict
+        The header of the matrix file, as returned by
+        :py:func:`read_matrix_header`.
+    """
+    nmodels = len(model_names)
+    npairs = nmodels * (nmodels - 1) // 2
+    header = {
+        "nmodels": nmodels,
+        "npairs": npairs,
+        "dtype": MATRIX_DTYPE.str,
+        "models": [str(name) for name in model_names],
+        }
+    header_bytes = json.dumps(header).encode("utf-8")
+    offset = _matrix_offset(len(header_bytes))
+    with open(fname, "wb") as fout:
+        fout.write(MATRIX_MAGIC)
+        fout.write(_MATRIX_PREAMBLE.pack(MATRIX_VERSION, len(header_bytes)))
+        fout.write(header_bytes)
+        fout.write(b"\0" * (offset - fout.tell()))
+        fout.truncate(offset + npairs * MATRIX_DTYPE.itemsize)
+    if npairs and fill_value != 0:
+        matrix = np.memmap(
+            fname,
+            dtype=MATRIX_DTYPE,
+            mode="r+",
+            offset=offset,
+            shape=(npairs,),
+            )
+        matrix[:] = fill_value
+        matrix.flush()
+        del matrix
+    header["offset"] = offset
+    return header
+
+
+def is_condensed_matrix(fname):
+    """Check whether `fname` is a binary condensed matrix file."""
+    with open(fname, "rb") as fin:
+        return fin.read(len(MATRIX_MAGIC)) == MATRIX_MAGIC
+
+
+def read_matrix_header(fname):
+    """
+    Read the header of a binary condensed matrix file.
+
+    Parameters
+    ----------
+    fname : str or pathlib.Path
+        Path to the matrix file.
+
+    Returns
+    -------
+    header : dict
+        Dictionary with the `nmodels`, `npairs`, `dtype`, `models` and
+        `offset` (the position in bytes of the first matrix element) keys.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a valid condensed matrix file.
+    """
+    with open(fname, "rb") as fin:
+        magic = fin.read(len(MATRIX_MAGIC))
+        if magic != MATRIX_MAGIC:
+            raise ValueError(f"{fname} is not a binary condensed matrix")
+        version, header_len = _MATRIX_PREAMBLE.unpack(
+            fin.read(_MATRIX_PREAMBLE.size)
+            )
+        if version != MATRIX_VERSION:
+            raise ValueError(
+                f"{fname}: unsupported matrix format version {version}"
+                )
+        header = json.loads(fin.read(header_len).decode("utf-8"))
+    header["offset"] = _matrix_offset(header_len)
+    expected_size = (
+        header["offset"]
+        + header["npairs"] * np.dtype(header["dtype"]).itemsize
+        )
+    if Path(fname).stat().st_size != expected_size:
+        raise ValueError(f"{fname} is truncated or corrupted")
+    return header
+
+
+def open_condensed_matrix(fname, mode="r", start=0, count=None):
+    """
+    Memory-map (a slice of) a binary condensed matrix file.
+
+    Parameters
+    ----------
+    fname : str or pathlib.Path
+        Path to the matrix file.
+
+    mode : str
+        Memory-map mode: `r` to read, `r+` to write the matrix elements.
+
+    start : int
+        Index of the first matrix element to map.
+
+    count : int or None
+        Number of elements to map. If `None`, the elements from `start` to
+        the end of the matrix are mapped.
+
+    Returns
+    -------
+    matrix : np.memmap
+        The condensed matrix elements.
+    """
+    header = read_matrix_header(fname)
+    npairs = header["npairs"]
+    if count is None:
+        count = npairs - start
+    if start < 0 or count < 0 or start + count > npairs:
+        raise ValueError(
+            f"slice [{start}:{start + count}] out of the {npairs} "
+            "matrix elements"
+            )
+    dtype = np.dtype(header["dtype"])
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(
+        fname,
+        dtype=dtype,
+        mode=mode,
+        offset=header["offset"] + start * dtype.itemsize,
+        shape=(count,),
+        )
+
+
+def export_condensed_matrix(fname, output_fname, fmt=".3f"):
+    """
+    Export a binary condensed matrix to a human-readable text file.
+
+    Each line of the output file contains the (1-based) indices of the pair
+    of models and their distance.
+
+    Parameters
+    ----------
+    fname : str or pathlib.Path
+        Path to the binary matrix file.
+
+    output_fname : str or pathlib.Path
+        Path to the text file to be written.
+
+    fmt : str
+        Format specification of the distance values.
+    """
+    header = read_matrix_header(fname)
+    nmodels = header["nmodels"]
+    matrix = open_condensed_matrix(fname)
+    start = 0
+    with open(output_fname, "w") as out_fh:
+        # one matrix row at a time, to keep the memory usage bounded
+        for i in range(nmodels - 1):
+            row = matrix[start:start + nmodels - i - 1]
+            out_fh.writelines(
+                f"{i + 1} {j} {value:{fmt}}{os.linesep}"
+                for j, value in enumerate(row.tolist(), start=i + 2)
+                )
+            start += nmodels - i - 1
+    log.info(f"{output_fname} created.")
@@ -16,6 +16,9 @@ from haddock.libs.libutil import transform_to_list
 
 RND = RandomNumberGenerator()
 
+# shared parts of the CNS inputs already written, see `write_shared_inputs`
+_SHARED_INPUTS = {}
+
 
 def generate_default_header(path=None):
     """Generate CNS default header."""
@@ -184,9 +187,19 @@ def load_boxtyp20(waterbox_param):
         boxtyp20=waterbox_param)
 
 
+def draw_seed():
+    """Draw the seed of a model's CNS input."""
+    return RND.randint(100, 999)
+
+
 # This is used by docking
-def prepare_multiple_input(pdb_input_list, psf_input_list):
-    """Prepare multiple input files."""
+def prepare_multiple_input(pdb_input_list, psf_input_list, seed=None):
+    """
+    Prepare multiple input files.
+
+    If `seed` is `None`, a new seed is drawn from the random number
+    generator of the module.
+    """
     input_str = f"{linesep}! Input structure{linesep}"
     for psf in psf_input_list:
         input_str += f"structure{linesep}"
@@ -207,7 +220,8 @@ def prepare_multiple_input(pdb_input_list, psf_input_list):
     ncomponents = len(set(itertools.chain(*chain_l)))
     input_str += write_eval_line('ncomponents', ncomponents)
 
-    seed = RND.randint(100, 999)
+    if seed is None:
+        seed = draw_seed()
     input_str += write_eval_line('seed', seed)
 
     return input_str
@@ -251,6 +265,52 @@ def prepare_single_input(pdb_input, psf_input=None):
     return input_str
 
 
+def write_shared_inputs(identifier, recipe_str, defaults):
+    """
+    Write the parts of the CNS inputs shared by all the models of a step.
+
+    The parameters header and the recipe are the same for all the
+    models of a step. They are rendered and written once, to
+    `<identifier>_header.inp` and `<identifier>_recipe.inp` in the
+    current working directory, and included by each model's .inp.
+
+    The written files are cached per working directory and `identifier`
+    and written again only if `defaults` or `recipe_str` change.
+
+    Parameters
+    ----------
+    identifier : str
+        The prefix of the CNS input files, usually the module name.
+
+    recipe_str : str
+        The CNS recipe.
+
+    defaults : dict
+        The parameters to write in the header.
+
+    Returns
+    -------
+    tuple of :py:class:`pathlib.Path`
+        The header and the recipe files.
+    """
+    header_file = Path(f"{identifier}_header.inp")
+    recipe_file = Path(f"{identifier}_recipe.inp")
+
+    key = (Path.cwd(), identifier)
+    cached = _SHARED_INPUTS.get(key)
+    if cached is not None \
+            and cached[0] == recipe_str \
+            and cached[1] == defaults \
+            and header_file.exists() \
+            and recipe_file.exists():
+        return header_file, recipe_file
+
+    header_file.write_text(load_workflow_params(**defaults))
+    recipe_file.write_text(recipe_str)
+    _SHARED_INPUTS[key] = (recipe_str, dict(defaults))
+    return header_file, recipe_file
+
+
 def prepare_cns_input(
         model_number,
         input_element,
@@ -260,6 +320,7 @@ def prepare_cns_input(
         identifier,
         native_segid=False,
         default_params_path=None,
+        lazy=False,
         ):
     """
     Generate the .inp file needed by the CNS engine.
@@ -270,83 +331,166 @@ def prepare_cns_input(
         The number of the model. Will be used as file name suffix.
 
     input_element : `libs.libontology.Persisten`, list of those
+
+    lazy : bool
+        If `True`, the .inp file is not written. Instead, returns a
+        :py:class:`CNSInput` that writes it when the CNS job runs,
+        so that the inputs are prepared by the workers.
+
+    Returns
+    -------
+    :py:class:`pathlib.Path` or :py:class:`CNSInput`
+        The .inp file, or the object writing it if `lazy` is `True`.
+
+    Notes
+    -----
+    Only the parts specific to the model are written in the .inp file.
+    The parameters header and the recipe are written once per step by
+    :py:func:`write_shared_inputs` and included inline.
     """
-    # read the default parameters
-    default_params = load_workflow_params(**defaults)
-
-    # write the PDBs
-    pdb_list = [
-        pdb.rel_path
-        for pdb in transform_to_list(input_element)
-        ]
-
-    # write the PSFs
-    psf_list = []
-    if isinstance(input_element, (list, tuple)):
-        for pdb in input_element:
-            if isinstance(pdb.topology, (list, tuple)):
-                for psf in pdb.topology:
-                    psf_fname = psf.rel_path
-                    psf_list.append(psf_fname)
-            else:
-                psf_fname = pdb.topology.rel_path
-                psf_list.append(psf_fname)
+    header_file, recipe_file = write_shared_inputs(
+        identifier,
+        recipe_str,
+        defaults,
+        )
 
-    elif isinstance(input_element.topology, (list, tuple)):
-        pdb = input_element  # for clarity
-        for psf in pdb.topology:
-            psf_fname = psf.rel_path
-            psf_list.append(psf_fname)
-    else:
-        pdb = input_element  # for clarity
-        psf_fname = pdb.topology.rel_path
-        psf_list.append(psf_fname)
+    cns_input = CNSInput(
+        model_number,
+        input_element,
+        identifier,
+        header_file,
+        recipe_file,
+        native_segid=native_segid,
+        # the seeds are drawn here, in the order of the models, so that
+        #  they do not depend on which worker prepares the input
+        seed=draw_seed(),
+        )
 
-    input_str = prepare_multiple_input(pdb_list, psf_list)
+    if lazy:
+        return cns_input
+    return cns_input.write()
 
-    output_pdb_filename = f"{identifier}_{model_number}.pdb"
 
-    output = f"{linesep}! Output structure{linesep}"
-    output += write_eval_line('output_pdb_filename', output_pdb_filename)
+class CNSInput:
+    """
+    The .inp file of a model, written on demand.
 
-    # prepare chain/seg IDs
-    segid_str = ""
-    if native_segid:
-        chainid_list = []
+    Holds the data specific to the model. The parameters header and the
+    recipe shared by all the models of the step are included from the
+    files written by :py:func:`write_shared_inputs`.
+    """
+
+    def __init__(
+            self,
+            model_number,
+            input_element,
+            identifier,
+            header_file,
+            recipe_file,
+            native_segid=False,
+            seed=None,
+            ):
+        self.model_number = model_number
+        self.input_element = input_element
+        self.identifier = identifier
+        self.header_file = header_file
+        self.recipe_file = recipe_file
+        self.native_segid = native_segid
+        self.seed = seed
+        self.path = Path(f"{identifier}_{model_number}.inp")
+
+    def __repr__(self):
+        return f"CNSInput({self.path})"
+
+    def __str__(self):
+        return str(self.path)
+
+    def __fspath__(self):
+        return str(self.path)
+
+    def write(self):
+        """
+        Write the .inp file in the current working directory.
+
+        Returns
+        -------
+        :py:class:`pathlib.Path`
+            The .inp file.
+        """
+        input_element = self.input_element
+
+        # write the PDBs
+        pdb_list = [
+            pdb.rel_path
+            for pdb in transform_to_list(input_element)
+            ]
+
+        # write the PSFs
+        psf_list = []
         if isinstance(input_element, (list, tuple)):
             for pdb in input_element:
+                if isinstance(pdb.topology, (list, tuple)):
+                    for psf in pdb.topology:
+                        psf_fname = psf.rel_path
+                        psf_list.append(psf_fname)
+                else:
+                    psf_fname = pdb.topology.rel_path
+                    psf_list.append(psf_fname)
 
-                segids, chains = \
-                    libpdb.identify_chainseg(pdb.rel_path, sort=False)
+        elif isinstance(input_element.topology, (list, tuple)):
+            pdb = input_element  # for clarity
+            for psf in pdb.topology:
+                psf_fname = psf.rel_path
+                psf_list.append(psf_fname)
+        else:
+            pdb = input_element  # for clarity
+            psf_fname = pdb.topology.rel_path
+            psf_list.append(psf_fname)
 
-                chainsegs = sorted(list(set(segids) | set(chains)))
-                chainid_list.extend(chainsegs)
+        input_str = prepare_multiple_input(pdb_list, psf_list, seed=self.seed)
 
-            for i, _chainseg in enumerate(chainid_list, start=1):
-                segid_str += write_eval_line(f'prot_segid_{i}', _chainseg)
+        output_pdb_filename = f"{self.identifier}_{self.model_number}.pdb"
 
-        else:
-            segids, chains = \
-                libpdb.identify_chainseg(input_element.rel_path, sort=False)
+        output = f"{linesep}! Output structure{linesep}"
+        output += write_eval_line('output_pdb_filename', output_pdb_filename)
 
-            chainsegs = sorted(list(set(segids) | set(chains)))
+        # prepare chain/seg IDs
+        segid_str = ""
+        if self.native_segid:
+            chainid_list = []
+            if isinstance(input_element, (list, tuple)):
+                for pdb in input_element:
 
-            for i, _chainseg in enumerate(chainsegs, start=1):
-                segid_str += write_eval_line(f'prot_segid_{i}', _chainseg)
+                    segids, chains = \
+                        libpdb.identify_chainseg(pdb.rel_path, sort=False)
 
-    output += write_eval_line('count', model_number)
+                    chainsegs = sorted(list(set(segids) | set(chains)))
+                    chainid_list.extend(chainsegs)
 
-    inp = (
-        default_params
-        + input_str
-        + output
-        + segid_str
-        + recipe_str
-        )
+                for i, _chainseg in enumerate(chainid_list, start=1):
+                    segid_str += write_eval_line(f'prot_segid_{i}', _chainseg)
+
+            else:
+                segids, chains = \
+                    libpdb.identify_chainseg(input_element.rel_path, sort=False)
+
+                chainsegs = sorted(list(set(segids) | set(chains)))
+
+                for i, _chainseg in enumerate(chainsegs, start=1):
+                    segid_str += write_eval_line(f'prot_segid_{i}', _chainseg)
+
+        output += write_eval_line('count', self.model_number)
+
+        inp = (
+            f"inline @{self.header_file}{linesep}"
+            + input_str
+            + output
+            + segid_str
+            + f"{linesep}inline @{self.recipe_file}{linesep}"
+            )
 
-    inp_file = Path(f"{identifier}_{model_number}.inp")
-    inp_file.write_text(inp)
-    return inp_file
+        self.path.write_text(inp)
+        return self.path
 
 
 def prepare_expected_pdb(model_obj, model_nb, path, identifier):
@@ -1,4 +1,5 @@
 """Module in charge of running tasks in HPC."""
+import math
 import os
 import re
 import shlex
@@ -7,18 +8,42 @@ import time
 from pathlib import Path
 
 from haddock import log, modules_defaults_path
+from haddock.core.exceptions import JobRunningError
 from haddock.gear.yaml2cfg import read_from_yaml_config
 
 
-STATE_REGEX = r"JobState=(\w*)"
+# `squeue -r -o '%i %T'` lines: <job id>_<array index> <state>
+SLURM_ARRAY_STATE_REGEX = r"(\d+)_(\d+)\s+(\w+)"
+# `qstat -t` lines: <job number>[<array index>].<server> ... <state> <queue>
+TORQUE_ARRAY_STATE_REGEX = r"^(\d+)\[(\d+)\]\S*\s.*\s([QRHWEC])\s+\S+\s*$"
+# environment variable with the number of the first job of a job array
+OFFSET_VAR = "HADDOCK3_JOB_OFFSET"
 
+# the states of the Slurm jobs still in the queue, any other state
+#  (COMPLETED, FAILED, CANCELLED, TIMEOUT, ...) means the job has ended
 JOB_STATUS_DIC = {
     "PENDING": "submitted",
+    "CONFIGURING": "submitted",
+    "REQUEUED": "submitted",
+    "REQUEUE_FED": "submitted",
     "RUNNING": "running",
-    "SUSPENDED": "hold",
     "COMPLETING": "running",
-    "COMPLETED": "finished",
-    "FAILED": "failed",
+    "RESIZING": "running",
+    "SIGNALING": "running",
+    "STAGE_OUT": "running",
+    "SUSPENDED": "hold",
+    "STOPPED": "hold",
+    "REQUEUE_HOLD": "hold",
+    "RESV_DEL_HOLD": "hold",
+    "SPECIAL_EXIT": "hold",
+    }
+
+TORQUE_STATUS_DIC = {
+    "Q": "submitted",
+    "W": "submitted",
+    "H": "hold",
+    "R": "running",
+    "E": "running",
     }
 
 # if you change these defaults, chage also the values in the
@@ -27,214 +52,11 @@ _tmpcfg = read_from_yaml_config(modules_defaults_path)
 HPCScheduler_CONCAT_DEFAULT = _tmpcfg["concat"]  # original value 1
 HPCWorker_QUEUE_LIMIT_DEFAULT = _tmpcfg["queue_limit"]  # original value 100
 HPCWorker_QUEUE_DEFAULT = _tmpcfg["queue"]  # original value ""
+HPCWorker_NCORES_DEFAULT = _tmpcfg["hpc_ncores"]  # original value 1
+HPCScheduler_JOB_RUNTIME_DEFAULT = _tmpcfg["hpc_job_runtime"]  # orig. 0
 del _tmpcfg
 
 
-class HPCWorker:
-    """Defines the HPC Job."""
-
-    def __init__(
-            self,
-            tasks,
-            num,
-            job_id=None,
-            workfload_manager='slurm',
-            queue=None
-            ):
-        """
-        Define the HPC job.
-
-        Parameters
-        ----------
-        tasks : list of libs.libcns.CNSJob objects
-
-        num : int
-            The number of the worker.
-        """
-        self.tasks = tasks
-        log.debug(f"HPCWorker ready with {len(self.tasks)}")
-        self.job_num = num
-        self.job_id = job_id
-        self.job_status = "unknown"
-
-        self.moddir = Path(tasks[0].envvars['MODDIR'])
-        self.toppar = tasks[0].envvars['TOPPAR']
-        self.cns_folder = tasks[0].envvars['MODULE']
-        module_name = \
-            Path(tasks[0].envvars['MODDIR']).resolve().stem.split('_')[-1]
-        self.job_fname = Path(self.moddir, f'{module_name}_{num}.job')
-        self.workload_manager = workfload_manager
-        self.queue = queue
-
-    def prepare_job_file(self, queue_type='slurm'):
-        """Prepare the job file for all the jobs in the task list."""
-        job_file_contents = create_job_header_funcs[queue_type](
-            job_name='haddock3',
-            queue=self.queue,
-            ncores=1,
-            work_dir=self.moddir,
-            stdout_path=self.job_fname.with_suffix('.out'),
-            stderr_path=self.job_fname.with_suffix('.err'),
-            )
-
-        job_file_contents += create_CNS_export_envvars(
-            MODDIR=self.moddir,
-            MODULE=self.cns_folder,
-            TOPPAR=self.toppar,
-            )
-
-        job_file_contents += f"cd {self.moddir}{os.linesep}"
-        for job in self.tasks:
-            cmd = (
-                f"{job.cns_exec} < {job.input_file} > {job.output_file}"
-                f"{os.linesep}"
-                )
-            job_file_contents += cmd
-
-        self.job_fname.write_text(job_file_contents)
-
-    def run(self):
-        """Execute the tasks."""
-        self.prepare_job_file(self.workload_manager)
-        cmd = f"sbatch {self.job_fname}"
-        p = subprocess.run(shlex.split(cmd), capture_output=True)
-        self.job_id = int(p.stdout.decode("utf-8").split()[-1])
-        self.job_status = "submitted"
-
-    def update_status(self):
-        """Retrieve the status of this worker."""
-        cmd = f"scontrol show jobid -dd {self.job_id}"
-        p = subprocess.run(shlex.split(cmd), capture_output=True)
-        out = p.stdout.decode("utf-8")
-        # err = p.stderr.decode('utf-8')
-        if out:
-            # https://regex101.com/r/M2vbAc/1
-            status = re.findall(STATE_REGEX, out)[0]
-            self.job_status = JOB_STATUS_DIC[status]
-        else:
-            self.job_status = "finished"
-
-        return self.job_status
-
-    def cancel(self, bypass_statuses=("finished", "failed")):
-        """Cancel the execution."""
-        if self.update_status() not in bypass_statuses:
-            log.info(f"Canceling {self.job_fname.name} - {self.job_id}")
-            cmd = f"scancel {self.job_id}"
-            _ = subprocess.run(shlex.split(cmd), capture_output=True)
-
-
-class HPCScheduler:
-    """Schedules tasks to run in HPC."""
-
-    def __init__(
-            self,
-            task_list,
-            target_queue=HPCWorker_QUEUE_DEFAULT,
-            queue_limit=HPCWorker_QUEUE_LIMIT_DEFAULT,
-            concat=HPCScheduler_CONCAT_DEFAULT,
-            ):
-        self.num_tasks = len(task_list)
-        self.queue_limit = queue_limit
-        self.concat = concat
-
-        # split tasks according to concat level
-        if concat > 1:
-            log.info(
-                f"Concatenating, each .job will produce {concat} "
-                "(or less) models"
-                )
-        job_list = [
-            task_list[i:i + concat] for i in range(0, len(task_list), concat)
-            ]
-
-        self.worker_list = [
-            HPCWorker(t, j) for j, t in enumerate(job_list, start=1)
-            ]
-
-        # set the queue
-        #  (this is outside the comprehension for clarity)
-        if target_queue:
-            for worker in self.worker_list:
-                worker.queue = target_queue
-
-        log.debug(f"{self.num_tasks} HPC tasks ready.")
-
-    def run(self):
-        """Run tasks in the Queue."""
-        # split by maximum number of submission so we do it in batches
-        adaptive_l = []
-        batch = [
-            self.worker_list[i:i + self.queue_limit]
-            for i in range(0, len(self.worker_list), self.queue_limit)
-            ]
-        total_batches = len(batch)
-        try:
-            for batch_num, worker_list in enumerate(batch, start=1):
-                log.info(f"> Running batch {batch_num}/{total_batches}")
-                start = time.time()
-                for worker in worker_list:
-                    worker.run()
-
-                # check if those finished
-                completed = False
-                while not completed:
-                    for worker in worker_list:
-                        worker.update_status()
-                        if worker.job_status != "finished":
-                            log.info(
-                                f">> {worker.job_fname.name}"
-                                f" {worker.job_status}"
-                                )
-
-                    completed_count = sum(
-                        w.job_status == "finished" for w in worker_list
-                        )
-
-                    failed_count = sum(
-                        w.job_status == "failed" for w in worker_list
-                        )
-
-                    if completed_count + failed_count == len(worker_list):
-                        completed = True
-                        end = time.time()
-                        elapsed = end - start
-                        adaptive_l.append(elapsed)
-                    else:
-                        if not adaptive_l:
-                            # This is the first run, use pre-defined waits
-                            if len(worker_list) < 10:
-                                sleep_timer = 10
-                            elif len(worker_list) < 50:
-                                sleep_timer = 30
-                            else:
-                                sleep_timer = 60
-                        else:
-                            # We already know how long it took, use the average
-                            sleep_timer = round(
-                                sum(adaptive_l) / len(adaptive_l)
-                                )
-                        log.info(f">> Waiting... ({sleep_timer:.2f}s)")
-                        time.sleep(sleep_timer)
-
-                per = (float(batch_num) / float(total_batches)) * 100
-                log.info(
-                    f">> Batch {batch_num}/{total_batches} took "
-                    f"{elapsed:.2f}s to finish, {per:.2f}% complete")
-
-        except KeyboardInterrupt as err:
-            self.terminate()
-            raise err
-
-    def terminate(self):
-        """Terminate all jobs in the queue in a controlled way."""
-        log.info("Terminate signal recieved, removing jobs from the queue...")
-        for worker in self.worker_list:
-            worker.cancel()
-
-        log.info("The jobs in the queue were terminated in a controlled way")
-
-
 def create_slurm_header(
         job_name='haddock3_slurm_job',
         work_dir='.',
@@ -341,8 +163,587 @@ def create_CNS_export_envvars(**envvars):
     return exports + os.linesep + os.linesep
 
 
+def get_job_prefix(task):
+    """
+    Get the path prefix of the job files of a module.
+
+    Parameters
+    ----------
+    task : libs.libsubprocess.CNSJob
+        A task of the module.
+
+    Returns
+    -------
+    pathlib.Path
+        The job files of the module are `{prefix}_{num}.job`.
+    """
+    moddir = Path(task.envvars['MODDIR'])
+    module_name = moddir.resolve().stem.split('_')[-1]
+    return Path(moddir, module_name)
+
+
+class HPCWorker:
+    """Defines the HPC Job."""
+
+    def __init__(
+            self,
+            tasks,
+            num,
+            job_id=None,
+            workfload_manager='slurm',
+            queue=None,
+            ncores=HPCWorker_NCORES_DEFAULT,
+            ):
+        """
+        Define the HPC job.
+
+        Parameters
+        ----------
+        tasks : list of libs.libcns.CNSJob objects
+
+        num : int
+            The number of the worker.
+
+        ncores : int
+            The number of cores of the job. The tasks run concurrently
+            on them.
+        """
+        self.tasks = tasks
+        log.debug(f"HPCWorker ready with {len(self.tasks)}")
+        self.job_num = num
+        self.job_id = job_id
+        self.job_status = "unknown"
+        self.ncores = ncores
+
+        self.moddir = Path(tasks[0].envvars['MODDIR'])
+        self.toppar = tasks[0].envvars['TOPPAR']
+        self.cns_folder = tasks[0].envvars['MODULE']
+        self.job_fname = Path(f"{get_job_prefix(tasks[0])}_{num}.job")
+        self.workload_manager = workfload_manager
+        self.queue = queue
+
+    @property
+    def runtime_fname(self):
+        """File where the job writes its runtime in seconds."""
+        return Path(f"{self.job_fname}.time")
+
+    def prepare_job_file(self, queue_type='slurm'):
+        """Prepare the job file for all the jobs in the task list."""
+        job_file_contents = create_job_header_funcs[queue_type](
+            job_name='haddock3',
+            queue=self.queue,
+            ncores=self.ncores,
+            work_dir=self.moddir,
+            stdout_path=f"{self.job_fname}.out",
+            stderr_path=f"{self.job_fname}.err",
+            )
+
+        job_file_contents += create_CNS_export_envvars(
+            MODDIR=self.moddir,
+            MODULE=self.cns_folder,
+            TOPPAR=self.toppar,
+            )
+
+        job_file_contents += f"cd {self.moddir}{os.linesep}"
+        cmds = "".join(
+            f"{job.cns_exec} < {job.prepare_input()} > {job.output_file}"
+            f"{os.linesep}"
+            for job in self.tasks
+            )
+        if self.ncores > 1 and len(self.tasks) > 1:
+            # run the tasks concurrently on the cores of the job, one
+            #  command per line passed verbatim to `sh`: with a delimiter,
+            #  xargs does not process quotes or backslashes
+            job_file_contents += (
+                f"xargs -d '\\n' -P {self.ncores} -I CMD sh -c CMD << 'EOF'"
+                f"{os.linesep}{cmds}EOF{os.linesep}"
+                )
+        else:
+            job_file_contents += cmds
+        # the job files run in bash, see `SlurmQueue.array_command`
+        job_file_contents += f"echo $SECONDS > {self.runtime_fname}{os.linesep}"
+
+        self.job_fname.write_text(job_file_contents)
+
+    def read_runtime(self):
+        """
+        Read the runtime of the finished job.
+
+        Returns
+        -------
+        int or None
+            The runtime in seconds, `None` if the job did not report it.
+        """
+        try:
+            return int(self.runtime_fname.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+class SlurmQueue:
+    """
+    Submit and follow job arrays with Slurm.
+
+    Each element of an array runs the `.job` file of one
+    :py:class:`HPCWorker`. The number of the worker is the index of the
+    element plus the offset given at submission.
+    """
+
+    header_func = staticmethod(create_slurm_header)
+
+    @staticmethod
+    def array_command(job_prefix):
+        """
+        Get the command an array element runs.
+
+        Parameters
+        ----------
+        job_prefix : pathlib.Path
+            The `.job` files of the workers are `{job_prefix}_{num}.job`.
+
+        Returns
+        -------
+        str
+            The standard output and error of the `.job` files go to
+            `.job.out` and `.job.err` files, not to be confused with the
+            `.out` files of CNS.
+        """
+        return (
+            f"n=$(( {OFFSET_VAR} + SLURM_ARRAY_TASK_ID )){os.linesep}"
+            f"bash {job_prefix}_$n.job > {job_prefix}_$n.job.out "
+            f"2> {job_prefix}_$n.job.err{os.linesep}"
+            )
+
+    @staticmethod
+    def submit(job_fname, size, offset):
+        """
+        Submit a job array.
+
+        Parameters
+        ----------
+        job_fname : pathlib.Path
+            The array job file.
+
+        size : int
+            The number of elements of the array.
+
+        offset : int
+            The number of the worker run by the first element.
+
+        Returns
+        -------
+        str
+            The ID of the job array.
+        """
+        cmd = (
+            f"sbatch --array=0-{size - 1} "
+            f"--export=ALL,{OFFSET_VAR}={offset} {job_fname}"
+            )
+        p = subprocess.run(shlex.split(cmd), capture_output=True)
+        return _parse_job_id(p, job_fname)
+
+    @staticmethod
+    def poll(job_ids):
+        """
+        Get the state of the elements of the job arrays in the queue.
+
+        All the job arrays are queried with a single `squeue` call.
+
+        Parameters
+        ----------
+        job_ids : list of str
+            The IDs of the job arrays.
+
+        Returns
+        -------
+        dict or None
+            The status of each element in the queue, keyed by the
+            `(job_id, index)` of the element. Elements that left the queue
+            are not present. `None` if the batch system could not be
+            queried.
+        """
+        cmd = f"squeue -h -r -o '%i %T' --jobs={','.join(job_ids)}"
+        p = subprocess.run(shlex.split(cmd), capture_output=True)
+        if p.returncode:
+            return None
+        return parse_slurm_states(p.stdout.decode("utf-8"))
+
+    @staticmethod
+    def cancel(job_ids):
+        """Cancel the job arrays."""
+        cmd = f"scancel {' '.join(job_ids)}"
+        _ = subprocess.run(shlex.split(cmd), capture_output=True)
+
+
+class TorqueQueue(SlurmQueue):
+    """Submit and follow job arrays with Torque."""
+
+    header_func = staticmethod(create_torque_header)
+
+    @staticmethod
+    def array_command(job_prefix):
+        """
+        Get the command an array element runs.
+
+        See :py:meth:`SlurmQueue.array_command`.
+        """
+        # the torque job files run in tcsh
+        return (
+            f"@ n = ${OFFSET_VAR} + $PBS_ARRAYID{os.linesep}"
+            f"( bash {job_prefix}_$n.job > {job_prefix}_$n.job.out ) "
+            f">& {job_prefix}_$n.job.err{os.linesep}"
+            )
+
+    @staticmethod
+    def submit(job_fname, size, offset):
+        """
+        Submit a job array.
+
+        See :py:meth:`SlurmQueue.submit`.
+        """
+        cmd = f"qsub -t 0-{size - 1} -v {OFFSET_VAR}={offset} {job_fname}"
+        p = subprocess.run(shlex.split(cmd), capture_output=True)
+        return _parse_job_id(p, job_fname)
+
+    @staticmethod
+    def poll(job_ids):
+        """
+        Get the state of the elements of the job arrays in the queue.
+
+        See :py:meth:`SlurmQueue.poll`.
+        """
+        cmd = f"qstat -t {' '.join(job_ids)}"
+        p = subprocess.run(shlex.split(cmd), capture_output=True)
+        if p.returncode:
+            return None
+        states = {}
+        for job_num, index, state in re.findall(
+                TORQUE_ARRAY_STATE_REGEX,
+                p.stdout.decode("utf-8"),
+                flags=re.MULTILINE,
+                ):
+            if state in TORQUE_STATUS_DIC:
+                # the element IDs carry the server name of the array ID
+                job_id = next(
+                    (_id for _id in job_ids if _id.startswith(f"{job_num}[")),
+                    job_num,
+                    )
+                states[(job_id, int(index))] = TORQUE_STATUS_DIC[state]
+        return states
+
+    @staticmethod
+    def cancel(job_ids):
+        """Cancel the job arrays."""
+        cmd = f"qdel {' '.join(job_ids)}"
+        _ = subprocess.run(shlex.split(cmd), capture_output=True)
+
+
+def parse_slurm_states(squeue_out):
+    """
+    Get the state of the job array elements still in the Slurm queue.
+
+    Parameters
+    ----------
+    squeue_out : str
+        The output of `squeue -h -r -o '%i %T'`.
+
+    Returns
+    -------
+    dict
+        The status of each element in the queue, keyed by the
+        `(job_id, index)` of the element. The elements in any state not
+        in :py:data:`JOB_STATUS_DIC` have ended and are not present.
+    """
+    states = {}
+    for job_id, index, state in re.findall(
+            SLURM_ARRAY_STATE_REGEX,
+            squeue_out,
+            ):
+        if state in JOB_STATUS_DIC:
+            states[(job_id, int(index))] = JOB_STATUS_DIC[state]
+    return states
+
+
+def _parse_job_id(process, job_fname):
+    """Get the job ID from the output of the submission command."""
+    out = process.stdout.decode("utf-8").split()
+    if process.returncode or not out:
+        raise JobRunningError(
+            f"Could not submit {job_fname}: "
+            f"{process.stderr.decode('utf-8').strip()}"
+            )
+    return out[-1]
+
+
+class HPCScheduler:
+    """Schedules tasks to run in HPC."""
+
+    def __init__(
+            self,
+            task_list,
+            target_queue=HPCWorker_QUEUE_DEFAULT,
+            queue_limit=HPCWorker_QUEUE_LIMIT_DEFAULT,
+            concat=HPCScheduler_CONCAT_DEFAULT,
+            batch_type="slurm",
+            ncores=HPCWorker_NCORES_DEFAULT,
+            job_runtime=HPCScheduler_JOB_RUNTIME_DEFAULT,
+            queue_system=None,
+            poll_interval=None,
+            ):
+        """
+        Schedule tasks to run in HPC as job arrays.
+
+        Parameters
+        ----------
+        task_list : list of libs.libsubprocess.CNSJob objects
+
+        target_queue : str
+            The name of the queue of the batch system.
+
+        queue_limit : int
+            The maximum number of jobs in the queue at any time. As jobs
+            finish, new ones are submitted to keep the queue full.
+
+        concat : int
+            The number of tasks run by each job.
+
+        batch_type : str
+            The batch system, one of :py:data:`QUEUE_SYSTEMS`.
+
+        ncores : int
+            The number of cores requested by each job. The tasks of a job
+            run concurrently on its cores.
+
+        job_runtime : int
+            The target runtime of each job, in seconds. If greater than 0,
+            `concat` is adapted to the runtimes of the jobs already
+            finished. Otherwise, `concat` is kept.
+
+        queue_system : object
+            The interface with the batch system. Defaults to the one of
+            `batch_type`, see :py:class:`SlurmQueue` for the methods needed.
+
+        poll_interval : float
+            The seconds between two queries of the state of the jobs. If
+            not given, it grows with the number of jobs in the queue.
+        """
+        self.task_list = task_list
+        self.num_tasks = len(task_list)
+        self.target_queue = target_queue or None
+        self.queue_limit = queue_limit
+        self.concat = concat
+        self.batch_type = batch_type
+        self.ncores = ncores
+        self.job_runtime = job_runtime
+        self.queue_system = queue_system or QUEUE_SYSTEMS[batch_type]()
+        self.poll_interval = poll_interval
+        self.job_ids = []
+        # the jobs run outside Python and return no results, see
+        #  `libs.libparallel.Scheduler.results`
+        self.results = [None] * self.num_tasks
+        # number of the worker run by the first element of each job array
+        self._array_offsets = {}
+        # the workers are created as they are submitted, so that `concat`
+        #  can change during the run
+        self.worker_list = []
+        self._next_task = 0
+        self._task_runtimes = []
+
+        if concat > 1:
+            log.info(
+                f"Concatenating, each .job will produce {concat} "
+                "(or less) models"
+                )
+        if ncores > 1:
+            log.info(f"Each .job will run its models on {ncores} cores")
+
+        log.debug(f"{self.num_tasks} HPC tasks ready.")
+
+    def prepare_array_file(self):
+        """
+        Write the job array file.
+
+        Returns
+        -------
+        pathlib.Path
+            The job array file.
+        """
+        job_prefix = get_job_prefix(self.task_list[0])
+        array_fname = Path(f"{job_prefix}_array.job")
+
+        contents = self.queue_system.header_func(
+            job_name='haddock3',
+            queue=self.target_queue,
+            ncores=self.ncores,
+            work_dir=job_prefix.parent,
+            stdout_path=os.devnull,
+            stderr_path=os.devnull,
+            )
+        contents += self.queue_system.array_command(job_prefix)
+        array_fname.write_text(contents)
+        return array_fname
+
+    def create_workers(self, num_workers):
+        """
+        Create the next workers and their job files.
+
+        Parameters
+        ----------
+        num_workers : int
+            The maximum number of workers to create, each with `concat`
+            tasks.
+
+        Returns
+        -------
+        list of :py:class:`HPCWorker`
+        """
+        workers = []
+        while len(workers) < num_workers and self._next_task < self.num_tasks:
+            tasks = self.task_list[
+                self._next_task:self._next_task + self.concat
+                ]
+            self._next_task += len(tasks)
+            worker = HPCWorker(
+                tasks,
+                len(self.worker_list) + 1,
+                workfload_manager=self.batch_type,
+                queue=self.target_queue,
+                ncores=self.ncores,
+                )
+            worker.prepare_job_file(self.batch_type)
+            self.worker_list.append(worker)
+            workers.append(worker)
+        return workers
+
+    def record_runtimes(self, workers):
+        """Store the runtime per task of finished workers."""
+        for worker in workers:
+            runtime = worker.read_runtime()
+            if runtime is None:
+                continue
+            # the tasks run in waves of `ncores`
+            num_waves = math.ceil(len(worker.tasks) / worker.ncores)
+            self._task_runtimes.append(runtime / num_waves)
+
+    def adapt_concat(self):
+        """Set `concat` so that the jobs last about `job_runtime` seconds."""
+        if self.job_runtime <= 0 or not self._task_runtimes:
+            return
+        task_runtime = sum(self._task_runtimes) / len(self._task_runtimes)
+        # jobs shorter than one second are measured as 0 seconds
+        num_waves = max(1, int(self.job_runtime // max(task_runtime, 1)))
+        concat = self.ncores * num_waves
+        if concat != self.concat:
+            log.info(
+                f"Tasks take {task_runtime:.1f}s on average, each .job "
+                f"will now produce {concat} (or less) models"
+                )
+            self.concat = concat
+
+    def run(self):
+        """Run tasks in the Queue."""
+        if not self.task_list:
+            return
+
+        array_fname = self.prepare_array_file()
+        finished = set()
+        finished_tasks = 0
+        # the job arrays with elements in the queue
+        active_ids = []
+        states = {}
+        start = time.time()
+        try:
+            while True:
+                if active_ids:
+                    polled_states = self.queue_system.poll(active_ids)
+                    if polled_states is None:
+                        log.warning("Could not get the state of the jobs")
+                        time.sleep(self.poll_interval or 10)
+                        continue
+                    states = polled_states
+                    active_ids = sorted({job_id for job_id, _ in states})
+                else:
+                    states = {}
+
+                in_queue = {
+                    self._array_offsets[job_id] + index
+                    for job_id, index in states
+                    }
+                newly_finished = [
+                    worker for worker in self.worker_list
+                    if worker.job_num not in in_queue
+                    and worker.job_num not in finished
+                    ]
+                if newly_finished:
+                    finished.update(w.job_num for w in newly_finished)
+                    finished_tasks += sum(len(w.tasks) for w in newly_finished)
+                    self.record_runtimes(newly_finished)
+                    per = (finished_tasks / float(self.num_tasks)) * 100
+                    running = sum(s == "running" for s in states.values())
+                    log.info(
+                        f">> {finished_tasks}/{self.num_tasks} tasks "
+                        f"finished, {running} jobs running, "
+                        f"{per:.0f}% complete"
+                        )
+
+                if finished_tasks == self.num_tasks:
+                    break
+
+                # keep the queue topped up
+                free_slots = self.queue_limit - len(states)
+                if free_slots > 0 and self._next_task < self.num_tasks:
+                    self.adapt_concat()
+                    workers = self.create_workers(free_slots)
+                    offset = workers[0].job_num
+                    job_id = self.queue_system.submit(
+                        array_fname,
+                        len(workers),
+                        offset,
+                        )
+                    self.job_ids.append(job_id)
+                    self._array_offsets[job_id] = offset
+                    active_ids.append(job_id)
+                    log.info(
+                        f"> Submitted jobs {offset}-"
+                        f"{offset + len(workers) - 1} as job array {job_id}"
+                        )
+
+                sleep_timer = self.poll_interval
+                if sleep_timer is None:
+                    if len(states) < 10:
+                        sleep_timer = 10
+                    elif len(states) < 50:
+                        sleep_timer = 30
+                    else:
+                        sleep_timer = 60
+                time.sleep(sleep_timer)
+
+        except KeyboardInterrupt as err:
+            self.terminate()
+            raise err
+
+        elapsed = time.time() - start
+        log.info(
+            f">> {len(self.worker_list)} jobs took {elapsed:.2f}s to finish"
+            )
+
+    def terminate(self):
+        """Terminate all jobs in the queue in a controlled way."""
+        log.info("Terminate signal recieved, removing jobs from the queue...")
+        if self.job_ids:
+            self.queue_system.cancel(self.job_ids)
+
+        log.info("The jobs in the queue were terminated in a controlled way")
+
+
 # the different job submission queues
 create_job_header_funcs = {
     'torque': create_torque_header,
     'slurm': create_slurm_header,
     }
+
+# the batch systems where job arrays can be submitted
+QUEUE_SYSTEMS = {
+    'torque': TorqueQueue,
+    'slurm': SlurmQueue,
+    }
@@ -5,13 +5,13 @@ import gzip
 import os
 import tarfile
 from functools import partial
-from multiprocessing import Pool
 from pathlib import Path
 
 import yaml
 
 from haddock import log
 from haddock.libs.libontology import PDBFile
+from haddock.libs.libparallel import use_pool
 from haddock.libs.libutil import sort_numbered_paths
 
 
@@ -222,7 +222,7 @@ def working_directory(path):
         os.chdir(prev_cwd)
 
 
-def compress_files_ext(path, ext, ncores=1, **kwargs):
+def compress_files_ext(path, ext, ncores=1, pool=None, **kwargs):
     """
     Compress all files with same extension in folder to `.gz`.
 
@@ -236,6 +236,13 @@ def compress_files_ext(path, ext, ncores=1, **kwargs):
     ext : str
         The extension of the files.
 
+    ncores : int
+        The number of cores.
+
+    pool : :py:class:`haddock.libs.libparallel.WorkerPool` or None
+        The pool of processes shared by the workflow. If not given, new
+        processes are created.
+
     **kwargs : anything
         Arguments passed to :py:func:`gzip_files`.
 
@@ -251,8 +258,8 @@ def compress_files_ext(path, ext, ncores=1, **kwargs):
     files = glob_folder(path, ext)
     gzip_ready = partial(gzip_files, **kwargs)
     if files:
-        with Pool(ncores) as pool:
-            imap = pool.imap_unordered(gzip_ready, files)
+        with use_pool(ncores, pool=pool) as pool_:
+            imap = pool_.imap_unordered(gzip_ready, files)
             for _ in imap:
                 pass
         return True
@@ -8,6 +8,11 @@ from pathlib import Path
 from haddock import log
 
 
+def get_results_path(pickled_tasks):
+    """Get the path of the results of the pickled tasks."""
+    return Path(pickled_tasks).with_suffix(".results.pkl")
+
+
 class MPIScheduler:
     """Schedules tasks to be executed via MPI."""
 
@@ -15,6 +20,9 @@ class MPIScheduler:
         self.tasks = tasks
         self.cwd = Path.cwd()
         self.ncores = ncores
+        # results of the tasks with `return_result`, in the original order
+        self.results = [None] * len(tasks)
+        self.num_failed = 0
 
     def run(self):
         """Send it to the haddock3-mpitask runner."""
@@ -26,17 +34,30 @@ class MPIScheduler:
             f"Executing tasks with the haddock3-mpitask runner using "
             f"{self.ncores} processors..."
             )
-        p = subprocess.run(
-            shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        p = subprocess.Popen(
+            shlex.split(cmd),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
             )
 
-        # out = p.stdout.decode("utf-8")
-        err = p.stderr.decode("utf-8")
+        # the runner reports the progress as the tasks complete
+        output = []
+        for line in p.stdout:
+            line = line.rstrip()
+            if line.startswith(">> "):
+                log.info(line)
+            elif line:
+                log.debug(line)
+                output.append(line)
+        p.wait()
 
-        if err:
-            log.error(err)
+        if p.returncode:
+            log.error("\n".join(output))
             sys.exit()
 
+        self._load_results(pkl_tasks)
+
     def _pickle_tasks(self):
         """Pickle the tasks."""
         fpath = Path(self.cwd, "mpi.pkl")
@@ -44,3 +65,22 @@ class MPIScheduler:
         with open(fpath, "wb") as output_handler:
             pickle.dump(self.tasks, output_handler)
         return fpath
+
+    def _load_results(self, pkl_tasks):
+        """Load the results reported by the runner."""
+        with open(get_results_path(pkl_tasks), "rb") as results_handler:
+            results = pickle.load(results_handler)
+
+        self.num_failed = 0
+        for idx, success, result in results:
+            if not success:
+                self.num_failed += 1
+                continue
+            if getattr(self.tasks[idx], "return_result", False):
+                self.results[idx] = result
+
+        if self.num_failed:
+            log.warning(
+                f"{self.num_failed} of {len(self.tasks)} tasks failed"
+                )
+        log.info(f"{len(results)} tasks finished")
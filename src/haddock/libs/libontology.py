@@ -78,9 +78,12 @@ class PDBFile(Persistent):
 class RMSDFile(Persistent):
     """Represents a RMSD matrix file."""
 
-    def __init__(self, file_name, npairs, path='.'):
+    def __init__(self, file_name, npairs, path='.', dendrogram_dir=None):
         super().__init__(file_name, Format.MATRIX, path)
         self.npairs = npairs
+        # folder, next to the matrix, where the clustering steps save the
+        #  dendrograms calculated from it
+        self.dendrogram_dir = dendrogram_dir
 
     def __hash__(self):
         return id(self)
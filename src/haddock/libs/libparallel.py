@@ -1,6 +1,12 @@
 """Module in charge of parallelizing the execution of tasks."""
 import math
-from multiprocessing import Process
+import os
+import queue
+import traceback
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import Pool, Process, Queue
+from pathlib import Path
 
 from haddock import log
 from haddock.libs.libutil import parse_ncores
@@ -14,42 +20,215 @@ def split_tasks(lst, n):
         yield chunk
 
 
+def _call_in_dir(item, func, cwd):
+    """Call `func` on `item` from the `cwd` directory."""
+    os.chdir(cwd)
+    return func(item)
+
+
+def run_indexed_task(indexed_task):
+    """
+    Run the task of a `(index, task)` pair.
+
+    Returns
+    -------
+    tuple
+        The index of the task, whether it ran without errors, and the value
+        returned by its `run` method if the task has `return_result` set,
+        `None` otherwise.
+    """
+    idx, task = indexed_task
+    try:
+        result = task.run()
+    except Exception:
+        log.error(f"Failed to run task {idx}:\n{traceback.format_exc()}")
+        return idx, False, None
+    if not getattr(task, "return_result", False):
+        result = None
+    return idx, True, result
+
+
 class Worker(Process):
     """Work on tasks."""
 
-    def __init__(self, tasks):
+    def __init__(self, tasks, done_queue=None, first_idx=0):
         super(Worker, self).__init__()
         self.tasks = tasks
+        # the results of the tasks with `return_result` go to `done_queue`
+        self.done_queue = done_queue
+        self.first_idx = first_idx
         log.debug(f"Worker ready with {len(self.tasks)} tasks")
 
     def run(self):
         """Execute tasks."""
-        for task in self.tasks:
-            task.run()
+        for idx, task in enumerate(self.tasks, start=self.first_idx):
+            result = task.run()
+            if self.done_queue is not None \
+                    and getattr(task, "return_result", False):
+                self.done_queue.put((idx, True, result))
         log.debug(f"{self.name} executed")
 
 
+class DynamicWorker(Process):
+    """
+    Work on the tasks pulled from a shared queue.
+
+    All the workers know the whole list of tasks, only the index of the
+    next task to run goes through the queue. The index of each finished
+    task is sent back through `done_queue`, together with a boolean telling
+    whether the task ran without errors and its result, see
+    :py:func:`run_indexed_task`.
+    """
+
+    def __init__(self, tasks, task_queue, done_queue):
+        super(DynamicWorker, self).__init__()
+        self.tasks = tasks
+        self.task_queue = task_queue
+        self.done_queue = done_queue
+
+    def run(self):
+        """Execute tasks until the queue is exhausted."""
+        for idx in iter(self.task_queue.get, None):
+            self.done_queue.put(run_indexed_task((idx, self.tasks[idx])))
+        log.debug(f"{self.name} executed")
+
+
+class WorkerPool:
+    """
+    Pool of processes shared by all the steps of a workflow.
+
+    The processes are created the first time the pool is used and live
+    until :py:meth:`shutdown` is called, saving the creation of new
+    processes in every step. Because the processes outlive the step that
+    created them, each call runs from the working directory at the moment
+    of the submission.
+    """
+
+    def __init__(self, ncores=None):
+        """
+        Create a pool of processes.
+
+        Parameters
+        ----------
+        ncores : None or int
+            The number of processes in the pool. If `None` is given uses
+            the maximum number of CPUs allowed by
+            `libs.libututil.parse_ncores` function.
+        """
+        self.ncores = parse_ncores(ncores)
+        self._pool = None
+
+    @property
+    def pool(self):
+        """The underlying `multiprocessing.Pool`, created on first use."""
+        if self._pool is None:
+            log.debug(f"Starting a pool of {self.ncores} processes")
+            self._pool = Pool(self.ncores)
+        return self._pool
+
+    def imap(self, func, iterable, chunksize=1):
+        """
+        Apply `func` to each item of `iterable` in the pool, in order.
+
+        Same as `multiprocessing.Pool.imap`, but `func` is called from the
+        current working directory.
+        """
+        func_in_dir = partial(_call_in_dir, func=func, cwd=os.getcwd())
+        return self.pool.imap(func_in_dir, iterable, chunksize)
+
+    def imap_unordered(self, func, iterable, chunksize=1):
+        """
+        Apply `func` to each item of `iterable` in the pool.
+
+        Same as `multiprocessing.Pool.imap_unordered`, but `func` is called
+        from the current working directory.
+        """
+        func_in_dir = partial(_call_in_dir, func=func, cwd=os.getcwd())
+        return self.pool.imap_unordered(func_in_dir, iterable, chunksize)
+
+    def terminate(self):
+        """Stop the processes immediately."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def shutdown(self):
+        """Wait for the pending work and stop the processes."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            log.debug("The pool of processes was shut down")
+
+
+@contextmanager
+def use_pool(ncores, pool=None):
+    """
+    Provide a pool of processes.
+
+    Parameters
+    ----------
+    ncores : int
+        The number of processes of the new pool.
+
+    pool : :py:class:`WorkerPool` or None
+        If given, this pool is provided and left running at exit.
+        Otherwise, a new `multiprocessing.Pool` is created and closed at
+        exit.
+    """
+    if pool is not None:
+        yield pool
+    else:
+        with Pool(ncores) as new_pool:
+            yield new_pool
+
+
 class Scheduler:
     """Schedules tasks to run in multiprocessing."""
 
-    def __init__(self, tasks, ncores=None):
+    def __init__(self, tasks, ncores=None, dynamic=True, pool=None):
         """
         Schedule tasks to a defined number of processes.
 
         Parameters
         ----------
         tasks : list
-            The list of tasks to execute. Tasks must be subclass of
-            `multiprocessing.Process`.
+            The list of tasks to execute. Tasks must have a `run` method.
+            Tasks with a `return_result` attribute set to `True` send the
+            value returned by `run` back to this process, where it is
+            stored in :py:attr:`results`.
 
         ncores : None or int
             The number of cores to use. If `None` is given uses the
             maximum number of CPUs allowed by
             `libs.libututil.parse_ncores` function.
+
+        dynamic : bool
+            If `True` (default), idle processes pull the next task from a
+            shared queue, so that tasks with different runtimes are
+            balanced among the processes, and the progress is reported as
+            each task completes. If `False`, the tasks are split up front in
+            one contiguous chunk per process.
+
+        pool : :py:class:`WorkerPool` or None
+            A long-lived pool to run the tasks in, instead of creating new
+            processes. The pool is used only if its size is the number of
+            cores requested; the tasks are then sent to idle processes
+            one by one, as in the dynamic mode.
         """
         self.num_tasks = len(tasks)
+        self.dynamic = dynamic
         self.num_processes = ncores  # first parses num_cores
 
+        if pool is not None and pool.ncores != self.num_processes:
+            log.debug(
+                f"Not using the pool of {pool.ncores} processes "
+                f"to run with {self.num_processes} cores"
+                )
+            pool = None
+        self.pool = pool
+
         # Do not waste resources
         self.num_processes = min(self.num_processes, self.num_tasks)
 
@@ -61,16 +240,44 @@ class Scheduler:
                 task_name_dic[i] = (t.input_file, len(str(t.input_file)))
             except AttributeError:
                 # If this is not a CNS job it will not have
-                #  input_file, use the output instead
-                task_name_dic[i] = (t.output, len(str(t.output)))
+                #  input_file, use the output instead, if any
+                output = getattr(t, "output", None)
+                task_name_dic[i] = (output, len(str(output)))
 
         sorted_task_list = []
+        # original position of each sorted task
+        self._task_order = []
         for e in sorted(task_name_dic.items(), key=lambda x: (x[0], x[1])):
             idx = e[0]
             sorted_task_list.append(tasks[idx])
+            self._task_order.append(idx)
 
-        job_list = split_tasks(sorted_task_list, self.num_processes)
-        self.worker_list = [Worker(jobs) for jobs in job_list]
+        self.task_list = sorted_task_list
+        # results of the tasks with `return_result`, in the original order
+        self.results = [None] * self.num_tasks
+        if self.pool is not None:
+            self.worker_list = []
+        elif self.dynamic:
+            self.task_queue = Queue()
+            self.done_queue = Queue()
+            self.worker_list = [
+                DynamicWorker(
+                    sorted_task_list,
+                    self.task_queue,
+                    self.done_queue,
+                    )
+                for _ in range(self.num_processes)
+                ]
+        else:
+            self.done_queue = Queue()
+            job_list = split_tasks(sorted_task_list, self.num_processes)
+            self.worker_list = []
+            first_idx = 0
+            for jobs in job_list:
+                self.worker_list.append(
+                    Worker(jobs, self.done_queue, first_idx=first_idx)
+                    )
+                first_idx += len(jobs)
 
         log.info(f"Using {self.num_processes} cores")
         log.debug(f"{self.num_tasks} tasks ready.")
@@ -85,31 +292,29 @@ class Scheduler:
         self._ncores = parse_ncores(n)
         log.debug(f"Scheduler configured for {self._ncores} cpu cores.")
 
+    @staticmethod
+    def _task_ident(task):
+        """Get the name of a task for the progress report."""
+        try:
+            input_file = Path(task.input_file)
+            return f'{input_file.parents[0].name}/{input_file.name}'
+        except AttributeError:
+            pass
+        output = getattr(task, "output", None)
+        if output is None:
+            # tasks returning their results in memory have no files
+            return type(task).__name__
+        return f'{output.parents[0].name}/{output.name}'
+
     def run(self):
         """Run tasks in parallel."""
         try:
-            for worker in self.worker_list:
-                # Start the worker
-                worker.start()
-
-            c = 1
-            for worker in self.worker_list:
-                # Wait for the worker to finish
-                worker.join()
-                for t in worker.tasks:
-                    per = (c / float(self.num_tasks)) * 100
-                    try:
-                        task_ident = (
-                            f'{t.input_file.parents[0].name}/'
-                            f'{t.input_file.name}'
-                            )
-                    except AttributeError:
-                        task_ident = (
-                            f'{t.output.parents[0].name}/'
-                            f'{t.output.name}'
-                            )
-                    log.info(f'>> {task_ident} completed {per:.0f}% ')
-                    c += 1
+            if self.pool is not None:
+                self._run_pool()
+            elif self.dynamic:
+                self._run_dynamic()
+            else:
+                self._run_static()
 
             log.info(f"{self.num_tasks} tasks finished")
 
@@ -122,9 +327,105 @@ class Scheduler:
             # whichever has to catch it
             raise err
 
+    def _run_static(self):
+        """Run the chunks of tasks and report after each worker finishes."""
+        for worker in self.worker_list:
+            # Start the worker
+            worker.start()
+
+        # the results must be received before joining the workers
+        num_results = sum(
+            getattr(task, "return_result", False) for task in self.task_list
+            )
+        for _ in self._iter_done(num_results):
+            pass
+
+        c = 1
+        for worker in self.worker_list:
+            # Wait for the worker to finish
+            worker.join()
+            for t in worker.tasks:
+                per = (c / float(self.num_tasks)) * 100
+                task_ident = self._task_ident(t)
+                log.info(f'>> {task_ident} completed {per:.0f}% ')
+                c += 1
+
+    def _run_dynamic(self):
+        """Run the tasks from the queue and report as they complete."""
+        for idx in range(self.num_tasks):
+            self.task_queue.put(idx)
+        # one sentinel per worker
+        for _ in self.worker_list:
+            self.task_queue.put(None)
+
+        for worker in self.worker_list:
+            # Start the worker
+            worker.start()
+
+        for c, (idx, success) in enumerate(self._iter_done(), start=1):
+            self._log_progress(c, idx, success)
+
+        for worker in self.worker_list:
+            worker.join()
+
+    def _run_pool(self):
+        """Run the tasks in the shared pool and report as they complete."""
+        imap = self.pool.imap_unordered(
+            run_indexed_task,
+            enumerate(self.task_list),
+            )
+        for c, (idx, success, result) in enumerate(imap, start=1):
+            self._store_result(idx, result)
+            self._log_progress(c, idx, success)
+
+    def _iter_done(self, num_done=None):
+        """
+        Receive the tasks finished by the workers.
+
+        Stores the results sent and yields the index of each task, and
+        whether it ran without errors, until `num_done` (defaults to all
+        the tasks) were received or all the workers exited.
+        """
+        num_done = self.num_tasks if num_done is None else num_done
+        c = 0
+        while c < num_done:
+            try:
+                idx, success, result = self.done_queue.get(timeout=1)
+            except queue.Empty:
+                if any(worker.is_alive() for worker in self.worker_list):
+                    continue
+                try:
+                    # results sent right before the workers exited
+                    idx, success, result = self.done_queue.get(timeout=1)
+                except queue.Empty:
+                    log.warning(
+                        f"Workers exited with {num_done - c} "
+                        "tasks not completed"
+                        )
+                    return
+            c += 1
+            self._store_result(idx, result)
+            yield idx, success
+
+    def _store_result(self, idx, result):
+        """Store the result of the `idx`-th sorted task."""
+        self.results[self._task_order[idx]] = result
+
+    def _log_progress(self, c, idx, success):
+        """Report the `c`-th completed task."""
+        per = (c / float(self.num_tasks)) * 100
+        task_ident = self._task_ident(self.task_list[idx])
+        if success:
+            log.info(f'>> {task_ident} completed {per:.0f}% ')
+        else:
+            log.warning(f'>> {task_ident} failed {per:.0f}% ')
+
     def terminate(self):
         """Terminate tasks in a controlled way."""
         for worker in self.worker_list:
             worker.terminate()
 
+        if self.pool is not None:
+            self.pool.terminate()
+
         log.info("The workers terminated in a controlled way")
@@ -1,6 +1,6 @@
 """Parse molecular structures in PDB format."""
 import os
-from functools import partial
+from functools import lru_cache, partial
 from pathlib import Path
 
 from pdbtools.pdb_segxchain import run as place_seg_on_chain
@@ -184,33 +184,46 @@ def sanitize(pdb_file_path, overwrite=True, custom_topology=False):
 
 
 def identify_chainseg(pdb_file_path, sort=True):
-    """Return segID OR chainID."""
-    segids = []
-    chains = []
+    """
+    Return segID OR chainID.
+
+    The identifiers of each file are read only once and cached by path,
+    modification time and size, so that the input models shared by many
+    jobs are not read again for each job.
+    """
+    stat = os.stat(pdb_file_path)
+    segids, chains = _read_chainseg(
+        Path(pdb_file_path).resolve(),
+        stat.st_mtime_ns,
+        stat.st_size,
+        )
+    # the cached identifiers are sorted, which is also a valid
+    #  order when `sort` is False
+    return list(segids), list(chains)
+
+
+@lru_cache(maxsize=1024)
+def _read_chainseg(pdb_file_path, mtime, size):
+    """
+    Read the sorted segIDs and chainIDs of a PDB file.
+
+    `mtime` and `size` are not used to read the file, they are part of
+    the cache key.
+    """
+    segids = set()
+    chains = set()
     with open(pdb_file_path) as input_handler:
         for line in input_handler:
             if line.startswith(("ATOM  ", "HETATM")):
-                try:
-                    segid = line[72:76].strip()[:1]
-                except IndexError:
-                    segid = ""
-                try:
-                    chainid = line[21].strip()
-                except IndexError:
-                    chainid = ""
+                segid = line[72:76].strip()[:1]
+                chainid = line[21:22].strip()
 
                 if segid:
-                    segids.append(segid)
+                    segids.add(segid)
                 if chainid:
-                    chains.append(chainid)
-
-    if sort:
-        segids = sorted(list(set(segids)))
-        chains = sorted(list(set(chains)))
-    else:
-        segids = list(set(segids))
-        chains = list(set(chains))
-    return segids, chains
+                    chains.add(chainid)
+
+    return tuple(sorted(segids)), tuple(sorted(chains))
 
 
 def get_new_models(pdb_file_path):
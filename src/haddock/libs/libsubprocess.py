@@ -6,6 +6,7 @@ from pathlib import Path
 
 from haddock.core.defaults import cns_exec as global_cns_exec
 from haddock.core.exceptions import CNSRunningError, JobRunningError
+from haddock.gear.haddockmodel import read_energies
 
 
 class BaseJob:
@@ -83,6 +84,7 @@ class CNSJob:
             output_file,
             envvars=None,
             cns_exec=None,
+            output_pdb=None,
             ):
         """
         CNS subprocess.
@@ -91,8 +93,10 @@ class CNSJob:
 
         Parameters
         ----------
-        input_file : str or pathlib.Path
-            The path to the .inp CNS file.
+        input_file : str, pathlib.Path or `libs.libcns.CNSInput`
+            The path to the .inp CNS file, or an object with a `write`
+            method writing it and returning its path. In the latter case,
+            the file is written when the job runs.
 
         output_file : str or pathlib.Path
             The path to the .out CNS file, where the standard output
@@ -102,11 +106,18 @@ class CNSJob:
             A dictionary containing the environment variables needed for
             the CNSJob. These will be passed to subprocess.Popen.env
             argument.
+
+        output_pdb : str or pathlib.Path, optional
+            The PDB file written by CNS. If given, the energies in its
+            header are read right after the job finishes, by the same
+            process, and returned by `.run()`.
         """
         self.input_file = input_file
         self.output_file = output_file
         self.envvars = envvars
         self.cns_exec = cns_exec
+        self.output_pdb = output_pdb
+        self.return_result = output_pdb is not None
 
     def __repr__(self):
         return (
@@ -151,9 +162,23 @@ class CNSJob:
 
         self._cns_exec = cns_exec_path
 
+    def prepare_input(self):
+        """
+        Write the input file, if it is prepared by the job.
+
+        Returns
+        -------
+        str or pathlib.Path
+            The path to the .inp CNS file.
+        """
+        write = getattr(self.input_file, "write", None)
+        if write is None:
+            return self.input_file
+        return write()
+
     def run(self):
         """Run this CNS job script."""
-        with open(self.input_file) as inp, \
+        with open(self.prepare_input()) as inp, \
                 open(self.output_file, 'w+') as outf:
 
             p = subprocess.Popen(
@@ -171,4 +196,21 @@ class CNSJob:
         if error:
             raise CNSRunningError(error)
 
+        if self.output_pdb is not None:
+            return self.read_energies()
+
         return out
+
+    def read_energies(self):
+        """
+        Read the energies of the output PDB.
+
+        Returns
+        -------
+        dict or None
+            The energy terms, `None` if CNS did not write the PDB.
+        """
+        try:
+            return read_energies(self.output_pdb)
+        except FileNotFoundError:
+            return None
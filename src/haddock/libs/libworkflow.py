@@ -9,8 +9,9 @@ from haddock.core.exceptions import HaddockError, HaddockTermination, StepError
 from haddock.gear.clean_steps import clean_output
 from haddock.gear.config import get_module_name
 from haddock.gear.zerofill import zero_fill
+from haddock.libs.libparallel import WorkerPool
 from haddock.libs.libtimer import convert_seconds_to_min_sec, log_time
-from haddock.libs.libutil import recursive_dict_update
+from haddock.libs.libutil import parse_ncores, recursive_dict_update
 from haddock.modules import (
     modules_category,
     non_mandatory_general_parameters_defaults,
@@ -27,6 +28,7 @@ class WorkflowManager:
         # `exit` module. If the `exit` module is removed in the future,
         # you can also remove and clean the `terminate` part here.
         self._terminated = 0
+        self.worker_pool = create_worker_pool(self.recipe.steps)
 
     def run(self):
         """High level workflow composer."""
@@ -34,7 +36,7 @@ class WorkflowManager:
                 self.recipe.steps[self.start:],
                 start=self.start):
             try:
-                step.execute()
+                step.execute(worker_pool=self.worker_pool)
             except HaddockTermination:
                 self._terminated = i
                 break
@@ -51,7 +53,37 @@ class WorkflowManager:
         """
         terminated = self._terminated if terminated is None else terminated
         for step in self.recipe.steps[:terminated]:
-            step.clean()
+            step.clean(worker_pool=self.worker_pool)
+
+    def shutdown(self):
+        """Stop the pool of processes shared by the steps."""
+        self.worker_pool.shutdown()
+
+    def terminate(self):
+        """Stop the pool of processes without waiting for pending work."""
+        self.worker_pool.terminate()
+
+
+def create_worker_pool(steps):
+    """
+    Create the pool of processes shared by the steps of a workflow.
+
+    Parameters
+    ----------
+    steps : list of :py:class:`Step`
+        The steps of the workflow.
+
+    Returns
+    -------
+    :py:class:`haddock.libs.libparallel.WorkerPool`
+        The pool with as many processes as the largest `ncores` among
+        the steps.
+    """
+    ncores = max(
+        (parse_ncores(step.config.get("ncores")) for step in steps),
+        default=1,
+        )
+    return WorkerPool(ncores)
 
 
 class Workflow:
@@ -106,8 +138,15 @@ class Step:
         self.working_path = Path(zero_fill.fill(self.module_name, self.order))
         self.module = None
 
-    def execute(self):
-        """Execute simulation step."""
+    def execute(self, worker_pool=None):
+        """
+        Execute simulation step.
+
+        Parameters
+        ----------
+        worker_pool : :py:class:`haddock.libs.libparallel.WorkerPool`
+            The pool of processes shared by the workflow. Optional.
+        """
         self.working_path.resolve().mkdir(parents=False, exist_ok=False)
 
         # Import the module given by the mode or default
@@ -121,6 +160,7 @@ class Step:
         self.module = module_lib.HaddockModule(
             order=self.order,
             path=self.working_path)
+        self.module.worker_pool = worker_pool
 
         # Run module
         start = time()
@@ -137,11 +177,22 @@ class Step:
         elapsed = convert_seconds_to_min_sec(end - start)
         self.module.log(f"took {elapsed}")
 
-    def clean(self):
-        """Clean step output."""
+    def clean(self, worker_pool=None):
+        """
+        Clean step output.
+
+        Parameters
+        ----------
+        worker_pool : :py:class:`haddock.libs.libparallel.WorkerPool`
+            The pool of processes shared by the workflow. Optional.
+        """
         if self.module is None and self.config["clean"]:
             with log_time("cleaning output files took"):
-                clean_output(self.working_path, self.config["ncores"])
+                clean_output(
+                    self.working_path,
+                    self.config["ncores"],
+                    pool=worker_pool,
+                    )
 
         elif self.module is not None and self.module.params["clean"]:
             self.module.clean_output()
@@ -111,6 +111,8 @@ class BaseHaddockModule(ABC):
         """
         self.order = order
         self.path = path
+        # the pool of processes shared by the workflow, if any
+        self.worker_pool = None
         self.previous_io = self._load_previous_io()
 
         # instantiate module's parameters
@@ -229,7 +231,11 @@ class BaseHaddockModule(ABC):
         :py:func:`haddock.gear.clean_steps.clean_output`
         """
         with log_time("cleaning output files took"):
-            clean_output(self.path, self.params["ncores"])
+            clean_output(
+                self.path,
+                self.params["ncores"],
+                pool=self.worker_pool,
+                )
 
     @classmethod
     @abstractmethod
@@ -331,7 +337,7 @@ class BaseHaddockModule(ABC):
                 self._params[param] = EmptyPath()
 
 
-def get_engine(mode, params):
+def get_engine(mode, params, pool=None):
     """
     Create an engine to run the jobs.
 
@@ -344,6 +350,10 @@ def get_engine(mode, params):
         A dictionary containing parameters for the engine.
         `get_engine` will retrieve from `params` only those parameters
         needed and ignore the others.
+
+    pool : :py:class:`haddock.libs.libparallel.WorkerPool` or None
+        The pool of processes shared by the workflow. Used only by the
+        `local` engine.
     """
     # a bit of a factory pattern here
     # this might end up in another module but for now its fine here
@@ -353,12 +363,16 @@ def get_engine(mode, params):
             target_queue=params['queue'],
             queue_limit=params['queue_limit'],
             concat=params['concat'],
+            batch_type=params['batch_type'],
+            ncores=params['hpc_ncores'],
+            job_runtime=params['hpc_job_runtime'],
             )
 
     elif mode == 'local':
         return partial(
             Scheduler,
             ncores=params['ncores'],
+            pool=pool,
             )
     elif mode == "mpi":
         return partial(MPIScheduler, ncores=params["ncores"])
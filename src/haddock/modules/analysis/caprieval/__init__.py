@@ -1,18 +1,23 @@
 """Calculate CAPRI metrics."""
 from pathlib import Path
 
-from haddock.libs.libparallel import Scheduler
+from haddock.libs.libparallel import Scheduler, split_tasks
+from haddock.libs.libutil import parse_ncores
 from haddock.modules import BaseHaddockModule
 from haddock.modules.analysis.caprieval.capri import (
     CAPRI,
+    CAPRIChunk,
+    CAPRIReference,
     capri_cluster_analysis,
-    merge_data,
-    rearrange_ss_capri_output,
+    merge_results,
+    write_ss_capri_output,
     )
 
 
 RECIPE_PATH = Path(__file__).resolve().parent
 DEFAULT_CONFIG = Path(RECIPE_PATH, "defaults.yaml")
+# alignments are shared by all the caprieval steps of a run
+ALIGNMENT_CACHE = Path("..", "data", "alignments")
 
 
 class HaddockModule(BaseHaddockModule):
@@ -51,10 +56,17 @@ class HaddockModule(BaseHaddockModule):
                 "Using the structure with the lowest score from previous step")
             reference = best_model_fname
 
-        # Each model is a job; this is not the most efficient way
-        #  but by assigning each model to an individual job
-        #  we can handle scenarios in wich the models are hetergoneous
-        #  for example during CAPRI scoring
+        # The reference is parsed, and its interface and contacts searched,
+        #  only once for all the models
+        reference_context = CAPRIReference.from_params(
+            reference,
+            self.params,
+            aln_cache_dir=ALIGNMENT_CACHE,
+            )
+
+        # Each model is evaluated individually, so that we can handle
+        #  scenarios in wich the models are hetergoneous, for example
+        #  during CAPRI scoring
         capri_jobs = []
         for i, model_to_be_evaluated in enumerate(models, start=1):
             capri_jobs.append(
@@ -63,23 +75,37 @@ class HaddockModule(BaseHaddockModule):
                     model=model_to_be_evaluated,
                     path=Path("."),
                     reference=reference,
-                    params=self.params
+                    params=self.params,
+                    reference_context=reference_context,
                     )
                 )
 
-        ncores = self.params['ncores']
-        capri_engine = Scheduler(capri_jobs, ncores=ncores)
+        # but the models are evaluated in one chunk per core,
+        #  each returning the metrics of its models
+        ncores = parse_ncores(n=self.params['ncores'], njobs=len(capri_jobs))
+        capri_chunks = [
+            CAPRIChunk(
+                identificator=i,
+                capri_list=chunk,
+                )
+            for i, chunk in enumerate(
+                split_tasks(capri_jobs, ncores),
+                start=1,
+                )
+            ]
+        capri_engine = Scheduler(
+            capri_chunks,
+            ncores=ncores,
+            pool=self.worker_pool,
+            )
         capri_engine.run()
 
-        # very ugly way of loading the capri metrics back into
-        #  the CAPRI object, there's definitively a better way
-        #  of doing this
-        capri_jobs = merge_data(capri_jobs)
+        # load the capri metrics back into the CAPRI objects
+        evaluated_jobs = merge_results(capri_jobs, capri_engine.results)
 
-        # Each job created one .tsv, unify them:
-        rearrange_ss_capri_output(
+        write_ss_capri_output(
+            capri_list=evaluated_jobs,
             output_name="capri_ss.tsv",
-            output_count=len(capri_jobs),
             sort_key=self.params["sortby"],
             sort_ascending=self.params["sort_ascending"],
             path=Path(".")
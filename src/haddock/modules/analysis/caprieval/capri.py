@@ -5,8 +5,6 @@ import tempfile
 from pathlib import Path
 
 import numpy as np
-from fccpy import read_pdb
-from fccpy.contacts import get_intermolecular_contacts
 from pdbtools import pdb_segxchain
 
 from haddock import log
@@ -14,14 +12,19 @@ from haddock.libs.libalign import (
     AlignError,
     calc_rmsd,
     centroid,
+    filter_coord_dic,
     get_align,
     get_atoms,
     kabsch,
+    kabsch_rmsd,
     load_coords,
+    load_structure,
     make_range,
     )
-from haddock.libs.libio import write_dic_to_file, write_nested_dic_to_file
-from haddock.libs.libontology import PDBFile
+from haddock.libs.libio import write_nested_dic_to_file
+
+
+CAPRI_METRICS = ("irmsd", "fnat", "lrmsd", "ilrmsd", "dockq")
 
 
 class CAPRI:
@@ -34,6 +37,7 @@ class CAPRI:
             path,
             reference,
             params,
+            reference_context=None,
             ):
         """
         Initialize the class.
@@ -50,8 +54,15 @@ class CAPRI:
             The reference structure.
         params : dict
             The parameters for the CAPRI evaluation.
+        reference_context : :py:class:`CAPRIReference`, optional
+            The reference-side data, shared by all the models evaluated
+            against the same reference. If not given, it is created from
+            `reference`.
         """
+        if reference_context is None:
+            reference_context = CAPRIReference(reference)
         self.reference = reference
+        self.ref_context = reference_context
         self.model = model
         self.path = path
         self.params = params
@@ -60,17 +71,70 @@ class CAPRI:
         self.ilrmsd = float('nan')
         self.fnat = float('nan')
         self.dockq = float('nan')
-        self.atoms = self._load_atoms(model, reference)
         self.r_chain = params["receptor_chain"]
         self.l_chain = params["ligand_chain"]
-        self.model2ref_numbering = None
-        self.output_ss_fname = Path(f"capri_ss_{identificator}.tsv")
-        self.output_clt_fname = Path(f"capri_clt_{identificator}.tsv")
-        # for parallelisation
-        self.output = self.output_ss_fname
+        # the model is parsed only once, when first needed
+        self._model_structure = None
+        self._atoms = None
+        self._model_coord_dic = None
+        self._model2ref_numbering = None
         self.identificator = identificator
         self.core_model_idx = identificator
 
+    @property
+    def model_structure(self):
+        """The parsed model, a :py:class:`libalign.PDBStructure` object."""
+        if self._model_structure is None:
+            self._model_structure = load_structure(self.model)
+        return self._model_structure
+
+    @property
+    def atoms(self):
+        """Dictionary of the atoms observed in the model and reference."""
+        if self._atoms is None:
+            self._atoms = self._load_atoms(
+                self.model_structure,
+                self.ref_context.atoms,
+                )
+        return self._atoms
+
+    @property
+    def model2ref_numbering(self):
+        """Numbering relationship between the model and the reference."""
+        return self._model2ref_numbering
+
+    @model2ref_numbering.setter
+    def model2ref_numbering(self, numbering_dic):
+        self._model2ref_numbering = numbering_dic
+        # the model coordinates depend on the numbering
+        self._model_coord_dic = None
+
+    def model_coord_dic(self, filter_resdic=None):
+        """
+        Get the coordinates of the model, in the reference numbering.
+
+        The numbering relationship is applied only once, the first time the
+        coordinates are requested.
+
+        Parameters
+        ----------
+        filter_resdic : dict
+            Dictionary of residues to be kept (one list per chain), in the
+            reference numbering.
+
+        Returns
+        -------
+        coord_dic : dict
+            The coordinates, keyed by (chain, resnum, atom).
+        """
+        if self._model_coord_dic is None:
+            self._model_coord_dic, _ = load_coords(
+                self.model_structure,
+                self.atoms,
+                numbering_dic=self.model2ref_numbering,
+                )
+        return filter_coord_dic(self._model_coord_dic, filter_resdic)
+
     def calc_irmsd(self, cutoff=5.0):
         """Calculate the I-RMSD.
 
@@ -80,22 +144,15 @@ class CAPRI:
             The cutoff distance for the intermolecular contacts.
         """
         # Identify reference interface
-        ref_interface_resdic = self.identify_interface(self.reference, cutoff)
+        ref_interface_resdic = self.ref_context.interface(cutoff)
 
         if len(ref_interface_resdic) == 0:
             log.warning("No reference interface found")
         else:
             # Load interface coordinates
-            ref_coord_dic, _ = load_coords(
-                self.reference, self.atoms, ref_interface_resdic
-                )
+            ref_coord_dic = self.ref_context.interface_coords(cutoff)
 
-            mod_coord_dic, _ = load_coords(
-                self.model,
-                self.atoms,
-                ref_interface_resdic,
-                numbering_dic=self.model2ref_numbering
-                )
+            mod_coord_dic = self.model_coord_dic(ref_interface_resdic)
 
             # Here _coord_dic keys are matched
             #  and formatted as (chain, resnum, atom)
@@ -115,24 +172,13 @@ class CAPRI:
             # write_coords("model.pdb", P)
             # write_coords("ref.pdb", Q)
 
-            Q = Q - centroid(Q)
-            P = P - centroid(P)
-            U = kabsch(P, Q)
-            P = np.dot(P, U)
-
-            self.irmsd = calc_rmsd(P, Q)
-            # write_coords("model_aln.pdb", P)
-            # write_coords("ref_aln.pdb", Q)
+            self.irmsd = kabsch_rmsd(P, Q)
 
     def calc_lrmsd(self):
         """Calculate the L-RMSD."""
-        ref_coord_dic, _ = load_coords(self.reference, self.atoms)
+        ref_coord_dic = self.ref_context.coord_dic
 
-        mod_coord_dic, _ = load_coords(
-            self.model,
-            self.atoms,
-            numbering_dic=self.model2ref_numbering
-            )
+        mod_coord_dic = self.model_coord_dic()
 
         Q = []
         P = []
@@ -221,27 +267,16 @@ class CAPRI:
             The cutoff distance for the intermolecular contacts.
         """
         # Identify interface
-        ref_interface_resdic = self.identify_interface(self.reference, cutoff)
+        ref_interface_resdic = self.ref_context.interface(cutoff)
 
         # Load interface coordinates
-        ref_coord_dic, _ = load_coords(self.reference, self.atoms)
+        ref_coord_dic = self.ref_context.coord_dic
 
-        ref_int_coord_dic, _ = load_coords(
-            self.reference, self.atoms, ref_interface_resdic
-            )
+        ref_int_coord_dic = self.ref_context.interface_coords(cutoff)
 
-        mod_coord_dic, _ = load_coords(
-            self.model,
-            self.atoms,
-            numbering_dic=self.model2ref_numbering
-            )
+        mod_coord_dic = self.model_coord_dic()
 
-        mod_int_coord_dic, _ = load_coords(
-            self.model,
-            self.atoms,
-            ref_interface_resdic,
-            numbering_dic=self.model2ref_numbering
-            )
+        mod_int_coord_dic = self.model_coord_dic(ref_interface_resdic)
 
         # write_coord_dic("ref.pdb", ref_int_coord_dic)
         # write_coord_dic("model.pdb", mod_int_coord_dic)
@@ -351,9 +386,9 @@ class CAPRI:
         cutoff : float
             The cutoff distance for the intermolecular contacts.
         """
-        ref_contacts = self.load_contacts(self.reference, cutoff)
+        ref_contacts = self.ref_context.contacts(cutoff)
         if len(ref_contacts) != 0:
-            model_contacts = self.load_contacts(self.model, cutoff)
+            model_contacts = self.load_contacts(self.model_structure, cutoff)
             intersection = ref_contacts & model_contacts
             self.fnat = len(intersection) / float(len(ref_contacts))
         else:
@@ -384,8 +419,15 @@ class CAPRI:
             has_cluster_info = True
         return has_cluster_info
 
-    def make_output(self):
-        """Output the CAPRI results to a .tsv file."""
+    def get_output_data(self):
+        """
+        Get the CAPRI results of this model.
+
+        Returns
+        -------
+        data : dict
+            The CAPRI results, one key per column of the output table.
+        """
         data = {}
         # keep always "model" the first key
         data["model"] = self.model
@@ -407,22 +449,28 @@ class CAPRI:
         else:
             data["cluster-id"] = None
             data["cluster-ranking"] = None
-            data["self.model-cluster-ranking"] = None
+            data["model-cluster-ranking"] = None
 
-        output_fname = Path(self.path, self.output_ss_fname)
+        return data
 
-        write_dic_to_file(data, output_fname)
+    def evaluate(self):
+        """
+        Get the CAPRI metrics.
 
-    def run(self):
-        """Get the CAPRI metrics."""
+        Returns
+        -------
+        bool
+            False if the model could not be aligned to the reference.
+        """
         try:
             align_func = get_align(
                 method=self.params["alignment_method"],
-                lovoalign_exec=self.params["lovoalign_exec"]
+                lovoalign_exec=self.params["lovoalign_exec"],
+                cache_dir=self.ref_context.aln_cache_dir,
                 )
             self.model2ref_numbering = align_func(
-                self.reference,
-                self.model,
+                self.ref_context.structure,
+                self.model_structure,
                 self.path
                 )
         except AlignError:
@@ -430,7 +478,7 @@ class CAPRI:
                 f"Alignment failed between {self.reference} "
                 f"and {self.model}, skipping..."
                 )
-            return
+            return False
 
         if self.params["fnat"]:
             log.debug(f"id {self.identificator}, calculating FNAT")
@@ -458,7 +506,10 @@ class CAPRI:
             log.debug(f"id {self.identificator}, calculating DockQ metric")
             self.calc_dockq()
 
-        self.make_output()
+        # the parsed model is not needed anymore
+        self._model_structure = None
+        self._model_coord_dic = None
+        return True
 
     def check_chains(self, obs_chains):
         """Check observed chains against the expected ones."""
@@ -486,16 +537,18 @@ class CAPRI:
         return r_chain, l_chain
 
     @staticmethod
-    def _load_atoms(model, reference):
+    def _load_atoms(model, reference_atoms):
         """
         Load atoms from a model and reference.
 
         Parameters
         ----------
-        model : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
-            PDB file of the model to have its atoms identified
-        reference : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+        model : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+            :py:class:`haddock.libs.libalign.PDBStructure`
             PDB file of the model to have its atoms identified
+        reference_atoms : dict
+            Dictionary of the atoms of the reference, as returned by
+            :py:func:`haddock.libs.libalign.get_atoms`
 
         Returns
         -------
@@ -503,7 +556,6 @@ class CAPRI:
             Dictionary containing atoms observed in model and reference
         """
         model_atoms = get_atoms(model)
-        reference_atoms = get_atoms(reference)
         atoms_dict = {}
         atoms_dict.update(model_atoms)
         atoms_dict.update(reference_atoms)
@@ -515,27 +567,28 @@ class CAPRI:
 
         Parameters
         ----------
-        pdb_f : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+        pdb_f : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+            :py:class:`haddock.libs.libalign.PDBStructure`
             PDB file of the model to have its atoms identified
         cutoff : float, optional
             Cutoff distance for the interface identification.
         """
-        if isinstance(pdb_f, PDBFile):
-            pdb_f = pdb_f.rel_path
-        pdb = read_pdb(pdb_f)
+        structure = load_structure(pdb_f)
+        chains = structure.chain
+        resids = structure.resnum
 
         interface_resdic = {}
-        for atom_i, atom_j in get_intermolecular_contacts(pdb, cutoff):
+        for atom_i, atom_j in structure.intermolecular_contacts(cutoff):
 
-            if atom_i.chain not in interface_resdic:
-                interface_resdic[atom_i.chain] = []
-            if atom_j.chain not in interface_resdic:
-                interface_resdic[atom_j.chain] = []
+            if chains[atom_i] not in interface_resdic:
+                interface_resdic[chains[atom_i]] = []
+            if chains[atom_j] not in interface_resdic:
+                interface_resdic[chains[atom_j]] = []
 
-            if atom_i.resid not in interface_resdic[atom_i.chain]:
-                interface_resdic[atom_i.chain].append(atom_i.resid)
-            if atom_j.resid not in interface_resdic[atom_j.chain]:
-                interface_resdic[atom_j.chain].append(atom_j.resid)
+            if resids[atom_i] not in interface_resdic[chains[atom_i]]:
+                interface_resdic[chains[atom_i]].append(resids[atom_i])
+            if resids[atom_j] not in interface_resdic[chains[atom_j]]:
+                interface_resdic[chains[atom_j]].append(resids[atom_j])
 
         return interface_resdic
 
@@ -546,17 +599,23 @@ class CAPRI:
 
         Parameters
         ----------
-        pdb_f : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+        pdb_f : PosixPath, :py:class:`haddock.libs.libontology.PDBFile` or
+            :py:class:`haddock.libs.libalign.PDBStructure`
             PDB file of the model to have its atoms identified
         cutoff : float, optional
             Cutoff distance for the interface identification.
         """
+        structure = load_structure(pdb_f)
+        chains = structure.chain
+        resids = structure.resnum
         con_list = []
-        if isinstance(pdb_f, PDBFile):
-            pdb_f = pdb_f.rel_path
-        structure = read_pdb(pdb_f)
-        for atom_i, atom_j in get_intermolecular_contacts(structure, cutoff):
-            con = (atom_i.chain, atom_i.resid, atom_j.chain, atom_j.resid)
+        for atom_i, atom_j in structure.intermolecular_contacts(cutoff):
+            con = (
+                chains[atom_i],
+                resids[atom_i],
+                chains[atom_j],
+                resids[atom_j],
+                )
             con_list.append(con)
         return set(con_list)
 
@@ -580,128 +639,249 @@ class CAPRI:
         return new_pdb_path
 
 
-def merge_data(capri_jobs):
-    """Merge CAPRI data."""
-    capri_dic = {}
-    for ident in range(1, len(capri_jobs) + 1):
-        out_file = Path(f"capri_ss_{ident}.tsv")
-        if not out_file.exists():
-            continue
-        header, content = out_file.read_text().split(os.linesep, 1)
+class CAPRIReference:
+    """
+    Reference-side data of the CAPRI evaluation.
+
+    The reference is parsed only once and its interfaces and contacts are
+    cached for each cutoff, so that the same object can be shared (read-only)
+    by all the :py:class:`CAPRI` jobs of a step.
+    """
+
+    def __init__(self, reference, aln_cache_dir=None):
+        """
+        Initialize the class.
+
+        Parameters
+        ----------
+        reference : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+            The reference structure.
+        aln_cache_dir : PosixPath, optional
+            Folder where the model-reference alignments are cached, see
+            :py:func:`haddock.libs.libalign.get_align`.
+        """
+        self.reference = reference
+        self.aln_cache_dir = aln_cache_dir
+        self.structure = load_structure(reference)
+        self.atoms = get_atoms(self.structure)
+        self.coord_dic, _ = load_coords(self.structure, self.atoms)
+        self._interfaces = {}
+        self._interface_coords = {}
+        self._contacts = {}
+
+    @classmethod
+    def from_params(cls, reference, params, aln_cache_dir=None):
+        """
+        Create the reference context with the data needed by `params`.
+
+        Parameters
+        ----------
+        reference : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+            The reference structure.
+        params : dict
+            The parameters of the CAPRI evaluation.
+        aln_cache_dir : PosixPath, optional
+            Folder where the model-reference alignments are cached.
+
+        Returns
+        -------
+        :py:class:`CAPRIReference`
+        """
+        ref_context = cls(reference, aln_cache_dir=aln_cache_dir)
+        if params["fnat"]:
+            ref_context.contacts(params["fnat_cutoff"])
+        if params["irmsd"] or params["ilrmsd"]:
+            ref_context.interface_coords(params["irmsd_cutoff"])
+        return ref_context
+
+    def interface(self, cutoff=5.0):
+        """
+        Get the interface residues of the reference.
+
+        Parameters
+        ----------
+        cutoff : float
+            The cutoff distance for the intermolecular contacts.
+
+        Returns
+        -------
+        interface_resdic : dict
+            The interface residues, one list per chain.
+        """
+        if cutoff not in self._interfaces:
+            self._interfaces[cutoff] = CAPRI.identify_interface(
+                self.structure,
+                cutoff,
+                )
+        return self._interfaces[cutoff]
+
+    def interface_coords(self, cutoff=5.0):
+        """
+        Get the coordinates of the interface atoms of the reference.
+
+        Parameters
+        ----------
+        cutoff : float
+            The cutoff distance for the intermolecular contacts.
+
+        Returns
+        -------
+        coord_dic : dict
+            The coordinates, keyed by (chain, resnum, atom).
+        """
+        if cutoff not in self._interface_coords:
+            self._interface_coords[cutoff] = filter_coord_dic(
+                self.coord_dic,
+                self.interface(cutoff),
+                )
+        return self._interface_coords[cutoff]
+
+    def contacts(self, cutoff=5.0):
+        """
+        Get the residue-based contacts of the reference.
+
+        Parameters
+        ----------
+        cutoff : float
+            The cutoff distance for the intermolecular contacts.
+
+        Returns
+        -------
+        set
+            The contacts, as (chain_i, resid_i, chain_j, resid_j) tuples.
+        """
+        if cutoff not in self._contacts:
+            self._contacts[cutoff] = CAPRI.load_contacts(
+                self.structure,
+                cutoff,
+                )
+        return self._contacts[cutoff]
+
+
+class CAPRIChunk:
+    """Evaluate a block of models, returning their CAPRI metrics."""
+
+    def __init__(self, identificator, capri_list, return_result=True):
+        """
+        Initialize the class.
+
+        Parameters
+        ----------
+        identificator : int
+            The identificator of the chunk.
+        capri_list : list
+            The :py:class:`CAPRI` objects of the models to be evaluated.
+        return_result : bool
+            If `True`, `run` returns the CAPRI metrics to the
+            :py:class:`haddock.libs.libparallel.Scheduler`.
+        """
+        self.identificator = identificator
+        self.capri_list = capri_list
+        self.return_result = return_result
+
+    def run(self):
+        """
+        Get the CAPRI metrics of all the models of the chunk.
+
+        Returns
+        -------
+        results : dict
+            The metrics of each evaluated model, keyed by the
+            identificator of its :py:class:`CAPRI` object, see
+            :py:func:`merge_results`.
+        """
+        return {
+            capri.identificator: {
+                key: getattr(capri, key) for key in CAPRI_METRICS
+                }
+            for capri in self.capri_list
+            if capri.evaluate()
+            }
+
+
+def merge_results(capri_jobs, chunk_results):
+    """
+    Merge the CAPRI metrics returned by :py:class:`CAPRIChunk` objects.
 
-        header_data = header.split('\t')
-        content_data = content.split('\t')
+    Parameters
+    ----------
+    capri_jobs : list
+        The :py:class:`CAPRI` objects to be updated with the results.
+    chunk_results : list
+        The results of each :py:class:`CAPRIChunk`, `None` for the chunks
+        that failed.
 
-        model_name = Path(content_data[header_data.index("model")]).name
-        capri_dic[model_name] = {}
-        target_keys = ['irmsd', 'fnat', 'ilrmsd', 'lrmsd', 'dockq']
-        for key in target_keys:
-            capri_dic[model_name][key] = float(
-                content_data[header_data.index(key)])
+    Returns
+    -------
+    evaluated : list
+        The updated :py:class:`CAPRI` objects of the evaluated models.
+    """
+    results = {}
+    for chunk_result in chunk_results:
+        if chunk_result:
+            results.update(chunk_result)
 
+    evaluated = []
     for j in capri_jobs:
-        for m in capri_dic:
-            if m == j.model.file_name:
-                # add the data
-                j.irmsd = capri_dic[m]['irmsd']
-                j.fnat = capri_dic[m]['fnat']
-                j.lrmsd = capri_dic[m]['lrmsd']
-                j.ilrmsd = capri_dic[m]['ilrmsd']
-                j.dockq = capri_dic[m]['dockq']
+        try:
+            data = results[j.identificator]
+        except KeyError:
+            continue
+        for key in CAPRI_METRICS:
+            setattr(j, key, data[key])
+        evaluated.append(j)
 
-    return capri_jobs
+    return evaluated
 
 
-def rearrange_ss_capri_output(
+def write_ss_capri_output(
+        capri_list,
         output_name,
-        output_count,
         sort_key,
         sort_ascending,
         path
         ):
     """
-    Combine different capri outputs in a single file.
+    Write the CAPRI metrics of the evaluated models in a single file.
 
     Parameters
     ----------
+    capri_list : list
+        The :py:class:`CAPRI` objects of the evaluated models.
     output_name : str
         Name of the output file.
-    output_count : int
-        Number of output files to combine.
     sort_key : str
         Key to sort the output files.
+    sort_ascending : bool
+        Whether to sort in ascending order.
     path : Path
         Path to the output directory.
     """
-    # this would be easier and more readable with pandas (:
     output_fname = Path(path, output_name)
-    log.info(f"Rearranging output files into {output_fname}")
-    keyword = output_name.split(".")[0]
-    split_dict = {
-        "capri_ss": "model-cluster-ranking",
-        "capri_clt": "caprieval_rank"
+    log.info(f"Writing the CAPRI metrics to {output_fname}")
+    data = {
+        i: capri.get_output_data()
+        for i, capri in enumerate(capri_list, start=1)
         }
-    if keyword not in split_dict.keys():
-        raise Exception(f'Keyword {keyword} does not exist.')
-
-    # Load the information of each intermediate file
-    data = {}
-    for ident in range(1, output_count + 1):
-        out_file = Path(path, f"{keyword}_{ident}.tsv")
-        data[ident] = {}
-
-        # add this dummy data so we can rank it later
-        #  without messing up the order of the output
-        if not out_file.exists():
-            data[ident]['score'] = 99999.9
-            continue
-
-        header, content = out_file.read_text().split(os.linesep, 1)
-
-        header_data = header.split('\t')
-        content_data = content.split('\t')
-
-        # find out the data type of each field
-        for key, value in zip(header_data, content_data):
-            try:
-                value = int(value)
-            except ValueError:
-                try:
-                    value = float(value)
-                except ValueError:
-                    value = str(value).strip(os.linesep)
-            data[ident][key] = value
-
-        out_file.unlink()
 
     # Rank according to the score
-    score_rankkey_values = [(i, data[k]['score']) for i, k in enumerate(data)]
-    score_rankkey_values.sort(key=lambda x: x[1])
-
-    for i, k in enumerate(score_rankkey_values):
-        idx, _ = k
-        data[idx + 1]["caprieval_rank"] = i + 1
-
-        if data[idx + 1]['score'] == 99999.9:
-            del data[idx + 1]
+    score_rankkey_values = sorted(data, key=lambda k: data[k]['score'])
+    for rank, k in enumerate(score_rankkey_values, start=1):
+        data[k]["caprieval_rank"] = rank
 
     # Sort according to the sort key
-    rankkey_values = [(i, data[k][sort_key]) for i, k in enumerate(data)]
-    rankkey_values.sort(
-        key=lambda x: x[1],
+    rankkey_values = sorted(
+        data,
+        key=lambda k: data[k][sort_key],
         reverse=True if not sort_ascending else False
         )
-
-    _data = {}
-    for i, (k, _) in enumerate(rankkey_values):
-        _data[i + 1] = data[k + 1]
-    data = _data
+    data = {i: data[k] for i, k in enumerate(rankkey_values, start=1)}
 
     if not data:
         # This means there were only "dummy" values
         return
     else:
-        write_nested_dic_to_file(data, output_name)
+        write_nested_dic_to_file(data, output_fname)
 
 
 def calc_stats(data):
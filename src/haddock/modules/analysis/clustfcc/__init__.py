@@ -3,13 +3,20 @@ import os
 from pathlib import Path
 
 import numpy as np
-from fcc.scripts import calc_fcc_matrix, cluster_fcc
 
-from haddock import FCC_path, log
+from haddock import log
 from haddock.libs.libclust import write_structure_list
-from haddock.libs.libparallel import Scheduler
-from haddock.libs.libsubprocess import JobInputFirst
-from haddock.modules import BaseHaddockModule, read_from_yaml_config
+from haddock.libs.libparallel import Scheduler, split_tasks
+from haddock.libs.libutil import parse_ncores
+from haddock.modules import BaseHaddockModule
+from haddock.modules.analysis.clustfcc.clustfcc import (
+    FCCChunk,
+    cluster_thresholds,
+    contact_matrix,
+    neighbour_matrix,
+    write_clusters,
+    )
+from haddock.modules.analysis.clustfcc.contacts import ContactsChunk
 
 
 RECIPE_PATH = Path(__file__).resolve().parent
@@ -26,106 +33,89 @@ class HaddockModule(BaseHaddockModule):
 
     @classmethod
     def confirm_installation(cls):
-        """Confirm if FCC is installed and available."""
-        dcfg = read_from_yaml_config(DEFAULT_CONFIG)
-        exec_path = Path(FCC_path, dcfg['executable'])
-
-        if not os.access(exec_path, mode=os.F_OK):
-            raise Exception(f'Required {str(exec_path)} file does not exist.')
-
-        if not os.access(exec_path, mode=os.X_OK):
-            raise Exception(f'Required {str(exec_path)} file is not executable')
-
+        """Confirm module is installed."""
         return
 
     def _run(self):
         """Execute module."""
-        contact_executable = Path(FCC_path, self.params['executable'])
-
         # Get the models generated in previous step
         models_to_cluster = self.previous_io.retrieve_models(
             individualize=True
             )
 
-        # Calculate the contacts for each model
+        # Calculate the contacts for each model, in one chunk per core
         log.info('Calculating contacts')
-        contact_jobs = []
-        for model in models_to_cluster:
-            pdb_f = Path(model.rel_path)
-            contact_f = Path(model.file_name.replace('.pdb', '.con'))
-            job = JobInputFirst(
-                pdb_f,
-                contact_f,
-                contact_executable,
-                self.params['contact_distance_cutoff'],
-                )
-            contact_jobs.append(job)
-
-        contact_engine = Scheduler(contact_jobs, ncores=self.params['ncores'])
+        ncores = parse_ncores(
+            n=self.params['ncores'],
+            njobs=len(models_to_cluster),
+            )
+        contact_chunks = [
+            ContactsChunk(chunk, self.params['contact_distance_cutoff'])
+            for chunk in split_tasks(models_to_cluster, ncores)
+            ]
+        contact_engine = Scheduler(
+            contact_chunks,
+            ncores=ncores,
+            pool=self.worker_pool,
+            )
         contact_engine.run()
 
-        contact_file_l = []
-        not_found = []
-        for job in contact_jobs:
-            if not job.output.exists():
-                # NOTE: If there is no output, most likely the models are not in
-                # contact there is no way of knowing how many models are not in
-                # contact, it can be only one, or could be all of them.
-                not_found.append(job.input.name)
-                log.warning(f'Contact was not calculated for {job.input.name}')
-            else:
-                contact_file_l.append(str(job.output))
-
-        if not_found:
-            # No contacts were calculated, we cannot cluster
-            self.finish_with_error("Several files were not generated:"
-                                   f" {not_found}")
+        if None in contact_engine.results:
+            self.finish_with_error("The contacts could not be calculated")
 
+        # the FCC is calculated in blocks of models in each core, keeping
+        #  only the neighbours of the models
         log.info('Calculating the FCC matrix')
-        parsed_contacts = calc_fcc_matrix.parse_contact_file(contact_file_l, False)  # noqa: E501
+        contacts = contact_matrix([
+            model_contacts
+            for chunk_contacts in contact_engine.results
+            for model_contacts in chunk_contacts
+            ])
+        fcc_chunks = [
+            FCCChunk(
+                contacts,
+                rows,
+                self.params['fraction_cutoff'],
+                self.params['strictness'],
+                )
+            for rows in split_tasks(range(len(models_to_cluster)), ncores)
+            ]
+        fcc_engine = Scheduler(
+            fcc_chunks,
+            ncores=ncores,
+            pool=self.worker_pool,
+            )
+        fcc_engine.run()
 
-        # Imporant: matrix is a generator object, be careful with it
-        matrix = calc_fcc_matrix.calculate_pairwise_matrix(parsed_contacts, False)  # noqa: E501
+        if None in fcc_engine.results:
+            self.finish_with_error("The FCC matrix could not be calculated")
 
-        # write the matrix to a file, so we can read it afterwards and don't
-        #  need to reinvent the wheel handling this
-        fcc_matrix_f = Path('fcc.matrix')
-        with open(fcc_matrix_f, 'w') as fh:
-            for data in list(matrix):
-                data_str = f"{data[0]} {data[1]} {data[2]:.2f} {data[3]:.3f}"
-                data_str += os.linesep
-                fh.write(data_str)
-        fh.close()
+        neighbours = neighbour_matrix(
+            len(models_to_cluster),
+            fcc_engine.results,
+            )
 
         # Cluster
         log.info('Clustering...')
-        pool = cluster_fcc.read_matrix(
-            fcc_matrix_f,
-            self.params['fraction_cutoff'],
-            self.params['strictness'],
+        # the clusters of all the thresholds are obtained at once, in case
+        #  no cluster is found with the threshold requested
+        clusters_by_threshold = cluster_thresholds(
+            neighbours,
+            self.params['threshold'],
             )
-
-        cluster_check = False
-        while not cluster_check:
-            for threshold in range(self.params['threshold'], 0, -1):
-                log.info(f'Clustering with threshold={threshold}')
-                _, clusters = cluster_fcc.cluster_elements(
-                    pool,
-                    threshold=threshold,
+        clusters = []
+        for threshold in range(self.params['threshold'], 0, -1):
+            log.info(f'Clustering with threshold={threshold}')
+            clusters = clusters_by_threshold[threshold]
+            if not clusters:
+                log.info(
+                    "[WARNING] No cluster was found, decreasing threshold!"
                     )
-                if not clusters:
-                    log.info(
-                        "[WARNING] No cluster was found, decreasing threshold!"
-                        )
-                else:
-                    cluster_check = True
-                    # pass the actual threshold back to the param dict
-                    #  because it will be use in the detailed output
-                    self.params['threshold'] = threshold
-                    break
-            if not cluster_check:
-                # No cluster was obtained in any threshold
-                cluster_check = True
+            else:
+                # pass the actual threshold back to the param dict
+                #  because it will be use in the detailed output
+                self.params['threshold'] = threshold
+                break
 
         # Prepare output and read the elements
         clt_dic = {}
@@ -134,23 +124,19 @@ class HaddockModule(BaseHaddockModule):
             log.info('Saving output to cluster.out')
             cluster_out = Path('cluster.out')
             with open(cluster_out, 'w') as fh:
-                cluster_fcc.output_clusters(fh, clusters)
+                write_clusters(fh, clusters)
             fh.close()
 
             clt_centers = {}
-            for clt in clusters:
-                cluster_id = clt.name
-                cluster_center_id = clt.center.name - 1
-                cluster_center_pdb = models_to_cluster[cluster_center_id]
+            for cluster_id, (center, members) in enumerate(clusters, start=1):
+                cluster_center_pdb = models_to_cluster[center]
 
                 clt_dic[cluster_id] = []
                 clt_centers[cluster_id] = cluster_center_pdb
                 clt_dic[cluster_id].append(cluster_center_pdb)
 
-                for model in clt.members:
-                    model_id = model.name
-                    model_pdb = models_to_cluster[model_id - 1]
-                    clt_dic[cluster_id].append(model_pdb)
+                for model_id in members:
+                    clt_dic[cluster_id].append(models_to_cluster[model_id])
 
             # Rank the clusters
             #  they are sorted by the topX (threshold) models in each cluster
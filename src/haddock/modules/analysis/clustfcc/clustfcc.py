@@ -0,0 +1,294 @@
+"""
+FCC clustering.
+
+The fraction of common contacts (FCC) of two models is the number of
+residue contacts they share divided by the number of contacts of each of
+them. The contacts of all the models are encoded as the rows of a sparse
+binary matrix, so that the contacts shared by every pair of models are
+obtained at once with a sparse matrix product.
+
+Two models are neighbours when their FCC is above ``fraction_cutoff``
+(and above ``fraction_cutoff * strictness`` the other way around). Only
+the neighbours are kept, the rest of the pairs are discarded while the
+matrix is calculated, and the models are clustered on that neighbour
+matrix as in the original FCC clustering scripts.
+"""
+from itertools import takewhile
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+# the rows of the FCC matrix calculated at once by the workers, bounds the
+#  memory used by each worker with large number of models
+FCC_BLOCK_SIZE = 256
+
+
+def contact_matrix(contacts):
+    """
+    Encode the contacts of the models as a sparse binary matrix.
+
+    Parameters
+    ----------
+    contacts : list of np.ndarray
+        The packed residue contacts of each model, see
+        :py:meth:`haddock.libs.libalign.PDBStructure.residue_contacts`.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        A (models x contacts) matrix with ones where the model has the
+        contact.
+    """
+    nmodels = len(contacts)
+    all_contacts = np.concatenate([np.asarray(c, dtype=np.int64) for c in contacts])  # noqa: E501
+    contact_ids, columns = np.unique(all_contacts, return_inverse=True)
+    ncontacts = [len(c) for c in contacts]
+    indptr = np.zeros(nmodels + 1, dtype=np.int64)
+    np.cumsum(ncontacts, out=indptr[1:])
+    return csr_matrix(
+        (np.ones(len(columns), dtype=np.int32), columns.ravel(), indptr),
+        shape=(nmodels, len(contact_ids)),
+        )
+
+
+def common_contacts(matrix, start, stop):
+    """
+    Calculate the FCC of the models in `start:stop` with all the models.
+
+    Only the pairs of different models with contacts in common are
+    returned.
+
+    Parameters
+    ----------
+    matrix : scipy.sparse.csr_matrix
+        The contacts of the models, see :py:func:`contact_matrix`.
+    start, stop : int
+        The rows of the matrix to calculate.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The indexes `i` of the models in `start:stop`, the indexes `j` of
+        the other models, the FCC of `i` (the common contacts divided by
+        the contacts of `i`) and the FCC of `j`.
+    """
+    ncontacts = np.diff(matrix.indptr)
+    common = (matrix[start:stop] @ matrix.T).tocoo()
+    rows = common.row.astype(np.int64) + start
+    cols = common.col.astype(np.int64)
+    others = rows != cols
+    rows, cols, ncommon = rows[others], cols[others], common.data[others]
+    fcc_i = ncommon / ncontacts[rows]
+    fcc_j = ncommon / ncontacts[cols]
+    return rows, cols, fcc_i, fcc_j
+
+
+class FCCChunk:
+    """Find the neighbours of a block of models."""
+
+    def __init__(
+            self,
+            matrix,
+            rows,
+            fraction_cutoff,
+            strictness,
+            return_result=True,
+            ):
+        """
+        Initialize the class.
+
+        Parameters
+        ----------
+        matrix : scipy.sparse.csr_matrix
+            The contacts of all the models, see :py:func:`contact_matrix`.
+        rows : range
+            The models whose neighbours are searched.
+        fraction_cutoff : float
+            The minimum FCC of a model with its neighbours.
+        strictness : float
+            The FCC of the neighbours with the model must be above
+            `fraction_cutoff * strictness`.
+        return_result : bool
+            If `True`, `run` returns the neighbours to the
+            :py:class:`haddock.libs.libparallel.Scheduler`.
+        """
+        self.matrix = matrix
+        self.rows = rows
+        self.fraction_cutoff = fraction_cutoff
+        self.strictness = strictness
+        self.return_result = return_result
+
+    def run(self):
+        """
+        Calculate the FCC of the models, keeping only the neighbours.
+
+        Returns
+        -------
+        tuple of np.ndarray
+            The models and their neighbours, as two arrays of indexes.
+        """
+        partner_cutoff = self.fraction_cutoff * self.strictness
+        models, neighbours = [], []
+        for start in range(self.rows.start, self.rows.stop, FCC_BLOCK_SIZE):
+            stop = min(start + FCC_BLOCK_SIZE, self.rows.stop)
+            rows, cols, fcc_i, fcc_j = common_contacts(self.matrix, start, stop)  # noqa: E501
+            are_neighbours = np.logical_and(
+                fcc_i >= self.fraction_cutoff,
+                fcc_j >= partner_cutoff,
+                )
+            models.append(rows[are_neighbours])
+            neighbours.append(cols[are_neighbours])
+        if not models:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        return np.concatenate(models), np.concatenate(neighbours)
+
+
+def neighbour_matrix(nmodels, neighbours):
+    """
+    Merge the neighbours found by the :py:class:`FCCChunk` s.
+
+    Parameters
+    ----------
+    nmodels : int
+        The number of models.
+    neighbours : list of tuple
+        The results of the :py:class:`FCCChunk` s.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        A (models x models) boolean matrix, the row of each model has the
+        neighbours of the model.
+    """
+    rows = np.concatenate([n[0] for n in neighbours] or [[]]).astype(np.int64)  # noqa: E501
+    cols = np.concatenate([n[1] for n in neighbours] or [[]]).astype(np.int64)  # noqa: E501
+    return csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)),
+        shape=(nmodels, nmodels),
+        )
+
+
+def iter_clusters(neighbours):
+    """
+    Group all the models in clusters, from the largest to the smallest.
+
+    The model with the largest number of unclustered neighbours is the
+    center of the next cluster, and its unclustered neighbours are its
+    members. Ties are broken in favour of the last model. The choice of
+    the centers does not depend on the clustering threshold, and the size
+    of the clusters never increases, so the clusters of any threshold are
+    the first clusters yielded here.
+
+    Parameters
+    ----------
+    neighbours : scipy.sparse.csr_matrix
+        The neighbours of each model, see :py:func:`neighbour_matrix`.
+
+    Yields
+    ------
+    tuple
+        The center and the members of each cluster, as indexes of the
+        models.
+    """
+    nmodels = neighbours.shape[0]
+    neighbours = neighbours.tocsr()
+    # who has each model as neighbour
+    neighbour_of = neighbours.tocsc()
+    nneighbours = np.diff(neighbours.indptr).astype(np.int64)
+    clustered = np.zeros(nmodels, dtype=bool)
+
+    while not clustered.all():
+        unclustered = np.where(clustered, -1, nneighbours)
+        # the last of the models with most unclustered neighbours
+        center = nmodels - 1 - int(np.argmax(unclustered[::-1]))
+
+        if unclustered[center] == 0:
+            # only singletons are left
+            for singleton in np.flatnonzero(~clustered)[::-1]:
+                yield int(singleton), []
+            return
+
+        center_neighbours = neighbours.indices[
+            neighbours.indptr[center]:neighbours.indptr[center + 1]
+            ]
+        members = center_neighbours[~clustered[center_neighbours]]
+        new = np.append(members, center)
+        clustered[new] = True
+
+        # the models that had the new ones as neighbours have less
+        #  unclustered neighbours now
+        for model in new:
+            nneighbours[neighbour_of.indices[
+                neighbour_of.indptr[model]:neighbour_of.indptr[model + 1]
+                ]] -= 1
+
+        yield center, members.tolist()
+
+
+def cluster_elements(neighbours, threshold):
+    """
+    Group the models in clusters of at least `threshold` models.
+
+    See :py:func:`iter_clusters`.
+
+    Parameters
+    ----------
+    neighbours : scipy.sparse.csr_matrix
+        The neighbours of each model, see :py:func:`neighbour_matrix`.
+    threshold : int
+        The minimum size of the clusters.
+
+    Returns
+    -------
+    list of tuple
+        The center and the members of each cluster, as indexes of the
+        models.
+    """
+    return list(takewhile(
+        lambda cluster: len(cluster[1]) + 1 >= threshold,
+        iter_clusters(neighbours),
+        ))
+
+
+def cluster_thresholds(neighbours, threshold):
+    """
+    Cluster the models with all the thresholds up to `threshold`.
+
+    The models are clustered only once, with threshold 1, and the
+    clusters of the other thresholds are taken from those.
+
+    Parameters
+    ----------
+    neighbours : scipy.sparse.csr_matrix
+        The neighbours of each model, see :py:func:`neighbour_matrix`.
+    threshold : int
+        The largest threshold.
+
+    Returns
+    -------
+    dict
+        The clusters of each threshold, from 1 to `threshold`, see
+        :py:func:`cluster_elements`.
+    """
+    all_clusters = cluster_elements(neighbours, threshold=1)
+    # the sizes never increase, the clusters of each threshold are
+    #  the first ones
+    sizes = np.array([len(members) + 1 for _, members in all_clusters])
+    return {
+        _threshold: all_clusters[:np.count_nonzero(sizes >= _threshold)]
+        for _threshold in range(1, threshold + 1)
+        }
+
+
+def write_clusters(handle, clusters):
+    """
+    Write the clusters in the format of the original FCC scripts.
+
+    The clusters and the models are numbered from 1.
+    """
+    for cluster_id, (center, members) in enumerate(clusters, start=1):
+        handle.write(f"Cluster {cluster_id} -> {center + 1} ")
+        for member in sorted(members):
+            handle.write(f"{member + 1} ")
+        handle.write("\n")
@@ -0,0 +1,43 @@
+"""Calculate the intermolecular contacts of the models to cluster."""
+from haddock import log
+from haddock.libs.libalign import PDBStructure
+
+
+class ContactsChunk:
+    """Find the residue contacts of a block of models."""
+
+    def __init__(self, models, cutoff, return_result=True):
+        """
+        Initialize the class.
+
+        Parameters
+        ----------
+        models : list
+            The :py:class:`haddock.libs.libontology.PDBFile` of the models.
+        cutoff : float
+            The cutoff distance for the contacts.
+        return_result : bool
+            If `True`, `run` returns the contacts of the models to the
+            :py:class:`haddock.libs.libparallel.Scheduler`.
+        """
+        self.models = models
+        self.cutoff = cutoff
+        self.return_result = return_result
+
+    def run(self):
+        """
+        Get the contacts of all the models of the chunk.
+
+        Returns
+        -------
+        list of np.ndarray
+            The packed residue contacts of each model, see
+            :py:meth:`haddock.libs.libalign.PDBStructure.residue_contacts`.
+        """
+        contacts = []
+        for model in self.models:
+            model_contacts = PDBStructure(model).residue_contacts(self.cutoff)
+            if not model_contacts.size:
+                log.warning(f"No contacts were found for {model.file_name}")
+            contacts.append(model_contacts)
+        return contacts
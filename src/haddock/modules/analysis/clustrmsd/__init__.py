@@ -26,6 +26,21 @@ Four parameters can be defined in this context:
 * `threshold` : analogously to the `clustfcc` module, it is the minimum number
   of models that should be present in a cluster to consider it
 
+The RMSD matrix is memory-mapped and never loaded entirely in memory with
+the ``single`` linkage, whose dendrogram is calculated from the minimum
+spanning tree of the models. The other linkages need the whole matrix in
+memory. Above `max_linkage_models` models, the models are first grouped
+around leaders, models farther than `leader_distance` from each other, and
+only the matrix of the leaders is clustered. Each model then belongs to the
+cluster of its leader.
+
+The dendrogram is saved in the `dendrograms` folder that the `rmsdmatrix`
+step creates for this purpose and records in `rmsd_matrix.json`, together
+with a key of the matrix (its header, size and modification time) and of the
+parameters used to calculate it. The following `clustrmsd` steps with the
+same `linkage`, or a `clustrmsd` step restarted with other `criterion`,
+`tolerance` or `threshold` values, only cut the saved dendrogram.
+
 This module passes the path to the RMSD matrix is to the next step of the
 workflow through the `rmsd_matrix.json` file, thus allowing to execute several
 `clustrmsd` modules (possibly with different parameters) on the same RMSD
@@ -43,9 +58,15 @@ from haddock.libs.libclust import write_structure_list
 from haddock.libs.libontology import ModuleIO
 from haddock.modules import BaseHaddockModule
 from haddock.modules.analysis.clustrmsd.clustrmsd import (
+    DENDROGRAM_FNAME,
+    dendrogram_key,
     get_clusters,
     get_dendrogram,
+    get_leaders,
+    get_leaders_matrix,
+    load_dendrogram,
     read_matrix,
+    save_dendrogram,
     )
 
 
@@ -73,12 +94,50 @@ class HaddockModule(BaseHaddockModule):
         # Get the models generated in previous step
         models = self.previous_io.retrieve_models()
         # Cluster
-        rmsd_matrix = read_matrix(
-            self.matrix_json.input[0]
-            )
+        matrix_file = self.matrix_json.input[0]
+        rmsd_matrix = read_matrix(matrix_file)
         # getting clusters_list
         linkage_type = self.params["linkage"]
-        dendrogram = get_dendrogram(rmsd_matrix, linkage_type)
+        use_leaders = (
+            linkage_type != "single"
+            and len(models) > self.params["max_linkage_models"]
+            )
+        # the dendrograms are saved in the folder given by the rmsdmatrix step
+        dendrogram_f = Path(
+            matrix_file.path,
+            matrix_file.dendrogram_dir,
+            DENDROGRAM_FNAME.format(linkage=linkage_type),
+            )
+        key = dendrogram_key(
+            Path(matrix_file.path, matrix_file.file_name),
+            linkage=linkage_type,
+            leader_distance=(
+                self.params["leader_distance"] if use_leaders else None
+                ),
+            )
+        saved_dendrogram = load_dendrogram(dendrogram_f, key)
+        if saved_dendrogram is not None:
+            self.log(f"Using the dendrogram saved in {dendrogram_f}")
+            dendrogram, leader_assignment = saved_dendrogram
+        else:
+            leader_assignment = None
+            if use_leaders:
+                leaders, leader_assignment = get_leaders(
+                    rmsd_matrix,
+                    self.params["leader_distance"],
+                    )
+                self.log(
+                    f"{len(leaders)} leaders found for {len(models)} models "
+                    f"with leader_distance={self.params['leader_distance']}"
+                    )
+                rmsd_matrix = get_leaders_matrix(rmsd_matrix, leaders)
+            dendrogram = get_dendrogram(rmsd_matrix, linkage_type)
+            save_dendrogram(
+                dendrogram_f,
+                key,
+                dendrogram,
+                leader_assignment,
+                )
         crit = self.params["criterion"]
         if np.isnan(self.params["tolerance"]):
             self.log("tolerance is not defined")
@@ -96,6 +155,9 @@ class HaddockModule(BaseHaddockModule):
                 raise Exception(f"unknown criterion {crit}")
         log.info(f"tolerance {tol}")
         cluster_list = get_clusters(dendrogram, tol, crit)
+        if leader_assignment is not None:
+            # the models are in the cluster of their leader
+            cluster_list = cluster_list[leader_assignment]
         clusters = np.unique(cluster_list)
         log.info(f"clusters = {clusters}")
         # TODO: getting cluster centers. is this really necessary?
@@ -1,30 +1,68 @@
 """RMSD clustering."""
+import hashlib
+import json
 from pathlib import Path
 
 import numpy as np
 from scipy.cluster.hierarchy import fcluster, linkage
 
 from haddock import log
+from haddock.libs.libclust import (
+    is_condensed_matrix,
+    open_condensed_matrix,
+    read_matrix_header,
+    )
 from haddock.libs.libontology import RMSDFile
+from haddock.modules.analysis.rmsdmatrix.rmsd import get_index
+
+
+# saved in the dendrogram folder of the RMSD matrix, one per linkage type
+DENDROGRAM_FNAME = "rmsd_dendrogram_{linkage}.npz"
 
 
 def read_matrix(rmsd_matrix):
-    """Read the RMSD matrix."""
+    """
+    Read the RMSD matrix.
+
+    Binary condensed matrices are memory-mapped, without any parsing. Text
+    matrices (one `ref mod rmsd` line per pair) are still supported.
+    """
     if not isinstance(rmsd_matrix, RMSDFile):
         err = f"{type(rmsd_matrix)} is not a RMSDFile object."
         raise Exception(err)
     filename = Path(rmsd_matrix.path, rmsd_matrix.file_name)
-    # count lines
-    nlines = sum(1 for line in open(filename))
-    log.info(f"input rmsd matrix has {nlines} entries")
+    if is_condensed_matrix(filename):
+        return _read_condensed_matrix(filename, rmsd_matrix.npairs)
+    return _read_text_matrix(filename, rmsd_matrix.npairs)
+
+
+def _check_npairs(nlines, npairs):
+    """Check the number of elements of a condensed matrix."""
     # must be a 1D condensed distance matrix
     d = int(np.ceil(np.sqrt(nlines * 2)))
     if (d * (d - 1) / 2) != nlines:
         err = f"{nlines} is not a valid binomial coefficient"
         raise ValueError(err)
-    if nlines != rmsd_matrix.npairs:
-        err = f"number of pairs {nlines} != expected ({rmsd_matrix.npairs})"
+    if nlines != npairs:
+        err = f"number of pairs {nlines} != expected ({npairs})"
         raise ValueError(err)
+
+
+def _read_condensed_matrix(filename, npairs):
+    """Memory-map a binary condensed RMSD matrix."""
+    header = read_matrix_header(filename)
+    nlines = header["npairs"]
+    log.info(f"input rmsd matrix has {nlines} entries")
+    _check_npairs(nlines, npairs)
+    return open_condensed_matrix(filename)
+
+
+def _read_text_matrix(filename, npairs):
+    """Parse a text RMSD matrix."""
+    # count lines
+    nlines = sum(1 for line in open(filename))
+    log.info(f"input rmsd matrix has {nlines} entries")
+    _check_npairs(nlines, npairs)
     # creating and filling matrix obj
     matrix = np.zeros((nlines))
     c = 0
@@ -39,12 +77,250 @@ def read_matrix(rmsd_matrix):
     return matrix
 
 
+def get_nmodels(rmsd_matrix):
+    """Get the number of models of a condensed matrix."""
+    return int(np.ceil(np.sqrt(len(rmsd_matrix) * 2)))
+
+
+def condensed_index(nmodels, i, j):
+    """Get the condensed matrix indexes of the pairs (i, j), in any order."""
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    return get_index(nmodels, i, j)
+
+
 def get_dendrogram(rmsd_matrix, linkage_type):
-    """Get the dendrogram."""
+    """
+    Get the dendrogram.
+
+    The single linkage dendrogram is calculated with
+    :py:func:`single_linkage`, which does not load the matrix in memory.
+    """
+    if linkage_type == "single":
+        return single_linkage(rmsd_matrix)
     Z = linkage(rmsd_matrix, linkage_type)
     return Z
 
 
+def single_linkage(rmsd_matrix):
+    """
+    Get the single linkage dendrogram from the minimum spanning tree.
+
+    The minimum spanning tree is built with the Prim algorithm as in
+    :py:func:`scipy.cluster.hierarchy.linkage`, which gives the same
+    dendrogram, but the distances of each model are read from the
+    (memory-mapped) condensed matrix when the model is added to the tree.
+    Only arrays of the size of the number of models are kept in memory.
+
+    Parameters
+    ----------
+    rmsd_matrix : np.ndarray or np.memmap
+        The condensed RMSD matrix.
+
+    Returns
+    -------
+    np.ndarray
+        The linkage matrix, see :py:func:`scipy.cluster.hierarchy.linkage`.
+    """
+    nmodels = get_nmodels(rmsd_matrix)
+    tree = np.empty((nmodels - 1, 4))
+    # distance of each model to the tree
+    distances = np.full(nmodels, np.inf)
+    in_tree = np.zeros(nmodels, dtype=bool)
+    x = 0
+    for k in range(nmodels - 1):
+        in_tree[x] = True
+        others = np.flatnonzero(~in_tree)
+        x_distances = rmsd_matrix[condensed_index(nmodels, x, others)]
+        others_distances = np.minimum(distances[others], x_distances)
+        distances[others] = others_distances
+        y = others[np.argmin(others_distances)]
+        tree[k, :3] = x, y, distances[y]
+        x = y
+
+    # the edges are merged from the shortest
+    tree = tree[np.argsort(tree[:, 2], kind="mergesort")]
+    return _label_tree(tree, nmodels)
+
+
+def _label_tree(tree, nmodels):
+    """Label the clusters merged by the sorted edges of a spanning tree."""
+    cluster = np.arange(2 * nmodels - 1)
+    size = np.ones(2 * nmodels - 1, dtype=np.int64)
+
+    def find(node):
+        root = node
+        while cluster[root] != root:
+            root = cluster[root]
+        while cluster[node] != root:
+            cluster[node], node = root, cluster[node]
+        return root
+
+    for k in range(nmodels - 1):
+        new_cluster = nmodels + k
+        x, y = find(int(tree[k, 0])), find(int(tree[k, 1]))
+        x, y = min(x, y), max(x, y)
+        size[new_cluster] = size[x] + size[y]
+        tree[k, 0], tree[k, 1], tree[k, 3] = x, y, size[new_cluster]
+        cluster[x] = cluster[y] = new_cluster
+    return tree
+
+
+def get_leaders(rmsd_matrix, radius):
+    """
+    Group the models around leaders.
+
+    The models are visited in order, and each model becomes a new leader
+    if it is farther than `radius` from all the current leaders.
+    Otherwise, it is assigned to its closest leader.
+
+    Parameters
+    ----------
+    rmsd_matrix : np.ndarray or np.memmap
+        The condensed RMSD matrix.
+    radius : float
+        The maximum distance of the models to their leader.
+
+    Returns
+    -------
+    leaders : np.ndarray
+        The indexes of the leaders.
+    assignment : np.ndarray
+        The position in `leaders` of the leader of each model.
+    """
+    nmodels = get_nmodels(rmsd_matrix)
+    leaders = np.empty(nmodels, dtype=np.int64)
+    nleaders = 0
+    assignment = np.empty(nmodels, dtype=np.int64)
+    for model in range(nmodels):
+        if nleaders:
+            distances = rmsd_matrix[
+                condensed_index(nmodels, leaders[:nleaders], model)
+                ]
+            closest = int(np.argmin(distances))
+            if distances[closest] <= radius:
+                assignment[model] = closest
+                continue
+        leaders[nleaders] = model
+        assignment[model] = nleaders
+        nleaders += 1
+    return leaders[:nleaders].copy(), assignment
+
+
+def get_leaders_matrix(rmsd_matrix, leaders):
+    """
+    Get the condensed RMSD matrix of the leaders.
+
+    Parameters
+    ----------
+    rmsd_matrix : np.ndarray or np.memmap
+        The condensed RMSD matrix of all the models.
+    leaders : np.ndarray
+        The indexes of the leaders, sorted.
+
+    Returns
+    -------
+    np.ndarray
+        The condensed RMSD matrix of the leaders.
+    """
+    nmodels = get_nmodels(rmsd_matrix)
+    nleaders = len(leaders)
+    matrix = np.empty(nleaders * (nleaders - 1) // 2, dtype=rmsd_matrix.dtype)
+    start = 0
+    # one row of the matrix at a time
+    for i, leader in enumerate(leaders[:-1]):
+        row = rmsd_matrix[condensed_index(nmodels, leader, leaders[i + 1:])]
+        matrix[start:start + len(row)] = row
+        start += len(row)
+    return matrix
+
+
+def dendrogram_key(matrix_fname, **params):
+    """
+    Get the key of the dendrogram of a RMSD matrix.
+
+    The matrix is identified by its header, size and modification time, so
+    that the key is obtained without reading the matrix values.
+
+    Parameters
+    ----------
+    matrix_fname : str or pathlib.Path
+        The RMSD matrix file.
+    params : dict
+        The parameters used to calculate the dendrogram.
+
+    Returns
+    -------
+    str
+        The SHA-256 of the matrix description and the parameters.
+    """
+    stat = Path(matrix_fname).stat()
+    inputs = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "params": params,
+        }
+    if is_condensed_matrix(matrix_fname):
+        inputs["header"] = read_matrix_header(matrix_fname)
+    key = json.dumps(inputs, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(key).hexdigest()
+
+
+def save_dendrogram(fname, key, dendrogram, leader_assignment=None):
+    """
+    Save a dendrogram and the key of its inputs.
+
+    Parameters
+    ----------
+    fname : str or pathlib.Path
+        The `.npz` file where to save the dendrogram.
+    key : str
+        The key of the inputs, see :py:func:`dendrogram_key`.
+    dendrogram : np.ndarray
+        The linkage matrix.
+    leader_assignment : np.ndarray or None
+        The leader of each model, if the leaders were clustered instead of
+        the models, see :py:func:`get_leaders`.
+    """
+    if leader_assignment is None:
+        leader_assignment = np.array([], dtype=np.int64)
+    np.savez(
+        fname,
+        key=np.array(key),
+        dendrogram=dendrogram,
+        leader_assignment=leader_assignment,
+        )
+
+
+def load_dendrogram(fname, key):
+    """
+    Load a dendrogram saved with :py:func:`save_dendrogram`.
+
+    Parameters
+    ----------
+    fname : str or pathlib.Path
+        The `.npz` file of the dendrogram.
+    key : str
+        The key of the current inputs, see :py:func:`dendrogram_key`.
+
+    Returns
+    -------
+    tuple or None
+        The linkage matrix and the leader of each model (`None` if the
+        leaders were not used). `None` if the file does not exist or if the
+        dendrogram was calculated from other inputs.
+    """
+    if not Path(fname).exists():
+        return None
+    with np.load(fname, allow_pickle=False) as saved:
+        if "key" not in saved.files or str(saved["key"]) != key:
+            log.info(f"{fname} was calculated from other inputs")
+            return None
+        leader_assignment = saved["leader_assignment"]
+        if not leader_assignment.size:
+            leader_assignment = None
+        return saved["dendrogram"], leader_assignment
+
+
 def get_clusters(dendrogram, tolerance, criterion):
     """Obtain the clusters."""
     log.info('Clustering dendrogram...')
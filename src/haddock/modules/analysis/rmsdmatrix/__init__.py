@@ -5,15 +5,25 @@ This module calculates of the RMSD matrix between all the models
 generated in the previous step.
 
 As all the pairwise RMSD calculations are independent, the module distributes
-them over all the available cores in an optimal way.
-
-Once created, the RMSD matrix is saved in text form in the current `rmsdmatrix`
-folder. The path to this file is then shared with the following step of the
-workflow by means of the json file `rmsd_matrix.json`.
-
-The module accepts two parameters in input, namely:
+them over all the available cores in an optimal way. The coordinates of each
+model are read only once and stored in a memory-mapped array shared by all the
+cores.
+
+Once created, the RMSD matrix is saved in the current `rmsdmatrix` folder as
+a binary condensed matrix, `rmsd_matrix.bin` (see
+:py:mod:`haddock.libs.libclust` for the format). The pairs are split in
+jobs of at most one million pairs, and each job writes its own slice of the
+matrix directly in this file, so that the matrix is never held in memory.
+The following clustering step can memory-map it without any parsing. The
+path to this file is then shared with the following step of the workflow by
+means of the json file `rmsd_matrix.json`, together with the `dendrograms`
+folder where the `clustrmsd` steps save the dendrograms of the matrix.
+
+The module accepts three parameters in input, namely:
 
 * `max_models` (default = 10000)
+* `matrix_txt` (default = false) : also export the matrix in text form to
+  `rmsd.matrix`, one `model_i model_j rmsd` line per pair.
 * `resdic_` : an expandable parameter to specify which residues must be
   considered for the alignment and the RMSD calculation. If there are
   two proteins denoted by chain IDs A and B, then the user can operate
@@ -28,21 +38,35 @@ to 4 of chain B for the alignment and RMSD calculation.
 import contextlib
 from pathlib import Path
 
+import numpy as np
+
 from haddock import log
+from haddock.libs.libclust import (
+    export_condensed_matrix,
+    init_condensed_matrix,
+    open_condensed_matrix,
+    )
 from haddock.libs.libontology import ModuleIO, RMSDFile
 from haddock.libs.libparallel import Scheduler
 from haddock.libs.libutil import parse_ncores
 from haddock.modules import BaseHaddockModule
 from haddock.modules.analysis import confirm_resdic_chainid_length
 from haddock.modules.analysis.rmsdmatrix.rmsd import (
+    COORDS_FNAME,
     RMSD,
+    RMSD_JOB_PAIRS,
     RMSDJob,
+    get_filter_resdic,
+    preload_coords,
     rmsd_dispatcher,
     )
 
 
 RECIPE_PATH = Path(__file__).resolve().parent
 DEFAULT_CONFIG = Path(RECIPE_PATH, "defaults.yaml")
+MATRIX_FNAME = "rmsd_matrix.bin"
+MATRIX_TXT_FNAME = "rmsd.matrix"
+DENDROGRAM_DIR = "dendrograms"
 
 
 class HaddockModule(BaseHaddockModule):
@@ -58,21 +82,6 @@ class HaddockModule(BaseHaddockModule):
         """Confirm if contact executable is compiled."""
         return
 
-    def _rearrange_output(self, output_name, path, ncores):
-        """Combine different rmsd outputs in a single file."""
-        output_fname = Path(path, output_name)
-        self.log(f"rearranging output files into {output_fname}")
-        # Combine files
-        with open(output_fname, 'w') as out_file:
-            for core in range(ncores):
-                tmp_file = Path(path, "rmsd_" + str(core) + ".matrix")
-                with open(tmp_file) as infile:
-                    out_file.write(infile.read())
-                log.debug(f"File number {core} written")
-                tmp_file.unlink()
-        log.info("Completed reconstruction of rmsd files.")
-        log.info(f"{output_fname} created.")
-
     def update_params(self, *args, **kwargs):
         """Update parameters."""
         super().update_params(*args, **kwargs)
@@ -101,71 +110,100 @@ class HaddockModule(BaseHaddockModule):
         tot_npairs = nmodels * (nmodels - 1) // 2
         log.info(f"total number of pairs {tot_npairs}")
         ncores = parse_ncores(n=self.params['ncores'], njobs=tot_npairs)
+        # at least one job per core, and jobs of a bounded size
+        njobs = max(ncores, -(-tot_npairs // RMSD_JOB_PAIRS))
         npairs, ref_structs, mod_structs = rmsd_dispatcher(
             nmodels,
             tot_npairs,
-            ncores)
+            njobs)
+
+        # Parse each model only once and share the coordinates with the
+        #  workers through a memory-mapped array
+        self.log(f"loading the coordinates of {nmodels} models")
+        filter_resdic = get_filter_resdic(self.params)
+        if filter_resdic:
+            log.info(f"Using filtering dictionary {filter_resdic}")
+        else:
+            log.info("No filtering dictionary, using all residues")
+        coords, _ = preload_coords(
+            models,
+            filter_resdic,
+            ncores=parse_ncores(n=self.params['ncores'], njobs=nmodels),
+            pool=self.worker_pool,
+            )
+        coords_f = Path(COORDS_FNAME)
+        np.save(coords_f, coords)
+        del coords
 
-        # Calculate the rmsd for each set of models
+        # The matrix is allocated once, each core fills its own slice
+        output_name = MATRIX_FNAME
+        init_condensed_matrix(
+            output_name,
+            [model.file_name for model in models],
+            )
+
+        # Calculate the rmsd for each set of models, each job writes its
+        #  values to its slice of the matrix
         rmsd_jobs = []
-        self.log(f"running Rmsd Jobs with {ncores} cores")
-        for core in range(ncores):
-            output_name = "rmsd_" + str(core) + ".matrix"
+        self.log(f"running {njobs} Rmsd Jobs with {ncores} cores")
+        for job_id in range(njobs):
             rmsd_obj = RMSD(
-                models,
-                core,
-                npairs[core],
-                ref_structs[core],
-                mod_structs[core],
+                nmodels,
+                job_id,
+                npairs[job_id],
+                ref_structs[job_id],
+                mod_structs[job_id],
                 output_name,
                 path=Path("."),
-                params=self.params
+                coords=coords_f,
                 )
             job_f = Path(output_name)
             # init RMSDJob
             job = RMSDJob(
                 job_f,
                 self.params,
-                rmsd_obj
+                rmsd_obj,
                 )
             rmsd_jobs.append(job)
 
-        rmsd_engine = Scheduler(rmsd_jobs, ncores=ncores)
+        rmsd_engine = Scheduler(
+            rmsd_jobs,
+            ncores=ncores,
+            pool=self.worker_pool,
+            )
         rmsd_engine.run()
-
-        rmsd_file_l = []
-        not_found = []
-        for job in rmsd_jobs:
-            if not job.output.exists():
-                # NOTE: If there is no output, most likely the RMSD calculation
-                # timed out
-                not_found.append(job.output.name)
-                wrn = f'Rmsd results were not calculated for {job.output.name}'
-                log.warning(wrn)
-            else:
-                rmsd_file_l.append(str(job.output))
-
-        if not_found:
+        coords_f.unlink()
+
+        # NOTE: the matrix is initialised with NaN, any value left means
+        #  the RMSD calculation of a job failed
+        matrix = open_condensed_matrix(output_name)
+        missing = sum(
+            int(np.isnan(matrix[start:start + RMSD_JOB_PAIRS]).sum())
+            for start in range(0, tot_npairs, RMSD_JOB_PAIRS)
+            )
+        del matrix
+        if missing:
             # Not all distances were calculated, cannot create the full matrix
-            self.finish_with_error("Several files were not generated:"
-                                   f" {not_found}")
+            self.finish_with_error(
+                f"{missing} RMSD values were not calculated in {output_name}"
+                )
+        log.info(f"{output_name} created.")
 
-        # Post-processing : single file
-        output_name = "rmsd.matrix"
-        self._rearrange_output(
-            output_name,
-            path=rmsd_obj.path,
-            ncores=ncores
-            )
+        if self.params["matrix_txt"]:
+            export_condensed_matrix(output_name, MATRIX_TXT_FNAME)
 
         # Sending models to the next step of the workflow
         self.output_models = models
         self.export_output_models()
         # Sending matrix path to the next step of the workflow
+        #  together with the folder where the clustrmsd steps save the
+        #  dendrograms of this matrix
+        Path(DENDROGRAM_DIR).mkdir(exist_ok=True)
         matrix_io = ModuleIO()
         rmsd_matrix_file = RMSDFile(
             output_name,
-            npairs=tot_npairs
+            npairs=tot_npairs,
+            dendrogram_dir=DENDROGRAM_DIR,
             )
         matrix_io.add(rmsd_matrix_file)
         matrix_io.save(filename="rmsd_matrix.json")
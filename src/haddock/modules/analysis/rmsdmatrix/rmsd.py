@@ -1,17 +1,18 @@
 """RMSD calculations."""
-import os
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 
 from haddock import log
-from haddock.libs.libalign import (
-    calc_rmsd,
-    centroid,
-    get_atoms,
-    kabsch,
-    load_coords,
-    )
+from haddock.libs.libalign import get_atoms, kabsch_rmsd_pairs, load_coords
+from haddock.libs.libclust import open_condensed_matrix
+from haddock.libs.libparallel import use_pool
+
+
+COORDS_FNAME = "rmsd_coords.npy"
+# the maximum number of pairs of a RMSDJob, bounds the memory used by each job
+RMSD_JOB_PAIRS = 1000000
 
 
 class RMSDJob:
@@ -21,18 +22,32 @@ class RMSDJob:
             self,
             output,
             params,
-            rmsd_obj):
+            rmsd_obj,
+            ):
+        """
+        Initialise the job.
+
+        Parameters
+        ----------
+        output : pathlib.Path
+            The matrix file.
 
-        log.info(f"core {rmsd_obj.core}, initialising RMSD...")
-        log.info(f"core {rmsd_obj.core}, # of pairs : {rmsd_obj.npairs}")
+        params : dict
+            The module parameters.
+
+        rmsd_obj : :py:class:`RMSD`
+            The RMSD calculation to run.
+        """
         self.output = output
         self.params = params
         self.rmsd_obj = rmsd_obj
-        log.info(f"core {rmsd_obj.core}, RMSD initialised")
 
     def run(self):
-        """Run this RMSDJob."""
-        log.info(f"core {self.rmsd_obj.core}, running RMSD...")
+        """Run this RMSDJob and write its values to the matrix file."""
+        log.debug(
+            f"core {self.rmsd_obj.core}, "
+            f"running RMSD of {self.rmsd_obj.npairs} pairs..."
+            )
         self.rmsd_obj.run()
         self.rmsd_obj.output()
         return
@@ -43,13 +58,14 @@ class RMSD:
 
     def __init__(
             self,
-            model_list,
+            nmodels,
             core,
             npairs,
             start_ref,
             start_mod,
             output_name,
             path,
+            coords,
             **params,
             ):
         """
@@ -58,8 +74,8 @@ class RMSD:
         Parameters
         ----------
 
-        model_list : list
-            List of models
+        nmodels : int
+            the number of models
 
         core : int
             index of the current core
@@ -75,98 +91,180 @@ class RMSD:
             RMSD calculations starting from the pair (start_ref, start_mod)
 
         output_name : str
-            name of the core-specific output file
+            name of the binary condensed matrix file, as created by
+            :py:func:`haddock.libs.libclust.init_condensed_matrix`. Each
+            core writes its own slice of the matrix.
 
         path : pathlib.Path
             path to the current directory
 
+        coords : str, pathlib.Path or np.ndarray
+            the coordinates of all the models, as returned by
+            :py:func:`preload_coords`, or the path to the `.npy` file
+            where they are stored.
+
         **params : dict
             additional parameters
         """
-        self.model_list = model_list
+        self.nmodels = nmodels
         self.core = core
         self.npairs = npairs
         self.start_ref = start_ref
         self.start_mod = start_mod
-        # choice of atoms
-        if "params" in params.keys():
-            self.filter_resdic = {
-                key[-1]: value for key, value
-                in params["params"].items()
-                if key.startswith("resdic")
-                }
-        else:
-            self.filter_resdic = {}
-        if self.filter_resdic:
-            log.info(f"Using filtering dictionary {self.filter_resdic}")
-        else:
-            log.info("No filtering dictionary, using all residues")
+        # position of the first pair in the condensed matrix
+        self.start_idx = get_index(nmodels, start_ref, start_mod)
         self.output_name = output_name
         self.path = path
-        self.atoms = {}
-        for m in model_list:
-            self.atoms.update(get_atoms(m))
-        # data array
-        self.data = np.zeros((self.npairs, 3))
+        self.coords = coords
+        # RMSD of each pair, calculated by `run`
+        self.rmsd = None
+
+    def load_coords_array(self):
+        """
+        Get the coordinates array of all the models.
+
+        If the coordinates were given as a `.npy` file, the file is memory
+        mapped so that all the workers share the same pages.
+        """
+        if isinstance(self.coords, np.ndarray):
+            return self.coords
+        return np.load(self.coords, mmap_mode="r")
 
     def run(self):
         """Run calculations."""
-        # initialising the number of pairs
-        ref = self.start_ref
-        mod = self.start_mod
-        nmodels = len(self.model_list)
-        for n in range(self.npairs):
-
-            ref_coord_dic, _ = load_coords(
-                self.model_list[ref], self.atoms, self.filter_resdic
-                )
-
-            mod_coord_dic, _ = load_coords(
-                self.model_list[mod], self.atoms, self.filter_resdic
-                )
-            P = []
-            Q = []
-            for k in ref_coord_dic.keys() & mod_coord_dic.keys():
-                ref_xyz = ref_coord_dic[k]
-                mod_xyz = mod_coord_dic[k]
-                Q.append(ref_xyz)
-                P.append(mod_xyz)
-            Q = np.asarray(Q)
-            P = np.asarray(P)
-            Q = Q - centroid(Q)
-            P = P - centroid(P)
-            U = kabsch(P, Q)
-            P = np.dot(P, U)
-            rmsd = calc_rmsd(P, Q)
-            # saving output (adding one for consistency with clusterfcc)
-            self.data[n, 0] = ref + 1
-            self.data[n, 1] = mod + 1
-            self.data[n, 2] = rmsd
-            # updating indices
-            if mod == (nmodels - 1):
-                ref += 1
-                mod = ref + 1
-            else:
-                mod += 1
+        coords = self.load_coords_array()
+        pair_idx = np.arange(self.start_idx, self.start_idx + self.npairs)
+        ref_idx, mod_idx = get_pairs(self.nmodels, pair_idx)
+        # all the pairs of this core are superimposed in stacked blocks
+        rmsd = kabsch_rmsd_pairs(coords, ref_idx, mod_idx)
+        # in the precision of the matrix file
+        self.rmsd = rmsd.astype(np.float32)
+
+    def check_low_values(self):
+        """Warn if there are very low values in the RMSD vector."""
+        check_low_values = np.isclose(self.rmsd, 0.0, atol=0.1).any()
+        if check_low_values:
+            log.warning(f"core {self.core}: low values of RMSD detected.")
 
     def output(
             self,
             ):
-        """Write down the RMSD matrix."""
+        """Write down the RMSD values in the slice of the condensed matrix."""
         output_fname = Path(self.path, self.output_name)
-        # check if there are very low values in the RMSD vector
-        check_low_values = np.isclose(
-            self.data[:, 2],
-            np.zeros(self.npairs),
-            atol=0.1
-            ).any()
-        if check_low_values:
-            log.warning(f"core {self.core}: low values of RMSD detected.")
-        with open(output_fname, "w") as out_fh:
-            for data in list(self.data):
-                data_str = f"{data[0]:.0f} {data[1]:.0f} {data[2]:.3f}"
-                data_str += os.linesep
-                out_fh.write(data_str)
+        self.check_low_values()
+        matrix = open_condensed_matrix(
+            output_fname,
+            mode="r+",
+            start=self.start_idx,
+            count=self.npairs,
+            )
+        matrix[:] = self.rmsd
+        if isinstance(matrix, np.memmap):
+            matrix.flush()
+        del matrix
+
+
+def get_filter_resdic(params):
+    """
+    Get the residues to be considered from the `resdic_*` parameters.
+
+    Parameters
+    ----------
+    params : dict
+        The module parameters.
+
+    Returns
+    -------
+    filter_resdic : dict
+        Dictionary of residues to be loaded (one list per chain).
+    """
+    filter_resdic = {
+        key[-1]: value for key, value
+        in params.items()
+        if key.startswith("resdic")
+        }
+    return filter_resdic
+
+
+def load_model_coords(pdb_f, filter_resdic=None):
+    """
+    Load the coordinates of a single model.
+
+    Parameters
+    ----------
+    pdb_f : PosixPath or :py:class:`haddock.libs.libontology.PDBFile`
+        The model to be loaded.
+
+    filter_resdic : dict
+        Dictionary of residues to be loaded (one list per chain).
+
+    Returns
+    -------
+    coord_dic : dict
+        Dictionary of coordinates, keyed by (chain, resnum, atom_name).
+    """
+    atoms = get_atoms(pdb_f)
+    coord_dic, _ = load_coords(pdb_f, atoms, filter_resdic)
+    return coord_dic
+
+
+def preload_coords(model_list, filter_resdic=None, ncores=1, pool=None):
+    """
+    Load the coordinates of all the models in a common-atom array.
+
+    Each model is parsed only once (in parallel if `ncores` > 1) and only
+    the atoms present in all the models are kept, so that the same index
+    refers to the same atom in every model. Unlike a selection made pair
+    by pair, an atom missing in a single model is left out of the RMSD of
+    all the pairs; a warning is logged when this happens.
+
+    Parameters
+    ----------
+    model_list : list
+        List of models.
+
+    filter_resdic : dict
+        Dictionary of residues to be loaded (one list per chain).
+
+    ncores : int
+        Number of processes used to parse the models.
+
+    pool : :py:class:`haddock.libs.libparallel.WorkerPool` or None
+        The pool of processes shared by the workflow. If not given, new
+        processes are created.
+
+    Returns
+    -------
+    coords : np.ndarray dtype=float32, shape=(n_models, n_atoms, 3)
+        The coordinates of the common atoms of all the models.
+
+    atom_keys : list
+        The (chain, resnum, atom_name) identifier of each atom.
+    """
+    load_func = partial(load_model_coords, filter_resdic=filter_resdic)
+    if ncores > 1:
+        chunksize = max(1, len(model_list) // (ncores * 4))
+        with use_pool(ncores, pool=pool) as pool_:
+            coord_dics = list(pool_.imap(load_func, model_list, chunksize))
+    else:
+        coord_dics = [load_func(model) for model in model_list]
+
+    common_keys = set(coord_dics[0]) if coord_dics else set()
+    for coord_dic in coord_dics[1:]:
+        common_keys &= coord_dic.keys()
+    atom_keys = sorted(common_keys)
+    log.info(f"{len(atom_keys)} atoms in common among {len(model_list)} models")
+    all_keys = set().union(*coord_dics)
+    if len(all_keys) > len(atom_keys):
+        log.warning(
+            f"{len(all_keys) - len(atom_keys)} atoms are missing in some "
+            "models and are left out of the RMSD of all the pairs"
+            )
+
+    coords = np.empty((len(model_list), len(atom_keys), 3), dtype=np.float32)
+    for n, coord_dic in enumerate(coord_dics):
+        coords[n] = np.reshape([coord_dic[k] for k in atom_keys], (-1, 3))
+    return coords, atom_keys
 
 
 def get_pair(nmodels, idx):
@@ -182,6 +280,40 @@ def get_pair(nmodels, idx):
     return (int(i), int(j))
 
 
+def get_pairs(nmodels, idx):
+    """
+    Get the pairs of structures given an array of 1D matrix indices.
+
+    Vectorised version of :py:func:`get_pair`.
+
+    Parameters
+    ----------
+    nmodels : int
+        Number of models.
+
+    idx : np.ndarray dtype=int
+        Indices of the condensed matrix.
+
+    Returns
+    -------
+    i : np.ndarray dtype=int
+        Indices of the reference structures.
+
+    j : np.ndarray dtype=int
+        Indices of the mobile structures.
+    """
+    idx = np.asarray(idx, dtype=np.int64)
+    b = 1 - (2 * nmodels)
+    i = ((-b - np.sqrt(b ** 2 - 8 * idx)) // 2).astype(np.int64)
+    j = idx + i * (b + i + 2) // 2 + 1
+    return i, j
+
+
+def get_index(nmodels, i, j):
+    """Get the 1D matrix index of the pair of structures (i, j), i < j."""
+    return i * (2 * nmodels - i - 1) // 2 + (j - i - 1)
+
+
 def rmsd_dispatcher(nmodels, tot_npairs, ncores):
     """Optimal dispatching of rmsd jobs."""
     base_pairs = tot_npairs // ncores
@@ -7,10 +7,20 @@ from haddock import log
 from haddock import toppar_path as global_toppar
 from haddock.core.defaults import cns_exec as global_cns_exec
 from haddock.gear.expandable_parameters import populate_mol_parameters_in_module
+from haddock.gear.haddockmodel import (
+    ENERGIES_TABLE,
+    calc_haddock_scores,
+    read_energies,
+    write_energies_table,
+    )
 from haddock.libs.libio import working_directory
 from haddock.modules import BaseHaddockModule
 
 
+# weights of the HADDOCK score
+SCORE_WEIGHT_KEYS = ("w_vdw", "w_elec", "w_desolv", "w_air", "w_bsa")
+
+
 class BaseCNSModule(BaseHaddockModule):
     """
     Operation module for CNS.
@@ -59,6 +69,49 @@ class BaseCNSModule(BaseHaddockModule):
 
         log.info(f'Module [{self.name}] finished.')
 
+    def score_output_models(self, energies):
+        """
+        Calculate the HADDOCK score of the output models.
+
+        The energies of the scored models are saved to the
+        `ENERGIES_TABLE` file of the step, see `haddock3-rescore`.
+
+        Parameters
+        ----------
+        energies : list
+            The energies returned by the CNS jobs, in the order of
+            `self.output_models`. Models without energies, for example
+            when the engine does not return the results of the jobs,
+            have their energies read from their PDB file.
+        """
+        weights = {e: self.params[e] for e in SCORE_WEIGHT_KEYS}
+
+        scored_models = []
+        models_energies = []
+        for pdb, pdb_energies in zip(self.output_models, energies):
+            if not pdb.is_present():
+                continue
+            if pdb_energies is None:
+                pdb_energies = read_energies(pdb.file_name)
+            scored_models.append(pdb)
+            models_energies.append(pdb_energies)
+
+        energies_table = {}
+        for key in weights:
+            term = key.split('_')[1]
+            energies_table[term] = [e[term] for e in models_energies]
+        scores = calc_haddock_scores(energies_table, **weights)
+        for pdb, score in zip(scored_models, scores):
+            pdb.score = float(score)
+
+        # the models can be scored again with other weights from this table
+        write_energies_table(
+            ENERGIES_TABLE,
+            [pdb.file_name for pdb in scored_models],
+            models_energies,
+            weights,
+            )
+
     def default_envvars(self):
         """Return default env vars updated to `envvars` (if given)."""
         default_envvars = {
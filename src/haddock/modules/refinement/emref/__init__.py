@@ -1,7 +1,6 @@
 """Energy minimization refinement with CNS."""
 from pathlib import Path
 
-from haddock.gear.haddockmodel import HaddockModel
 from haddock.libs.libcns import prepare_cns_input, prepare_expected_pdb
 from haddock.libs.libsubprocess import CNSJob
 from haddock.modules import get_engine
@@ -60,6 +59,7 @@ class HaddockModule(BaseCNSModule):
                     self.params,
                     "emref",
                     native_segid=True,
+                    lazy=True,
                     )
                 out_file = f"emref_{idx}.out"
 
@@ -70,7 +70,12 @@ class HaddockModule(BaseCNSModule):
 
                 self.output_models.append(expected_pdb)
 
-                job = CNSJob(inp_file, out_file, envvars=self.envvars)
+                job = CNSJob(
+                    inp_file,
+                    out_file,
+                    envvars=self.envvars,
+                    output_pdb=expected_pdb.file_name,
+                    )
 
                 jobs.append(job)
 
@@ -78,21 +83,15 @@ class HaddockModule(BaseCNSModule):
 
         # Run CNS Jobs
         self.log(f"Running CNS Jobs n={len(jobs)}")
-        Engine = get_engine(self.params['mode'], self.params)
+        Engine = get_engine(
+            self.params['mode'],
+            self.params,
+            pool=self.worker_pool,
+            )
         engine = Engine(jobs)
         engine.run()
         self.log("CNS jobs have finished")
 
-        # Get the weights needed for the CNS module
-        _weight_keys = ("w_vdw", "w_elec", "w_desolv", "w_air", "w_bsa")
-        weights = {e: self.params[e] for e in _weight_keys}
-
-        for pdb in self.output_models:
-            if pdb.is_present():
-                haddock_score = HaddockModel(pdb.file_name).calc_haddock_score(
-                    **weights
-                    )
-
-                pdb.score = haddock_score
+        self.score_output_models(engine.results)
 
         self.export_output_models(faulty_tolerance=self.params["tolerance"])
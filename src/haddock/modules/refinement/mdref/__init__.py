@@ -1,7 +1,6 @@
 """Water refinement with CNS."""
 from pathlib import Path
 
-from haddock.gear.haddockmodel import HaddockModel
 from haddock.libs.libcns import prepare_cns_input, prepare_expected_pdb
 from haddock.libs.libsubprocess import CNSJob
 from haddock.modules import get_engine
@@ -58,6 +57,7 @@ class HaddockModule(BaseCNSModule):
                     self.params,
                     "mdref",
                     native_segid=True,
+                    lazy=True,
                     )
                 out_file = f"mdref_{idx}.out"
 
@@ -68,7 +68,12 @@ class HaddockModule(BaseCNSModule):
 
                 self.output_models.append(expected_pdb)
 
-                job = CNSJob(inp_file, out_file, envvars=self.envvars)
+                job = CNSJob(
+                    inp_file,
+                    out_file,
+                    envvars=self.envvars,
+                    output_pdb=expected_pdb.file_name,
+                    )
 
                 jobs.append(job)
 
@@ -76,22 +81,16 @@ class HaddockModule(BaseCNSModule):
 
         # Run CNS Jobs
         self.log(f"Running CNS Jobs n={len(jobs)}")
-        Engine = get_engine(self.params['mode'], self.params)
+        Engine = get_engine(
+            self.params['mode'],
+            self.params,
+            pool=self.worker_pool,
+            )
         engine = Engine(jobs)
         engine.run()
         self.log("CNS jobs have finished")
 
-        # Get the weights from the defaults
-        _weight_keys = ("w_vdw", "w_elec", "w_desolv", "w_air", "w_bsa")
-        weights = {e: self.params[e] for e in _weight_keys}
-
-        for pdb in self.output_models:
-            if pdb.is_present():
-                haddock_score = HaddockModel(pdb.file_name).calc_haddock_score(
-                    **weights
-                    )
-
-                pdb.score = haddock_score
+        self.score_output_models(engine.results)
 
         # Save module information
         self.export_output_models(faulty_tolerance=self.params["tolerance"])
@@ -30,7 +30,6 @@ sure to sample enough the possible interaction space.
 """
 from pathlib import Path
 
-from haddock.gear.haddockmodel import HaddockModel
 from haddock.libs.libcns import prepare_cns_input
 from haddock.libs.libontology import PDBFile
 from haddock.libs.libsubprocess import CNSJob
@@ -98,6 +97,7 @@ class HaddockModule(BaseCNSModule):
                     "rigidbody",
                     default_params_path=self.toppar_path,
                     native_segid=True,
+                    lazy=True,
                     )
 
                 log_fname = f"rigidbody_{idx}.out"
@@ -108,30 +108,27 @@ class HaddockModule(BaseCNSModule):
                 model.topology = [e.topology for e in combination]
                 self.output_models.append(model)
 
-                job = CNSJob(inp_file, log_fname, envvars=self.envvars)
+                job = CNSJob(
+                    inp_file,
+                    log_fname,
+                    envvars=self.envvars,
+                    output_pdb=output_pdb_fname,
+                    )
                 jobs.append(job)
 
                 idx += 1
 
         # Run CNS Jobs
         self.log(f"Running CNS Jobs n={len(jobs)}")
-        Engine = get_engine(self.params['mode'], self.params)
+        Engine = get_engine(
+            self.params['mode'],
+            self.params,
+            pool=self.worker_pool,
+            )
         engine = Engine(jobs)
         engine.run()
         self.log("CNS jobs have finished")
 
-        # Get the weights according to CNS parameters
-        _weight_keys = ("w_vdw", "w_elec", "w_desolv", "w_air", "w_bsa")
-        weights = {e: self.params[e] for e in _weight_keys}
-
-        for model in self.output_models:
-            if model.is_present():
-                # Score the model
-                haddock_score = HaddockModel(
-                    model.file_name).calc_haddock_score(
-                    **weights
-                    )
-
-                model.score = haddock_score
+        self.score_output_models(engine.results)
 
         self.export_output_models(faulty_tolerance=self.params["tolerance"])
@@ -1,7 +1,6 @@
 """EM scoring module."""
 from pathlib import Path
 
-from haddock.gear.haddockmodel import HaddockModel
 from haddock.libs.libcns import prepare_cns_input, prepare_expected_pdb
 from haddock.libs.libsubprocess import CNSJob
 from haddock.modules import get_engine
@@ -47,7 +46,9 @@ class HaddockModule(ScoringModule):
                 self.recipe_str,
                 self.params,
                 "emscoring",
-                native_segid=True)
+                native_segid=True,
+                lazy=True,
+                )
 
             scoring_out = f"emscoring_{model_num}.out"
 
@@ -61,29 +62,27 @@ class HaddockModule(ScoringModule):
 
             self.output_models.append(expected_pdb)
 
-            job = CNSJob(scoring_inp, scoring_out, envvars=self.envvars)
+            job = CNSJob(
+                scoring_inp,
+                scoring_out,
+                envvars=self.envvars,
+                output_pdb=expected_pdb.file_name,
+                )
 
             jobs.append(job)
 
         # Run CNS Jobs
         self.log(f"Running CNS Jobs n={len(jobs)}")
-        Engine = get_engine(self.params['mode'], self.params)
+        Engine = get_engine(
+            self.params['mode'],
+            self.params,
+            pool=self.worker_pool,
+            )
         engine = Engine(jobs)
         engine.run()
         self.log("CNS jobs have finished")
 
-        # Get the weights from the defaults
-        _weight_keys = ("w_vdw", "w_elec", "w_desolv", "w_air", "w_bsa")
-        weights = {e: self.params[e] for e in _weight_keys}
-
-        # Check for generated output, fail it not all expected files are found
-        for pdb in self.output_models:
-            if pdb.is_present():
-                haddock_score = HaddockModel(pdb.file_name).calc_haddock_score(
-                    **weights
-                    )
-
-                pdb.score = haddock_score
+        self.score_output_models(engine.results)
 
         output_fname = "emscoring.tsv"
         self.log(f"Saving output to {output_fname}")
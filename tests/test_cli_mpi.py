@@ -0,0 +1,150 @@
+"""Test the haddock3-mpitask client without MPI."""
+import pickle
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from haddock.clis import cli_mpi
+from haddock.libs.libmpi import get_results_path
+from haddock.libs.libparallel import run_indexed_task
+
+
+class ValueTask:
+    """A task returning its value, or failing."""
+
+    def __init__(self, value, fail=False):
+        self.value = value
+        self.fail = fail
+        self.return_result = True
+
+    def run(self):
+        """Run the task."""
+        if self.fail:
+            raise ValueError("this task fails")
+        return self.value
+
+
+class FakeStatus:
+    """Stand-in for `MPI.Status`."""
+
+    def __init__(self):
+        self.source = None
+        self.tag = None
+
+    def Get_source(self):
+        """Get the rank that sent the last message."""
+        return self.source
+
+    def Get_tag(self):
+        """Get the tag of the last message."""
+        return self.tag
+
+
+class FakeComm:
+    """
+    Stand-in for `MPI.COMM_WORLD`, seen from the master rank.
+
+    The workers run the tasks they receive right away and are then ready
+    for the next one, in turns.
+    """
+
+    def __init__(self, size, rank=0):
+        self.size = size
+        self.rank = rank
+        self.ready = deque((worker, None) for worker in range(1, size))
+        self.dispatched = []
+        self.exited = []
+
+    def recv(self, source, tag, status):
+        """Receive the result of the previous task of the next worker."""
+        worker, result = self.ready.popleft()
+        status.source = worker
+        status.tag = tag
+        return result
+
+    def send(self, obj, dest, tag):
+        """Send a task or the exit message to a worker."""
+        if tag == cli_mpi.TAG_EXIT:
+            self.exited.append(dest)
+            return
+        assert tag == cli_mpi.TAG_TASK
+        self.dispatched.append(obj[0])
+        self.ready.append((dest, run_indexed_task(obj)))
+
+
+@pytest.fixture
+def fake_mpi(monkeypatch):
+    """Replace the MPI module of the client."""
+    monkeypatch.setattr(
+        cli_mpi,
+        "MPI",
+        SimpleNamespace(Status=FakeStatus, ANY_SOURCE=-1, ANY_TAG=-1),
+        )
+
+
+@pytest.fixture
+def pickled_tasks(tmp_path):
+    """Pickle some tasks as MPIScheduler does."""
+    tasks = [ValueTask(i, fail=(i == 3)) for i in range(6)]
+    fpath = Path(tmp_path, "mpi.pkl")
+    with open(fpath, "wb") as fout:
+        pickle.dump(tasks, fout)
+    return fpath
+
+
+def read_results(pickled_tasks):
+    """Read the results written by the client."""
+    with open(get_results_path(pickled_tasks), "rb") as fin:
+        return pickle.load(fin)
+
+
+def test_main_serial(fake_mpi, monkeypatch, pickled_tasks):
+    """Test the tasks run in the master rank when there are no workers."""
+    monkeypatch.setattr(cli_mpi, "COMM", FakeComm(size=1))
+
+    cli_mpi.main(pickled_tasks)
+
+    assert read_results(pickled_tasks) == [
+        (0, True, 0),
+        (1, True, 1),
+        (2, True, 2),
+        (3, False, None),
+        (4, True, 4),
+        (5, True, 5),
+        ]
+
+
+@pytest.mark.parametrize("size", [2, 4, 10])
+def test_master(fake_mpi, monkeypatch, size):
+    """Test each task is dispatched once and all the workers exit."""
+    comm = FakeComm(size=size)
+    monkeypatch.setattr(cli_mpi, "COMM", comm)
+    tasks = [ValueTask(i, fail=(i == 3)) for i in range(6)]
+
+    results = cli_mpi.master(tasks)
+
+    assert comm.dispatched == list(range(len(tasks)))
+
+    assert sorted(comm.exited) == list(range(1, size))
+
+    assert sorted(results) == [
+        (0, True, 0),
+        (1, True, 1),
+        (2, True, 2),
+        (3, False, None),
+        (4, True, 4),
+        (5, True, 5),
+        ]
+
+
+def test_main_master(fake_mpi, monkeypatch, pickled_tasks):
+    """Test the results of the workers are pickled by the master."""
+    monkeypatch.setattr(cli_mpi, "COMM", FakeComm(size=3))
+
+    cli_mpi.main(pickled_tasks)
+
+    assert sorted(read_results(pickled_tasks))[0] == (0, True, 0)
+
+    assert len(read_results(pickled_tasks)) == 6
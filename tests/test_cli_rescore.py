@@ -0,0 +1,55 @@
+"""Test the haddock3-rescore client."""
+from pathlib import Path
+
+import pytest
+
+from haddock.clis.cli_rescore import main
+from haddock.gear.haddockmodel import ENERGIES_TABLE, write_energies_table
+
+
+@pytest.fixture
+def step_dir(tmp_path):
+    """Create a step folder with the energies of its models."""
+    step = Path(tmp_path, "1_emref")
+    step.mkdir()
+    energies = [
+        {"vdw": -10.0, "elec": -100.0, "desolv": 5.0, "air": 10.0, "bsa": 0},
+        {"vdw": -20.0, "elec": -50.0, "desolv": 2.0, "air": 50.0, "bsa": 0},
+        ]
+    weights = {
+        "w_vdw": 1.0,
+        "w_elec": 0.2,
+        "w_desolv": 1.0,
+        "w_air": 0.1,
+        "w_bsa": 0.0,
+        }
+    write_energies_table(
+        Path(step, ENERGIES_TABLE),
+        ["emref_1.pdb", "emref_2.pdb"],
+        energies,
+        weights,
+        )
+    return step
+
+
+def test_main(step_dir):
+    """Test the models are ranked with the new weights."""
+    # with the weights of the step
+    ranking = main(step_dir)
+    assert ranking == [("emref_1.pdb", -24.0), ("emref_2.pdb", -23.0)]
+
+    ranking = main(step_dir, w_air=0.0)
+    assert ranking == [("emref_2.pdb", -28.0), ("emref_1.pdb", -25.0)]
+
+    lines = Path(step_dir, "rescored.tsv").read_text().splitlines()
+    assert lines[1:] == [
+        "rank\tmodel\tscore",
+        "1\temref_2.pdb\t-28.000",
+        "2\temref_1.pdb\t-25.000",
+        ]
+
+
+def test_main_no_table(tmp_path):
+    """Test the client exits if the step has no energies table."""
+    with pytest.raises(SystemExit):
+        main(tmp_path)
@@ -0,0 +1,58 @@
+"""Test the haddock3-score client."""
+import shutil
+from pathlib import Path
+
+import pytest
+
+from haddock.clis.cli_score import get_pdb_files, make_ensemble
+
+from . import golden_data
+
+
+def test_get_pdb_files(tmp_path):
+    """Test the PDB files are listed from files and folders."""
+    for pdb in ("protein.pdb", "dna.pdb"):
+        shutil.copy(Path(golden_data, pdb), tmp_path)
+    ligand = Path(golden_data, "ligand.pdb")
+
+    pdb_files = get_pdb_files([ligand, tmp_path])
+
+    assert pdb_files == [
+        ligand,
+        Path(tmp_path, "dna.pdb"),
+        Path(tmp_path, "protein.pdb"),
+        ]
+
+    with pytest.raises(SystemExit):
+        get_pdb_files([Path(tmp_path, "missing.pdb")])
+
+
+def test_make_ensemble(tmp_path):
+    """Test the structures are written as the models of an ensemble."""
+    protein = Path(golden_data, "protein.pdb")
+    protein_lines = protein.read_text().splitlines(keepends=True)
+    ensemble = Path(tmp_path, "decoys.pdb")
+    ensemble.write_text(
+        "MODEL        1\n"
+        + "".join(protein_lines)
+        + "ENDMDL\nMODEL        2\n"
+        + "".join(protein_lines)
+        + "ENDMDL\nEND\n"
+        )
+    ensemble_f = Path(tmp_path, "ensemble.pdb")
+
+    names = make_ensemble([protein, ensemble], ensemble_f)
+
+    assert names == ["protein.pdb", "decoys_1.pdb", "decoys_2.pdb"]
+
+    lines = ensemble_f.read_text().splitlines()
+    assert [line for line in lines if line.startswith("MODEL")] == [
+        "MODEL        1",
+        "MODEL        2",
+        "MODEL        3",
+        ]
+    assert lines.count("ENDMDL") == 3
+
+    num_atoms = sum(line.startswith("ATOM") for line in protein_lines)
+    first_model = lines[1:lines.index("ENDMDL")]
+    assert sum(line.startswith("ATOM") for line in first_model) == num_atoms
@@ -0,0 +1,73 @@
+"""Test the HADDOCK model energies."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from haddock.gear.haddockmodel import (
+    HaddockModel,
+    calc_haddock_scores,
+    read_energies,
+    )
+
+from . import golden_data
+
+
+def test_read_energies():
+    """Test the energies are read from the header."""
+    energies = read_energies(Path(golden_data, "protdna_complex_1.pdb"))
+
+    assert energies["total"] == -28.1618
+    assert energies["vdw"] == -20.2361
+    assert energies["elec"] == -201.17
+    assert energies["air"] == 181.515
+    assert energies["rg"] == 0
+    assert energies["desolv"] == 16.1364
+    assert energies["bsa"] == 1205.18
+
+
+def test_read_energies_named_terms(tmp_path):
+    """Test the terms are named after the REMARK listing them."""
+    pdb = Path(tmp_path, "model.pdb")
+    pdb.write_text(
+        "REMARK            total,vdw,elec,air\n"
+        "REMARK energies: -10.5, -20, 5.5, 4\n"
+        "ATOM      1  N   ALA A   1       0.000   0.000   0.000  1.00  0.00\n"
+        "REMARK buried surface area: 1000\n"
+        )
+
+    # REMARKs after the coordinates are not read
+    assert read_energies(pdb) == {
+        "total": -10.5,
+        "vdw": -20,
+        "elec": 5.5,
+        "air": 4,
+        }
+
+    pdb.write_text(
+        "REMARK            total,vdw,elec,air\n"
+        "REMARK energies: -10.5, -20, 5.5\n"
+        )
+    with pytest.raises(ValueError):
+        read_energies(pdb)
+
+
+def test_calc_haddock_scores():
+    """Test the scores of many models are calculated at once."""
+    weights = {"w_vdw": 1.0, "w_elec": 0.2, "w_desolv": 1.0, "w_air": 0.1}
+    pdbs = [
+        Path(golden_data, "protdna_complex_1.pdb"),
+        Path(golden_data, "protdna_complex_2.pdb"),
+        ]
+    models = [HaddockModel(pdb) for pdb in pdbs]
+    energies_table = {
+        "vdw": [m.energies["vdw"] for m in models],
+        "elec": [m.energies["elec"] for m in models],
+        "desolv": [m.energies["desolv"] for m in models],
+        "air": [m.energies["air"] for m in models],
+        }
+
+    scores = calc_haddock_scores(energies_table, **weights)
+
+    expected = [m.calc_haddock_score(**weights) for m in models]
+    assert np.allclose(scores, expected)
@@ -6,15 +6,23 @@ from pathlib import Path
 import numpy as np
 import pytest
 
+from haddock.libs import libalign
 from haddock.libs.libalign import (
+    PDBStructure,
     align_seq,
+    cache_alignment,
     calc_rmsd,
     centroid,
     dump_as_izone,
     get_align,
     get_atoms,
+    get_cached_alignment,
     kabsch,
+    kabsch_rmsd,
+    kabsch_rmsd_one_vs_many,
+    kabsch_rmsd_pairs,
     load_coords,
+    load_structure,
     make_range,
     pdb2fastadic,
     )
@@ -117,6 +125,59 @@ def test_centroid():
     assert observed_centroid == expected_centroid
 
 
+def random_rotation(seed):
+    """Build a random rotation matrix."""
+    rng = np.random.default_rng(seed)
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q = q * np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] = -q[:, 0]
+    return q
+
+
+def test_kabsch_rmsd_batch():
+    """Test the batched superposition against the single-pair one."""
+    rng = np.random.default_rng(42)
+    reference = rng.normal(scale=10, size=(30, 3))
+    models = np.array([
+        np.dot(reference + rng.normal(scale=0.5, size=(30, 3)),
+               random_rotation(i)) + i
+        for i in range(5)
+        ])
+
+    observed = kabsch_rmsd_one_vs_many(reference, models)
+    expected = [kabsch_rmsd(m, reference) for m in models]
+
+    assert observed.shape == (5,)
+    np.testing.assert_allclose(observed, expected)
+    # rotations and translations do not change the rmsd
+    assert (observed < 1.0).all()
+
+    # the stacked kabsch gives the same rotations
+    stacked_U = kabsch(models - centroid(models), np.broadcast_to(
+        reference - centroid(reference), models.shape))
+    for i, m in enumerate(models):
+        np.testing.assert_allclose(
+            stacked_U[i],
+            kabsch(m - centroid(m), reference - centroid(reference)),
+            )
+
+
+def test_kabsch_rmsd_pairs():
+    """Test the RMSD of pairs taken from a stack of coordinates."""
+    rng = np.random.default_rng(4)
+    coords = rng.normal(scale=10, size=(4, 20, 3))
+    ref_idx = np.array([0, 0, 0, 1, 1, 2])
+    mod_idx = np.array([1, 2, 3, 2, 3, 3])
+
+    observed = kabsch_rmsd_pairs(coords, ref_idx, mod_idx, block_size=4)
+    expected = [
+        kabsch_rmsd(coords[j], coords[i]) for i, j in zip(ref_idx, mod_idx)
+        ]
+
+    np.testing.assert_allclose(observed, expected)
+
+
 def test_load_coords():
     """Test the loading of coordinates."""
     # pdb_f = protprot_input_list[0]
@@ -423,3 +484,100 @@ def test_dump_as_izone():
             ]
 
         assert observed_izone == expected_izone
+
+
+def test_pdb_structure():
+    """Test the parsed structure gives the same results as the file."""
+    pdb_f = Path(golden_data, "protprot_complex_1.pdb")
+    structure = PDBStructure(pdb_f)
+
+    assert load_structure(structure) is structure
+
+    assert structure.coords.shape == (len(structure), 3)
+
+    assert get_atoms(structure) == get_atoms(pdb_f)
+
+    assert pdb2fastadic(structure) == pdb2fastadic(pdb_f)
+
+    atoms = get_atoms(pdb_f)
+    observed_coord_dic, _ = load_coords(structure, atoms)
+    expected_coord_dic, _ = load_coords(pdb_f, atoms)
+
+    assert observed_coord_dic.keys() == expected_coord_dic.keys()
+
+
+def test_intermolecular_contacts():
+    """Test the search of intermolecular contacts."""
+    structure = PDBStructure(Path(golden_data, "protprot_complex_1.pdb"))
+    pairs = structure.intermolecular_contacts(cutoff=5.0)
+
+    assert len(pairs) > 0
+
+    # sorted, unique and between heavy atoms of different chains
+    assert (pairs[:, 0] < pairs[:, 1]).all()
+
+    assert array_to_list(pairs) == sorted(array_to_list(pairs))
+
+    for i, j in pairs:
+        assert structure.chain[i] != structure.chain[j]
+        assert "H" not in (structure.element[i], structure.element[j])
+        dist = np.linalg.norm(structure.coords[i] - structure.coords[j])
+        assert dist <= 5.0
+
+
+def test_residue_contacts():
+    """Test the residue contacts are packed as unique integers."""
+    structure = PDBStructure(Path(golden_data, "protprot_complex_1.pdb"))
+    contacts = structure.residue_contacts(cutoff=5.0)
+
+    pairs = structure.intermolecular_contacts(cutoff=5.0)
+    residue_pairs = {
+        (
+            structure.chain[i],
+            structure.resnum[i],
+            structure.chain[j],
+            structure.resnum[j],
+            )
+        for i, j in pairs
+        }
+
+    assert contacts.dtype == np.int64
+    assert len(contacts) == len(residue_pairs) == 20
+    assert contacts.tolist() == sorted(set(contacts.tolist()))
+
+    # unpack the contacts
+    residue_mask = (1 << libalign.RESIDUE_BITS) - 1
+    resnum_mask = (1 << libalign.RESNUM_BITS) - 1
+
+    def unpack(residue):
+        return (
+            chr(residue >> libalign.RESNUM_BITS),
+            (residue & resnum_mask) - libalign.RESNUM_OFFSET,
+            )
+
+    unpacked = {
+        (*unpack(c >> libalign.RESIDUE_BITS), *unpack(c & residue_mask))
+        for c in contacts.tolist()
+        }
+    assert unpacked == residue_pairs
+
+
+def test_alignment_cache(tmp_path):
+    """Test the in-memory and on-disk alignment cache."""
+    key = "test_alignment_cache_key"
+
+    assert get_cached_alignment(key, tmp_path) is None
+
+    alignment = {"ref_segments": [[0, 3]], "model_segments": [[1, 4]]}
+    cache_alignment(key, alignment, tmp_path)
+
+    assert Path(tmp_path, f"{key}.json").exists()
+
+    assert get_cached_alignment(key) == alignment
+
+    # from disk, as another process or step would read it
+    libalign._ALIGNMENT_CACHE.pop(key)
+
+    assert get_cached_alignment(key) is None
+
+    assert get_cached_alignment(key, tmp_path) == alignment
@@ -2,9 +2,18 @@
 import os
 from pathlib import Path
 
+import numpy as np
 import pytest
 
-from haddock.libs.libclust import write_structure_list
+from haddock.libs.libclust import (
+    MATRIX_DTYPE,
+    export_condensed_matrix,
+    init_condensed_matrix,
+    is_condensed_matrix,
+    open_condensed_matrix,
+    read_matrix_header,
+    write_structure_list,
+    )
 from haddock.libs.libontology import PDBFile
 
 from . import golden_data
@@ -43,3 +52,63 @@ def test_write_structure_list(protprot_input_models):
         )
     assert observed_file_content == expected_file_content
     os.unlink(cl_fname)
+
+
+def test_condensed_matrix(tmp_path):
+    """Test the binary condensed matrix format."""
+    matrix_f = Path(tmp_path, "matrix.bin")
+    names = ["model_1.pdb", "model_2.pdb", "model_3.pdb", "model_4.pdb"]
+    header = init_condensed_matrix(matrix_f, names)
+
+    assert is_condensed_matrix(matrix_f)
+
+    assert read_matrix_header(matrix_f) == header
+
+    assert header["npairs"] == 6
+
+    assert header["models"] == names
+
+    assert header["offset"] % 64 == 0
+
+    # the matrix is initialised with NaN
+    assert np.isnan(open_condensed_matrix(matrix_f)).all()
+
+    # slices are written independently
+    values = np.array([1.0, 2.0, 2.5, 2.0, 3.0, 0.5])
+    for start, count in [(0, 4), (4, 2)]:
+        matrix = open_condensed_matrix(
+            matrix_f,
+            mode="r+",
+            start=start,
+            count=count,
+            )
+        matrix[:] = values[start:start + count]
+        matrix.flush()
+        del matrix
+
+    matrix = open_condensed_matrix(matrix_f)
+
+    assert matrix.dtype == MATRIX_DTYPE
+
+    np.testing.assert_array_equal(matrix, values)
+
+    with pytest.raises(ValueError):
+        open_condensed_matrix(matrix_f, start=4, count=3)
+
+    txt_f = Path(tmp_path, "matrix.txt")
+    export_condensed_matrix(matrix_f, txt_f)
+    expected_txt = (
+        f"1 2 1.000{os.linesep}"
+        f"1 3 2.000{os.linesep}"
+        f"1 4 2.500{os.linesep}"
+        f"2 3 2.000{os.linesep}"
+        f"2 4 3.000{os.linesep}"
+        f"3 4 0.500{os.linesep}"
+        )
+
+    assert txt_f.read_text() == expected_txt
+
+    assert not is_condensed_matrix(txt_f)
+
+    with pytest.raises(ValueError):
+        read_matrix_header(txt_f)
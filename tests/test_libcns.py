@@ -1,11 +1,17 @@
 """Test libcns."""
 import os
+import shutil
 from pathlib import Path
 
 import pytest
 
 from haddock import EmptyPath
 from haddock.libs import libcns
+from haddock.libs.libio import working_directory
+from haddock.libs.libontology import PDBFile, TopologyFile
+from haddock.libs.libsubprocess import CNSJob
+
+from . import golden_data
 
 
 @pytest.mark.parametrize(
@@ -83,3 +89,73 @@ def test_load_workflow_params():
         )
 
     assert result == expected
+
+
+@pytest.fixture
+def topology_model(tmp_path):
+    """Create a model from the topology step."""
+    topology_path = Path(tmp_path, "0_topoaa")
+    topology_path.mkdir()
+    shutil.copy(Path(golden_data, "protein.pdb"), topology_path)
+    model = PDBFile(
+        "protein.pdb",
+        topology=TopologyFile("protein.psf", path=topology_path),
+        path=topology_path,
+        )
+    return model
+
+
+def test_prepare_cns_input_shared_parts(tmp_path, topology_model):
+    """Test the header and recipe are written once per step."""
+    model = topology_model
+    step_path = Path(tmp_path, "1_flexref")
+    step_path.mkdir()
+    params = {'var1': 1, 'var2': 'some string'}
+    recipe = "! the recipe"
+
+    with working_directory(step_path):
+        inp_files = [
+            libcns.prepare_cns_input(i, model, step_path, recipe, params, "fr")
+            for i in (1, 2)
+            ]
+        header_mtime = Path("fr_header.inp").stat().st_mtime_ns
+
+        libcns.prepare_cns_input(3, model, step_path, recipe, params, "fr")
+        assert Path("fr_header.inp").stat().st_mtime_ns == header_mtime
+
+        assert Path("fr_header.inp").read_text() == \
+            libcns.load_workflow_params(**params)
+        assert Path("fr_recipe.inp").read_text() == recipe
+
+        inp = inp_files[1].read_text()
+        assert inp.startswith(f"inline @fr_header.inp{os.linesep}")
+        assert inp.endswith(f"inline @fr_recipe.inp{os.linesep}")
+        assert f"eval ($count=2){os.linesep}" in inp
+        assert 'eval ($output_pdb_filename="fr_2.pdb")' in inp
+        assert "some string" not in inp
+
+        # the header is written again when the parameters change
+        libcns.prepare_cns_input(4, model, step_path, recipe, {}, "fr")
+        assert Path("fr_header.inp").read_text() == \
+            libcns.load_workflow_params()
+
+
+def test_prepare_cns_input_lazy(tmp_path, topology_model):
+    """Test the lazy input is written when the job prepares it."""
+    step_path = Path(tmp_path, "1_flexref")
+    step_path.mkdir()
+    params = {'var1': 1}
+
+    with working_directory(step_path):
+        cns_input = libcns.prepare_cns_input(
+            1, topology_model, step_path, "", params, "fr", lazy=True,
+            )
+        assert isinstance(cns_input, libcns.CNSInput)
+        assert not Path("fr_1.inp").exists()
+
+        job = CNSJob(cns_input, Path("fr_1.out"), cns_exec="/bin/cat")
+        job.run()
+
+        inp = Path("fr_1.inp").read_text()
+        assert Path("fr_1.out").read_text() == inp
+        assert f"eval ($seed={cns_input.seed}){os.linesep}" in inp
@@ -0,0 +1,204 @@
+"""Test the libhpc library."""
+import os
+import re
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from haddock.libs.libhpc import (
+    OFFSET_VAR,
+    SLURM_ARRAY_STATE_REGEX,
+    TORQUE_ARRAY_STATE_REGEX,
+    HPCScheduler,
+    SlurmQueue,
+    parse_slurm_states,
+    )
+from haddock.libs.libio import working_directory
+from haddock.libs.libsubprocess import CNSJob
+
+
+class LocalQueue(SlurmQueue):
+    """
+    Stand-in for Slurm running the job arrays in this machine.
+
+    Each poll runs the `run_per_poll` oldest elements in the queue.
+    """
+
+    def __init__(self, run_per_poll=2):
+        self.run_per_poll = run_per_poll
+        self.queue = []
+        self.submissions = []
+        self.max_in_queue = 0
+
+    def submit(self, job_fname, size, offset):
+        """Add the elements of the array to the queue."""
+        job_id = str(len(self.submissions) + 1)
+        self.submissions.append((offset, size))
+        self.queue.extend((job_id, i, job_fname, offset) for i in range(size))
+        self.max_in_queue = max(self.max_in_queue, len(self.queue))
+        return job_id
+
+    def poll(self, job_ids):
+        """Run some elements and get the state of the others."""
+        for _, index, job_fname, offset in self.queue[:self.run_per_poll]:
+            env = dict(os.environ)
+            env[OFFSET_VAR] = str(offset)
+            env["SLURM_ARRAY_TASK_ID"] = str(index)
+            subprocess.run(["bash", str(job_fname)], env=env, check=True)
+        del self.queue[:self.run_per_poll]
+        return {
+            (job_id, index): "running"
+            for job_id, index, *_ in self.queue
+            if job_id in job_ids
+            }
+
+
+@pytest.fixture
+def cns_jobs(tmp_path):
+    """CNS jobs copying their input to their output."""
+    step_path = Path(tmp_path, "1_flexref")
+    step_path.mkdir()
+    jobs = []
+    for i in range(1, 8):
+        input_file = Path(f"flexref_{i}.inp")
+        Path(step_path, input_file).write_text(f"model {i}")
+        jobs.append(
+            CNSJob(
+                input_file,
+                Path(f"flexref_{i}.out"),
+                envvars={"MODDIR": ".", "MODULE": ".", "TOPPAR": "."},
+                cns_exec="/bin/cat",
+                )
+            )
+    with working_directory(step_path):
+        yield jobs
+
+
+@pytest.mark.parametrize("concat", [1, 3])
+def test_hpc_scheduler_job_arrays(cns_jobs, concat):
+    """Test the queue is topped up with job arrays."""
+    local_queue = LocalQueue(run_per_poll=2)
+    scheduler = HPCScheduler(
+        cns_jobs,
+        queue_limit=2,
+        concat=concat,
+        queue_system=local_queue,
+        poll_interval=0,
+        )
+    scheduler.run()
+
+    for i, job in enumerate(cns_jobs, start=1):
+        assert job.output_file.read_text() == f"model {i}"
+
+    assert local_queue.max_in_queue <= 2
+
+    assert scheduler.job_ids == [
+        str(i) for i in range(1, len(local_queue.submissions) + 1)
+        ]
+
+    # all the jobs were submitted once, in order
+    njobs = len(scheduler.worker_list)
+    submitted = [
+        offset + i
+        for offset, size in local_queue.submissions
+        for i in range(size)
+        ]
+
+    assert submitted == list(range(1, njobs + 1))
+
+
+def test_hpc_scheduler_multicore_adaptive_concat(cns_jobs):
+    """Test the jobs run their tasks in parallel and adapt concat."""
+    local_queue = LocalQueue(run_per_poll=2)
+    scheduler = HPCScheduler(
+        cns_jobs,
+        queue_limit=2,
+        concat=1,
+        ncores=2,
+        job_runtime=3,
+        queue_system=local_queue,
+        poll_interval=0,
+        )
+    scheduler.run()
+
+    for i, job in enumerate(cns_jobs, start=1):
+        assert job.output_file.read_text() == f"model {i}"
+
+    # the first jobs finish in less than one second, and concat is
+    #  increased to 3 waves of 2 tasks
+    assert [len(w.tasks) for w in scheduler.worker_list] == [1, 1, 5]
+
+    assert scheduler.concat == 6
+
+    job_file = scheduler.worker_list[-1].job_fname.read_text()
+
+    assert "xargs -d '\\n' -P 2" in job_file
+
+    assert scheduler.worker_list[0].read_runtime() is not None
+
+
+def test_hpc_worker_commands_verbatim(cns_jobs, tmp_path):
+    """Test the concurrent tasks run their command lines unchanged."""
+    # command lines longer than 255 bytes
+    cns_dir = Path(tmp_path, "cns_" + "x" * 240)
+    cns_dir.mkdir()
+    Path(cns_dir, "cat").symlink_to("/bin/cat")
+    for job in cns_jobs:
+        job.cns_exec = Path(cns_dir, "cat")
+    scheduler = HPCScheduler(
+        cns_jobs,
+        concat=len(cns_jobs),
+        ncores=2,
+        queue_system=LocalQueue(run_per_poll=1),
+        poll_interval=0,
+        )
+    scheduler.run()
+
+    assert len(scheduler.worker_list) == 1
+
+    for i, job in enumerate(cns_jobs, start=1):
+        assert job.output_file.read_text() == f"model {i}"
+
+
+def test_array_state_regex():
+    """Test the parsing of the state of the job array elements."""
+    squeue_out = "123_4 RUNNING\n123_5 PENDING\n124_0 COMPLETING\n"
+
+    assert re.findall(SLURM_ARRAY_STATE_REGEX, squeue_out) == [
+        ("123", "4", "RUNNING"),
+        ("123", "5", "PENDING"),
+        ("124", "0", "COMPLETING"),
+        ]
+
+    # the elements that ended are not in the queue any more
+    squeue_out += (
+        "124_1 CANCELLED\n124_2 TIMEOUT\n124_3 OUT_OF_MEMORY\n"
+        "124_4 NODE_FAIL\n124_5 COMPLETED\n124_6 FAILED\n124_7 SUSPENDED\n"
+        "124_8 CONFIGURING\n124_9 PREEMPTED\n"
+        )
+
+    assert parse_slurm_states(squeue_out) == {
+        ("123", 4): "running",
+        ("123", 5): "submitted",
+        ("124", 0): "running",
+        ("124", 7): "hold",
+        ("124", 8): "submitted",
+        }
+
+    qstat_out = (
+        "Job ID                    Name             User            "
+        "Time Use S Queue\n"
+        "------------------------- ---------------- --------------- "
+        "-------- - -----\n"
+        "56[0].server               haddock3-0       user            "
+        "00:00:01 R batch\n"
+        "56[1].server               haddock3-1       user            "
+        "       0 Q batch\n"
+        )
+
+    assert re.findall(
+        TORQUE_ARRAY_STATE_REGEX,
+        qstat_out,
+        flags=re.MULTILINE,
+        ) == [("56", "0", "R"), ("56", "1", "Q")]
@@ -0,0 +1,46 @@
+"""Test the libmpi library."""
+import pickle
+from pathlib import Path
+
+from haddock.libs.libmpi import MPIScheduler, get_results_path
+
+
+class ValueTask:
+    """A task returning its value."""
+
+    def __init__(self, value, return_result=True):
+        self.value = value
+        self.return_result = return_result
+
+    def run(self):
+        """Run the task."""
+        return self.value
+
+
+def test_load_results(tmp_path):
+    """Test the results of the runner are loaded back in task order."""
+    tasks = [
+        ValueTask(0),
+        ValueTask(1, return_result=False),
+        ValueTask(2),
+        ValueTask(3),
+        ]
+    scheduler = MPIScheduler(tasks, ncores=2)
+
+    pkl_tasks = Path(tmp_path, "mpi.pkl")
+    # as reported by haddock3-mpitask, in completion order
+    results = [
+        (2, True, 2),
+        (0, True, 0),
+        (3, False, None),
+        (1, True, "not returned"),
+        ]
+    with open(get_results_path(pkl_tasks), "wb") as fout:
+        pickle.dump(results, fout)
+
+    scheduler._load_results(pkl_tasks)
+
+    # only the tasks with `return_result` fill the results
+    assert scheduler.results == [0, None, 2, None]
+
+    assert scheduler.num_failed == 1
@@ -0,0 +1,152 @@
+"""Test the libparallel library."""
+import time
+from multiprocessing import cpu_count
+from pathlib import Path
+
+import pytest
+
+from haddock.libs.libio import working_directory
+from haddock.libs.libparallel import Scheduler, WorkerPool
+
+
+class SleepTask:
+    """A task that waits and then writes its output file."""
+
+    def __init__(self, output, sleep=0.0, fail=False, return_result=False):
+        self.output = output
+        self.sleep = sleep
+        self.fail = fail
+        self.return_result = return_result
+
+    def run(self):
+        """Run the task."""
+        time.sleep(self.sleep)
+        if self.fail:
+            raise ValueError("this task fails")
+        self.output.write_text("done")
+        return self.output.name
+
+
+@pytest.mark.parametrize("dynamic", [True, False])
+def test_scheduler(tmp_path, dynamic):
+    """Test all the tasks are executed."""
+    tasks = [SleepTask(Path(tmp_path, f"task_{i}.out")) for i in range(10)]
+    scheduler = Scheduler(tasks, ncores=3, dynamic=dynamic)
+    scheduler.run()
+
+    assert all(task.output.read_text() == "done" for task in tasks)
+
+
+@pytest.mark.skipif(
+    cpu_count() < 3,
+    reason="two worker processes are needed",
+    )
+def test_scheduler_dynamic_balance(tmp_path):
+    """Test idle workers pull the remaining tasks."""
+    # the first task is slow, in static mode the second task would wait
+    #  for it in the same chunk
+    tasks = [
+        SleepTask(Path(tmp_path, "task_1.out"), sleep=2.0),
+        SleepTask(Path(tmp_path, "task_2.out")),
+        SleepTask(Path(tmp_path, "task_3.out")),
+        SleepTask(Path(tmp_path, "task_4.out")),
+        ]
+    scheduler = Scheduler(tasks, ncores=2, dynamic=True)
+    start = time.time()
+    scheduler.run()
+
+    assert all(task.output.exists() for task in tasks)
+
+    # the fast tasks finished while the slow one was running
+    last_fast = max(task.output.stat().st_mtime for task in tasks[1:])
+
+    assert last_fast < start + 1.5
+
+
+def test_scheduler_dynamic_failure(tmp_path):
+    """Test a failing task does not stop the others."""
+    tasks = [
+        SleepTask(Path(tmp_path, f"task_{i}.out"), fail=(i == 0))
+        for i in range(4)
+        ]
+    scheduler = Scheduler(tasks, ncores=1, dynamic=True)
+    scheduler.run()
+
+    assert not tasks[0].output.exists()
+
+    assert all(task.output.exists() for task in tasks[1:])
+
+
+def test_scheduler_worker_pool(tmp_path):
+    """Test the tasks of consecutive steps run in the same pool."""
+    pool = WorkerPool(ncores=2)
+    try:
+        for step in ("1_step", "2_step"):
+            step_path = Path(tmp_path, step)
+            step_path.mkdir()
+            # relative paths, as the modules run inside the step folder
+            with working_directory(step_path):
+                tasks = [SleepTask(Path(f"task_{i}.out")) for i in range(4)]
+                scheduler = Scheduler(tasks, ncores=2, pool=pool)
+                scheduler.run()
+
+                assert scheduler.pool is pool
+
+            assert len(list(step_path.glob("task_*.out"))) == 4
+    finally:
+        pool.shutdown()
+
+    assert pool._pool is None
+
+
+@pytest.mark.skipif(
+    cpu_count() < 3,
+    reason="two worker processes are needed",
+    )
+def test_scheduler_worker_pool_size(tmp_path):
+    """Test the pool is not used with a different number of cores."""
+    pool = WorkerPool(ncores=2)
+    tasks = [SleepTask(Path(tmp_path, f"task_{i}.out")) for i in range(4)]
+    scheduler = Scheduler(tasks, ncores=1, pool=pool)
+    scheduler.run()
+
+    assert scheduler.pool is None
+
+    assert pool._pool is None
+
+    assert all(task.output.exists() for task in tasks)
+
+
+@pytest.mark.parametrize(
+    "dynamic,pool",
+    [
+        (True, None),
+        (False, None),
+        (True, WorkerPool(ncores=1)),
+        ],
+    )
+def test_scheduler_results(tmp_path, dynamic, pool):
+    """Test the results are collected in the order of the tasks."""
+    # given in reverse order of output: the sort key of the Scheduler starts
+    #  with the task index, so the tasks run, and the results are stored, in
+    #  the given order, not in the order of the outputs
+    tasks = [
+        SleepTask(Path(tmp_path, f"task_{i}.out"), return_result=(i != 2))
+        for i in range(5, 0, -1)
+        ]
+    scheduler = Scheduler(tasks, ncores=1, dynamic=dynamic, pool=pool)
+    scheduler.run()
+    if pool is not None:
+        pool.shutdown()
+
+    expected = [
+        "task_5.out",
+        "task_4.out",
+        "task_3.out",
+        None,
+        "task_1.out",
+        ]
+
+    assert scheduler.results == expected
+
+    assert scheduler._task_order == list(range(5))
@@ -1,4 +1,7 @@
 """Test lib PDB."""
+import os
+from pathlib import Path
+
 import pytest
 
 from haddock.libs import libpdb
@@ -31,3 +34,20 @@ def test_read_chain_ids(lines, expected):
 def test_read_seg_ids(lines, expected):
     result = libpdb.read_segids(lines)
     assert result == expected
+
+
+def test_identify_chainseg_cache(tmp_path):
+    """Test chain and seg IDs are read again only if the file changes."""
+    pdb = Path(tmp_path, "model.pdb")
+    pdb.write_text(os.linesep.join(chainC) + os.linesep)
+
+    assert libpdb.identify_chainseg(pdb) == (["C"], ["C"])
+
+    hits = libpdb._read_chainseg.cache_info().hits
+    assert libpdb.identify_chainseg(pdb, sort=False) == (["C"], ["C"])
+    assert libpdb._read_chainseg.cache_info().hits == hits + 1
+
+    chainA = [line[:21] + "A" + line[22:] for line in chainC]
+    pdb.write_text(os.linesep.join(chainC + chainA) + os.linesep)
+
+    assert libpdb.identify_chainseg(pdb) == (["C"], ["A", "C"])
@@ -0,0 +1,31 @@
+"""Test the libsubprocess library."""
+import shutil
+from pathlib import Path
+
+from haddock.libs.libio import working_directory
+from haddock.libs.libsubprocess import CNSJob
+
+from . import golden_data
+
+
+def test_cnsjob_returns_energies(tmp_path):
+    """Test the job returns the energies of the PDB written by CNS."""
+    shutil.copy(Path(golden_data, "protdna_complex_1.pdb"), tmp_path)
+    Path(tmp_path, "emscoring_1.inp").write_text("stop")
+
+    with working_directory(tmp_path):
+        job = CNSJob(
+            Path("emscoring_1.inp"),
+            Path("emscoring_1.out"),
+            cns_exec="/bin/cat",
+            output_pdb="protdna_complex_1.pdb",
+            )
+        assert job.return_result
+
+        energies = job.run()
+        assert energies["vdw"] == -20.2361
+        assert energies["bsa"] == 1205.18
+
+        # CNS failed to write the PDB
+        job.output_pdb = "emscoring_1.pdb"
+        assert job.run() is None
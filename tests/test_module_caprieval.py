@@ -10,9 +10,11 @@ import pytest
 from haddock.libs.libontology import PDBFile
 from haddock.modules.analysis.caprieval.capri import (
     CAPRI,
+    CAPRIReference,
     calc_stats,
     capri_cluster_analysis,
-    rearrange_ss_capri_output,
+    merge_results,
+    write_ss_capri_output,
     )
 
 from . import golden_data
@@ -222,19 +224,22 @@ def test_protdna_fnat(protdna_caprimodule, protdna_input_list):
     assert round_two_dec(protdna_caprimodule.fnat) == 0.49
 
 
-def test_make_output(protprot_caprimodule):
-    """Test the writing of capri.tsv file."""
+def test_write_ss_capri_output(protprot_caprimodule, tmp_path):
+    """Test the writing of capri_ss.tsv file."""
     protprot_caprimodule.model.clt_id = 1
     protprot_caprimodule.model.clt_rank = 1
     protprot_caprimodule.model.clt_model_rank = 10
 
-    protprot_caprimodule.make_output()
-
-    ss_fname = Path(
-        protprot_caprimodule.path,
-        f"capri_ss_{protprot_caprimodule.identificator}.tsv"
+    write_ss_capri_output(
+        [protprot_caprimodule],
+        "capri_ss.tsv",
+        sort_key="score",
+        sort_ascending=True,
+        path=tmp_path,
         )
 
+    ss_fname = Path(tmp_path, "capri_ss.tsv")
+
     assert ss_fname.stat().st_size != 0
 
     # remove the model column since its name will depend on where we are running
@@ -244,12 +249,10 @@ def test_make_output(protprot_caprimodule):
     expected_outf_l = [
         ['md5', 'caprieval_rank', 'score', 'irmsd', 'fnat', 'lrmsd', 'ilrmsd',
          'dockq', 'cluster-id', 'cluster-ranking', 'model-cluster-ranking'],
-        ['-', '-', 'nan', 'nan', 'nan', 'nan', 'nan', 'nan', '1', '1', '10'], ]
+        ['-', '1', 'nan', 'nan', 'nan', 'nan', 'nan', 'nan', '1', '1', '10'], ]
 
     assert observed_outf_l == expected_outf_l
 
-    os.unlink(ss_fname)
-
 
 def test_identify_protprotinterface(protprot_caprimodule, protprot_input_list):
     """Test the interface identification."""
@@ -360,25 +363,55 @@ def test_add_chain_from_segid(protprot_caprimodule):
                 assert line[21] == "A"
 
 
-def test_rearrange_ss_capri_output():
-    """Test rearranging the capri output."""
-    with open(f"{golden_data}/capri_ss_1.tsv", 'w') as fh:
-        fh.write(
-            "model	caprieval_rank	score	irmsd	fnat	lrmsd	ilrmsd	"
-            "dockq	cluster-id	cluster-ranking	"
-            "model-cluster-ranking" + os.linesep)
-        fh.write(
-            "../1_emscoring/emscoring_909.pdb	1	-424.751	0.000	"
-            "1.000	0.000	0.000	1.000	-	-	-" + os.linesep)
-    rearrange_ss_capri_output(
-        'capri_ss.txt',
-        output_count=1,
-        sort_key="score",
-        sort_ascending=True,
-        path=golden_data)
+def test_merge_chunk_results(protprot_input_list, params, tmp_path):
+    """Test merging the results returned by the chunks."""
+    reference = protprot_input_list[0].rel_path
+    capri_jobs = [
+        CAPRI(
+            identificator=i,
+            reference=reference,
+            model=model,
+            path=tmp_path,
+            params=params,
+            )
+        for i, model in enumerate(protprot_input_list, start=1)
+        ]
+    metrics = {"irmsd": 1.0, "fnat": 0.9, "lrmsd": 2.0, "ilrmsd": 1.5}
+    # the second chunk failed
+    chunk_results = [{2: dict(metrics, dockq=0.8)}, None]
+
+    evaluated = merge_results(capri_jobs, chunk_results)
+
+    assert evaluated == [capri_jobs[1]]
+
+    assert capri_jobs[1].irmsd == 1.0
+
+    assert capri_jobs[1].dockq == 0.8
+
+    write_ss_capri_output(
+        evaluated,
+        "capri_ss.tsv",
+        sort_key="irmsd",
+        sort_ascending=False,
+        path=tmp_path,
+        )
+
+    observed_rows = [
+        line.split("\t")
+        for line in Path(tmp_path, "capri_ss.tsv").read_text().splitlines()
+        ]
+
+    assert observed_rows[0][:5] == [
+        "model", "md5", "caprieval_rank", "score", "irmsd"
+        ]
+
+    assert len(observed_rows) == 2
+
+    assert observed_rows[1][2] == "1"
 
-    assert Path('capri_ss.txt').stat().st_size != 0
-    Path('capri_ss.txt').unlink()
+    assert observed_rows[1][4:9] == [
+        "1.000", "0.900", "2.000", "1.500", "0.800"
+        ]
 
 
 def test_calc_stats():
@@ -508,3 +541,38 @@ def test_single_chain_model(protprot_onechain_mod_caprimodule, params):
     # dockq
     protprot_onechain_mod_caprimodule.calc_dockq()
     assert np.isnan(protprot_onechain_mod_caprimodule.dockq)
+
+
+def test_reference_context(protprot_input_list, params):
+    """Test the reference context is shared among CAPRI objects."""
+    reference = protprot_input_list[0].rel_path
+    ref_context = CAPRIReference(reference)
+
+    # interface and contacts are calculated once per cutoff
+    assert ref_context.interface(5.0) is ref_context.interface(5.0)
+
+    assert ref_context.contacts(5.0) is ref_context.contacts(5.0)
+
+    assert ref_context.interface(5.0) == CAPRI.identify_interface(
+        reference, cutoff=5.0
+        )
+
+    capri = CAPRI(
+        identificator=42,
+        reference=reference,
+        model=protprot_input_list[1].rel_path,
+        path=golden_data,
+        params=params,
+        reference_context=ref_context,
+        )
+
+    assert capri.ref_context is ref_context
+
+    capri.calc_irmsd()
+    capri.calc_fnat()
+
+    assert round_two_dec(capri.irmsd) == 7.38
+
+    assert round_two_dec(capri.fnat) == 0.05
+
+    remove_aln_files(capri)
@@ -2,11 +2,21 @@
 import os
 from pathlib import Path
 
+import numpy as np
 import pytest
 
 from haddock.libs.libontology import PDBFile
 from haddock.modules.analysis.clustfcc import DEFAULT_CONFIG as clustfcc_pars
 from haddock.modules.analysis.clustfcc import HaddockModule
+from haddock.modules.analysis.clustfcc.clustfcc import (
+    FCCChunk,
+    cluster_elements,
+    cluster_thresholds,
+    common_contacts,
+    contact_matrix,
+    neighbour_matrix,
+    )
+from haddock.modules.analysis.clustfcc.contacts import ContactsChunk
 
 from . import golden_data
 
@@ -24,10 +34,7 @@ def protprot_input_list():
 def output_list():
     """Clustfcc output list."""
     return [
-        "fcc.matrix",
         "cluster.out",
-        "protprot_complex_1.con",
-        "protprot_complex_2.con",
         "clustfcc.txt",
         "io.json"
         ]
@@ -50,30 +57,61 @@ def test_clustfcc_output_existence(protprot_input_list, output_list):
         assert el in ls
 
 
-def test_matrix_output():
-    """Check fcc.matrix file."""
-    fcc_file = Path("fcc.matrix")
+def test_fcc_matrix(protprot_input_list):
+    """Check the FCC of the models and their neighbours."""
+    contacts = contact_matrix(ContactsChunk(protprot_input_list, 5.0).run())
 
-    observed_output = open(fcc_file).read()
+    assert contacts.shape == (2, 35)
 
-    expected_output = "1 2 0.05 0.062" + os.linesep
+    rows, cols, fcc_i, fcc_j = common_contacts(contacts, 0, 2)
 
-    assert observed_output == expected_output
+    assert list(rows) == [0, 1]
+    assert list(cols) == [1, 0]
+    assert np.allclose(fcc_i, [0.05, 0.0625])
+    assert np.allclose(fcc_j, [0.0625, 0.05])
 
+    # the pairs below the fraction cutoff are not kept
+    assert [len(n) for n in FCCChunk(contacts, range(2), 0.6, 0.75).run()] == [0, 0]  # noqa: E501
 
-def test_contacts():
-    """Check .con files."""
-    expected_output_length = [100, 119]
+    model, neighbour = FCCChunk(contacts, range(1, 2), 0.06, 0.75).run()
 
-    observed_output_lengths = []
+    assert list(model) == [1]
+    assert list(neighbour) == [0]
 
-    con1_len = len(open("protprot_complex_1.con").readlines())
-    observed_output_lengths.append(con1_len)
+    assert not Path("fcc.matrix").exists()
 
-    con2_len = len(open("protprot_complex_2.con").readlines())
-    observed_output_lengths.append(con2_len)
 
-    assert observed_output_lengths == expected_output_length
+def test_cluster_elements():
+    """Check the clustering of the models on their neighbours."""
+    neighbours = neighbour_matrix(
+        7,
+        [
+            (np.array([0, 0, 0, 1, 2]), np.array([1, 2, 3, 0, 0])),
+            (np.array([3, 4, 4, 5]), np.array([4, 3, 5, 4])),
+            ],
+        )
+
+    # the model with most neighbours is the first center, and the ties
+    #  are broken in favour of the last model
+    assert cluster_elements(neighbours, threshold=2) == [
+        (0, [1, 2, 3]),
+        (5, [4]),
+        ]
+
+    assert cluster_elements(neighbours, threshold=4) == [(0, [1, 2, 3])]
+
+    assert cluster_elements(neighbours, threshold=5) == []
+
+    # all the thresholds at once
+    clusters_by_threshold = cluster_thresholds(neighbours, 5)
+
+    assert list(clusters_by_threshold) == [1, 2, 3, 4, 5]
+
+    for threshold, clusters in clusters_by_threshold.items():
+        assert clusters == cluster_elements(neighbours, threshold)
+
+    # the singletons are the last clusters
+    assert clusters_by_threshold[1] == [(0, [1, 2, 3]), (5, [4]), (6, [])]
 
 
 def remove_clustfcc_files(output_list):
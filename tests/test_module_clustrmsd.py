@@ -4,14 +4,24 @@ from pathlib import Path
 
 import numpy as np
 import pytest
+from scipy.cluster.hierarchy import linkage
+from scipy.spatial.distance import squareform
 
+from haddock.libs.libclust import init_condensed_matrix, open_condensed_matrix
 from haddock.libs.libontology import ModuleIO, PDBFile, RMSDFile
 from haddock.modules.analysis.clustrmsd import DEFAULT_CONFIG as clustrmsd_pars
 from haddock.modules.analysis.clustrmsd import HaddockModule
 from haddock.modules.analysis.clustrmsd.clustrmsd import (
+    DENDROGRAM_FNAME,
+    dendrogram_key,
     get_clusters,
     get_dendrogram,
+    get_leaders,
+    get_leaders_matrix,
+    load_dendrogram,
     read_matrix,
+    save_dendrogram,
+    single_linkage,
     )
 from haddock.modules.analysis.rmsdmatrix import DEFAULT_CONFIG as rmsd_pars
 from haddock.modules.analysis.rmsdmatrix import HaddockModule as HaddockRMSD
@@ -130,6 +140,25 @@ def test_read_rmsd_matrix(correct_rmsd_vec):
     os.unlink(output_name)
 
 
+def test_read_binary_matrix(correct_rmsd_array, tmp_path):
+    """Check the binary condensed matrix is memory-mapped."""
+    output_name = Path(tmp_path, "rmsd_matrix.bin")
+    init_condensed_matrix(output_name, ["1.pdb", "2.pdb", "3.pdb", "4.pdb"])
+    matrix = open_condensed_matrix(output_name, mode="r+")
+    matrix[:] = correct_rmsd_array
+    matrix.flush()
+    del matrix
+
+    matrix = read_matrix(RMSDFile(output_name.name, 6, path=tmp_path))
+
+    assert isinstance(matrix, np.memmap)
+
+    np.testing.assert_allclose(matrix, correct_rmsd_array)
+
+    with pytest.raises(ValueError):
+        read_matrix(RMSDFile(output_name.name, 3, path=tmp_path))
+
+
 def test_read_matrix_input(correct_rmsd_vec):
     """Test wrong input to read_matrix."""
     rmsd_vec = correct_rmsd_vec
@@ -238,7 +267,100 @@ def test_correct_clusters(correct_rmsd_array):
 # TODO: add tests for the other categories of clustering
 
 
-def test_correct_output(input_protdna_models):
+@pytest.mark.parametrize("nmodels", [2, 3, 40])
+def test_single_linkage(nmodels, tmp_path):
+    """Test the single linkage from the memory-mapped matrix."""
+    npairs = nmodels * (nmodels - 1) // 2
+    rng = np.random.default_rng(nmodels)
+    # rounded, to have ties
+    rmsd_array = np.round(rng.random(npairs) * 10, 1).astype(np.float32)
+
+    output_name = Path(tmp_path, "rmsd_matrix.bin")
+    init_condensed_matrix(output_name, [f"{i}.pdb" for i in range(nmodels)])
+    matrix = open_condensed_matrix(output_name, mode="r+")
+    matrix[:] = rmsd_array
+    matrix.flush()
+    del matrix
+
+    matrix = read_matrix(RMSDFile(output_name.name, npairs, path=tmp_path))
+    observed_dendrogram = single_linkage(matrix)
+
+    np.testing.assert_array_equal(
+        observed_dendrogram,
+        linkage(rmsd_array, "single"),
+        )
+
+    np.testing.assert_array_equal(
+        get_dendrogram(matrix, linkage_type="single"),
+        observed_dendrogram,
+        )
+
+
+def test_leaders(correct_rmsd_array):
+    """Test the grouping of the models around leaders."""
+    leaders, assignment = get_leaders(correct_rmsd_array, radius=1.0)
+
+    assert list(leaders) == [0, 2]
+
+    assert list(assignment) == [0, 0, 1, 1]
+
+    # every model is a leader with a small radius
+    leaders, assignment = get_leaders(correct_rmsd_array, radius=0.1)
+
+    assert list(leaders) == [0, 1, 2, 3]
+
+    assert list(assignment) == [0, 1, 2, 3]
+
+    rng = np.random.default_rng(0)
+    rmsd_array = rng.random(45)
+    leaders = np.array([1, 4, 5, 8])
+
+    np.testing.assert_array_equal(
+        get_leaders_matrix(rmsd_array, leaders),
+        squareform(squareform(rmsd_array)[np.ix_(leaders, leaders)]),
+        )
+
+
+def test_saved_dendrogram(correct_rmsd_array, tmp_path):
+    """Test the dendrogram is saved with the key of its inputs."""
+    matrix_f = Path(tmp_path, "rmsd_matrix.bin")
+    init_condensed_matrix(matrix_f, ["1.pdb", "2.pdb", "3.pdb", "4.pdb"])
+    dendrogram_f = Path(tmp_path, "rmsd_dendrogram_average.npz")
+    dendrogram = get_dendrogram(correct_rmsd_array, linkage_type="average")
+    key = dendrogram_key(matrix_f, linkage="average")
+
+    assert load_dendrogram(dendrogram_f, key) is None
+
+    save_dendrogram(dendrogram_f, key, dendrogram)
+    saved_dendrogram, leader_assignment = load_dendrogram(dendrogram_f, key)
+
+    np.testing.assert_array_equal(saved_dendrogram, dendrogram)
+
+    assert leader_assignment is None
+
+    # other parameters or another matrix
+    assert key != dendrogram_key(matrix_f, linkage="complete")
+
+    stat = matrix_f.stat()
+    os.utime(matrix_f, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+    other_key = dendrogram_key(matrix_f, linkage="average")
+
+    assert load_dendrogram(dendrogram_f, other_key) is None
+
+    save_dendrogram(dendrogram_f, key, dendrogram, np.array([0, 0, 1]))
+
+    assert list(load_dendrogram(dendrogram_f, key)[1]) == [0, 0, 1]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        # the models are grouped around leaders
+        {"linkage": "average", "max_linkage_models": 1},
+        ],
+    )
+def test_correct_output(input_protdna_models, params):
     """Test correct clustrmsd output."""
     rmsd_module = HaddockRMSD(
         order=2,
@@ -253,6 +375,7 @@ def test_correct_output(input_protdna_models):
         path=Path(""),
         initial_params=clustrmsd_pars
         )
+    clustrmsd_module.params.update(params)
     clustrmsd_module._run()
 
     ls = os.listdir()
@@ -273,8 +396,32 @@ def test_correct_output(input_protdna_models):
 
     # TODO: check the content of clustrmsd.txt
 
+    # the dendrogram is saved and cut again by the next clustrmsd
+    dendrogram_f = Path(
+        "dendrograms",
+        DENDROGRAM_FNAME.format(linkage=clustrmsd_module.params["linkage"]),
+        )
+    saved_time = dendrogram_f.stat().st_mtime_ns
+
+    clustrmsd_module = HaddockModule(
+        order=3,
+        path=Path(""),
+        initial_params=clustrmsd_pars
+        )
+    clustrmsd_module.params.update(params)
+    clustrmsd_module.params["tolerance"] = 2
+    clustrmsd_module._run()
+
+    assert dendrogram_f.stat().st_mtime_ns == saved_time
+
+    assert open(expected_out_filename).read() == (
+        "Cluster 1 -> 1" + os.linesep + "Cluster 2 -> 2" + os.linesep
+        )
+
+    os.unlink(dendrogram_f)
+    os.rmdir("dendrograms")
     os.unlink("io.json")
-    os.unlink("rmsd.matrix")
+    os.unlink("rmsd_matrix.bin")
     os.unlink("rmsd_matrix.json")
     os.unlink(expected_out_filename)
     os.unlink(expected_txt_filename)
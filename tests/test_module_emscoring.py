@@ -1,9 +1,17 @@
 """Test the emscoring module."""
 import os
+import shutil
 from pathlib import Path
 
+import numpy as np
 import pytest
 
+from haddock.gear.haddockmodel import (
+    ENERGIES_TABLE,
+    HaddockModel,
+    read_energies_table,
+    )
+from haddock.libs.libio import working_directory
 from haddock.libs.libontology import PDBFile
 from haddock.modules.scoring.emscoring import DEFAULT_CONFIG as emscoring_pars
 from haddock.modules.scoring.emscoring import HaddockModule
@@ -53,3 +61,57 @@ def test_emscoring_output(output_models):
     assert observed_outf_l == expected_outf_l
 
     os.unlink(output_fname)
+
+
+def test_score_output_models(tmp_path):
+    """Test the models are scored with the energies returned by the jobs."""
+    output_models = []
+    for i in (1, 2):
+        shutil.copy(Path(golden_data, f"protdna_complex_{i}.pdb"), tmp_path)
+        output_models.append(
+            PDBFile(f"protdna_complex_{i}.pdb", path=tmp_path)
+            )
+
+    ems_module = HaddockModule(
+        order=1,
+        path=Path("1_emscoring"),
+        initial_params=emscoring_pars
+        )
+    ems_module.output_models = output_models
+    weights = {
+        "w_vdw": 1.0,
+        "w_elec": 0.1,
+        "w_desolv": 1.0,
+        "w_air": 0.01,
+        "w_bsa": 0.0,
+        }
+    ems_module.update_params(**weights)
+
+    # the engine may not return the energies of some jobs
+    returned_energies = [{
+        "vdw": -10.0,
+        "elec": -100.0,
+        "desolv": 5.0,
+        "air": 100.0,
+        "bsa": 1000.0,
+        }, None]
+
+    with working_directory(tmp_path):
+        ems_module.score_output_models(returned_energies)
+
+    assert output_models[0].score == pytest.approx(-14.0)
+
+    expected_score = HaddockModel(
+        Path(golden_data, "protdna_complex_2.pdb")
+        ).calc_haddock_score(**weights)
+    assert output_models[1].score == pytest.approx(expected_score)
+
+    # the energies are saved for rescoring
+    model_names, energies_table, saved_weights = read_energies_table(
+        Path(tmp_path, ENERGIES_TABLE)
+        )
+    assert model_names == ["protdna_complex_1.pdb", "protdna_complex_2.pdb"]
+    assert saved_weights == weights
+    assert energies_table["vdw"][0] == -10.0
+    assert np.isnan(energies_table["total"][0])
+    assert energies_table["total"][1] == 112.654
@@ -5,13 +5,23 @@ from pathlib import Path
 import numpy as np
 import pytest
 
+from haddock.libs.libclust import (
+    init_condensed_matrix,
+    open_condensed_matrix,
+    read_matrix_header,
+    )
 from haddock.libs.libontology import PDBFile
+from haddock.libs.libparallel import WorkerPool
 from haddock.modules.analysis.rmsdmatrix import DEFAULT_CONFIG as rmsd_pars
 from haddock.modules.analysis.rmsdmatrix import HaddockModule
 from haddock.modules.analysis.rmsdmatrix.rmsd import (
     RMSD,
     RMSDJob,
+    get_filter_resdic,
+    get_index,
     get_pair,
+    get_pairs,
+    preload_coords,
     rmsd_dispatcher,
     )
 
@@ -47,6 +57,19 @@ def test_get_pair():
         assert (observed_i, observed_j) == (expexted_ivec[n], expected_jvec[n])
 
 
+def test_get_pairs():
+    """Test the vectorised get_pairs() function."""
+    nmodels = 7
+    idx = np.arange(nmodels * (nmodels - 1) // 2)
+    observed_i, observed_j = get_pairs(nmodels, idx)
+
+    expected = [get_pair(nmodels, n) for n in idx]
+
+    assert list(zip(observed_i, observed_j)) == expected
+
+    assert (get_index(nmodels, observed_i, observed_j) == idx).all()
+
+
 def test_get_pair_error():
     """Test negative arguments to the get_pair() function."""
     neg_nmodels = -1
@@ -89,77 +112,85 @@ def test_overall_rmsd(input_protdna_models):
         initial_params=rmsd_pars
         )
     rmsd_module.previous_io.output = input_protdna_models
+    rmsd_module.params["matrix_txt"] = True
     rmsd_module._run()
 
     ls = os.listdir()
 
+    assert "rmsd_matrix.bin" in ls
+
     assert "rmsd.matrix" in ls
 
     assert "rmsd_matrix.json" in ls
 
     # check correct rmsd matrix
+    header = read_matrix_header("rmsd_matrix.bin")
+
+    expected_models = ["protdna_complex_1.pdb", "protdna_complex_2.pdb"]
+
+    assert header["models"] == expected_models
+
+    rmsd_matrix = open_condensed_matrix("rmsd_matrix.bin")
+
+    np.testing.assert_allclose(rmsd_matrix, [2.257], atol=0.001)
+
+    del rmsd_matrix
+
+    # check the text export
     rmsd_matrix = open("rmsd.matrix").read()
     
     expected_rmsd_matrix = "1 2 2.257" + os.linesep
 
     assert rmsd_matrix == expected_rmsd_matrix
 
+    os.unlink(Path("rmsd_matrix.bin"))
     os.unlink(Path("rmsd.matrix"))
     os.unlink(Path("rmsd_matrix.json"))
     os.unlink(Path("io.json"))
+    os.rmdir("dendrograms")
 
 
 def test_RMSD_class(input_protdna_models):
     """Test focusing on the RMSD class."""
     params = {}
     rmsd_obj = RMSD(
-        input_protdna_models,
+        len(input_protdna_models),
         core=0,
         npairs=1,
         start_ref=0,
         start_mod=1,
         output_name="rmsd_0.matrix",
         path=Path("."),
+        coords=preload_coords(input_protdna_models)[0],
         params=params
         )
     rmsd_obj.run()
 
-    expected_data = np.array([[1, 2, 2.257]])
+    assert rmsd_obj.rmsd.dtype == np.float32
 
-    np.testing.assert_allclose(rmsd_obj.data, expected_data, atol=0.001)
+    np.testing.assert_allclose(rmsd_obj.rmsd, [2.257], atol=0.001)
 
 
-def test_RMSD_filter_resdic(input_protdna_models):
+def test_get_filter_resdic():
     """Test filter_resdic."""
-    params = {"resdic_A": [1, 2, 3], "resdic_B": [4, 5, 6]}
-
-    # this test only considers the initialisation of the object
-    rmsd_obj = RMSD(
-        input_protdna_models,
-        core=0,
-        npairs=1,
-        start_ref=0,
-        start_mod=1,
-        output_name="rmsd_0.matrix",
-        path=Path("."),
-        params=params
-        )
+    params = {"resdic_A": [1, 2, 3], "resdic_B": [4, 5, 6], "ncores": 1}
 
     expected_resdic = {"A": [1, 2, 3], "B": [4, 5, 6]}
 
-    assert rmsd_obj.filter_resdic == expected_resdic
+    assert get_filter_resdic(params) == expected_resdic
 
 
 def test_RMSDJob(input_protdna_models):
     """Test the RMSD job."""
     rmsd_obj = RMSD(
-        input_protdna_models,
+        len(input_protdna_models),
         core=0,
         npairs=1,
         start_ref=0,
         start_mod=1,
         output_name="rmsd_0.matrix",
         path=Path("."),
+        coords=preload_coords(input_protdna_models)[0],
         )
 
     job_f = "fake_rmsd.job"
@@ -174,3 +205,107 @@ def test_RMSDJob(input_protdna_models):
     assert job.rmsd_obj == rmsd_obj
 
     assert job.output == job_f
+
+
+def test_RMSD_output(input_protdna_models, tmp_path):
+    """Test the RMSD values are written in the condensed matrix slice."""
+    output_name = "rmsd_matrix.bin"
+    init_condensed_matrix(
+        Path(tmp_path, output_name),
+        ["protdna_complex_1.pdb", "protdna_complex_2.pdb"],
+        )
+    rmsd_obj = RMSD(
+        len(input_protdna_models),
+        core=0,
+        npairs=1,
+        start_ref=0,
+        start_mod=1,
+        output_name=output_name,
+        path=tmp_path,
+        coords=preload_coords(input_protdna_models)[0],
+        )
+
+    # the values are only allocated by the job, in the worker
+    assert rmsd_obj.rmsd is None
+
+    RMSDJob(Path(tmp_path, output_name), {}, rmsd_obj).run()
+
+    observed_matrix = open_condensed_matrix(Path(tmp_path, output_name))
+
+    np.testing.assert_allclose(observed_matrix, [2.257], atol=0.001)
+
+
+def test_preload_coords(input_protdna_models):
+    """Test the loading of the common-atom coordinates array."""
+    coords, atom_keys = preload_coords(input_protdna_models)
+
+    assert coords.dtype == np.float32
+
+    assert coords.shape == (2, len(atom_keys), 3)
+
+    assert atom_keys == sorted(atom_keys)
+
+    # the first atom is present in both models
+    assert atom_keys[0][0] == "A"
+
+    # the array can be given to the RMSD class
+    rmsd_obj = RMSD(
+        len(input_protdna_models),
+        core=0,
+        npairs=1,
+        start_ref=0,
+        start_mod=1,
+        output_name="rmsd_0.matrix",
+        path=Path("."),
+        coords=coords,
+        )
+    rmsd_obj.run()
+
+    np.testing.assert_allclose(rmsd_obj.rmsd, [2.257], atol=0.001)
+
+
+def test_preload_coords_pool(input_protdna_models):
+    """Test the models are parsed in the pool shared by the workflow."""
+    pool = WorkerPool(ncores=2)
+    try:
+        coords, atom_keys = preload_coords(
+            input_protdna_models,
+            ncores=2,
+            pool=pool,
+            )
+
+        assert pool._pool is not None
+    finally:
+        pool.shutdown()
+
+    expected_coords, expected_keys = preload_coords(input_protdna_models)
+
+    assert atom_keys == expected_keys
+
+    np.testing.assert_array_equal(coords, expected_coords)
+
+
+def test_preload_coords_missing_atoms(input_protdna_models, tmp_path, caplog):
+    """Test the atoms missing in a model are left out of all the pairs."""
+    # the second model misses its first CA atom
+    pdb_lines = Path(input_protdna_models[1].rel_path).read_text().splitlines()
+    first_ca = next(
+        n for n, line in enumerate(pdb_lines)
+        if line.startswith("ATOM") and line[12:16] == " CA "
+        )
+    del pdb_lines[first_ca]
+    model_f = Path(tmp_path, "protdna_complex_2.pdb")
+    model_f.write_text(os.linesep.join(pdb_lines) + os.linesep)
+    models = [
+        input_protdna_models[0],
+        PDBFile(model_f, path=tmp_path),
+        ]
+
+    coords, atom_keys = preload_coords(input_protdna_models)
+    observed_coords, observed_keys = preload_coords(models)
+
+    assert len(observed_keys) == len(atom_keys) - 1
+
+    assert observed_coords.shape == (2, len(atom_keys) - 1, 3)
+
+    assert "left out of the RMSD of all the pairs" in caplog.text